@@ -0,0 +1,181 @@
+"""
+JSON API - Machine-friendly anonymization endpoints
+
+    POST /api/v1/anonymize        {"text": "...", "detector": "spacy"}
+    POST /api/v1/anonymize/batch  {"texts": ["...", "..."], "detector": "spacy", "consistent": false}
+
+"incremental": true on /anonymize issues a "document_id" (returned with the
+result); sending it back with an edited version only re-detects the changed
+paragraphs. Only IDs issued by the server are accepted.
+
+"model" may only name a model listed in API_MODELS (by default the models in
+PRELOAD_DETECTORS), since every model a client names is loaded and kept.
+
+Texts are anonymized synchronously. A batch is detected in a single call to
+the shared detector (spaCy batches it through nlp.pipe), then every item gets
+its own replacement mapping unless "consistent" asks for one mapping across
+the whole batch. Each item returns the anonymized text, the replaced spans
+(with offsets in both texts) and the mapping.
+"""
+import os
+import time
+
+from flask import Blueprint, jsonify, request
+
+from detectors.registry import get_registry
+from pipeline import AnonymizerPipeline
+from replacers.faker_replacer import FakerReplacer
+from utils.metrics import get_metrics
+
+api = Blueprint('api', __name__, url_prefix='/api/v1')
+
+
+def _max_batch():
+    return int(os.getenv('API_MAX_BATCH', '100'))
+
+
+def _allowed_models():
+    """"type:model" entries clients may request (API_MODELS, default PRELOAD_DETECTORS)."""
+    spec = os.getenv('API_MODELS')
+    if spec is None:
+        spec = os.getenv('PRELOAD_DETECTORS', 'spacy')
+    return {entry.strip() for entry in spec.split(',') if ':' in entry}
+
+
+class APIError(Exception):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
+
+@api.errorhandler(APIError)
+def api_error(e):
+    return jsonify({'error': e.message}), e.status
+
+
+def _anonymize_item(text, entities, replacer):
+    """Apply one item's entities; returns the JSON item with spans in both texts."""
+    anonymized_text, offset_map = replacer.replace_with_offsets(text, entities)
+    spans = [
+        {
+            'start': start,
+            'end': end,
+            'text': ent_text,
+            'label': ent_label,
+            'replacement': anonymized_text[new_start:new_end],
+            'anonymized_start': new_start,
+            'anonymized_end': new_end,
+        }
+        for start, end, new_start, new_end, ent_text, ent_label in offset_map
+    ]
+    return {
+        'anonymized_text': anonymized_text,
+        'spans': spans,
+        'mapping': {span['text']: span['replacement'] for span in spans},
+    }
+
+
+def anonymize_texts(texts, detector_type='spacy', model=None, consistent=False, document_id=None):
+    """
+    Anonymize a list of texts with one batched detection call.
+    Returns one result dict per text (see _anonymize_item).
+    With a document_id (single text only), paragraphs unchanged since that
+    document's last version are not detected again and keep their pseudonyms.
+    """
+    try:
+        pipeline = AnonymizerPipeline(detector=detector_type, model=model, document_id=document_id)
+    except ValueError as e:
+        raise APIError(str(e))
+
+    if document_id is not None:
+        entities_per_text = [pipeline.detect_document(text) for text in texts]
+    else:
+        entities_per_text = pipeline.detect_batch(texts)
+    shared_replacer = pipeline.replacer if consistent or document_id is not None else None
+    faker = pipeline.registry.get_faker()
+    mapping_store = pipeline.registry.mapping_store
+    pool = pipeline.registry.get_pseudonym_pool()
+
+    results = []
+    with pipeline.timings.stage('replace'):
+        for text, entities in zip(texts, entities_per_text):
+            replacer = shared_replacer or FakerReplacer(faker=faker, mapping_store=mapping_store, pool=pool)
+            results.append(_anonymize_item(text, entities, replacer))
+    pipeline.save_document()
+    get_metrics().observe(pipeline.timings, 'api')
+    return results
+
+
+def _read_request(key):
+    payload = request.get_json(silent=True)
+    if not isinstance(payload, dict):
+        raise APIError("Expected a JSON object body")
+    value = payload.get(key)
+    detector_type = payload.get('detector', 'spacy')
+    model = payload.get('model')
+    if not isinstance(detector_type, str):
+        raise APIError("'detector' must be a string")
+    if model is not None:
+        if not isinstance(model, str):
+            raise APIError("'model' must be a string")
+        if f"{detector_type}:{model}" not in _allowed_models():
+            raise APIError(f"Model not allowed: {detector_type}:{model} (see API_MODELS)")
+    return payload, value, detector_type, model
+
+
+def _resolve_document_id(document_id, new):
+    """Validate a client's document_id, or issue one for "incremental": true."""
+    store = get_registry().document_store
+    if store is None:
+        if document_id or new:
+            raise APIError("Incremental mode is disabled (INCREMENTAL_STORE is not set)")
+        return None
+    try:
+        return store.resolve_client_id(document_id, new)
+    except KeyError as e:
+        raise APIError(e.args[0], status=404)
+
+
+@api.route('/anonymize', methods=['POST'])
+def anonymize():
+    """
+    Anonymize a single text
+    """
+    payload, text, detector_type, model = _read_request('text')
+    if not isinstance(text, str):
+        raise APIError("'text' must be a string")
+
+    document_id = payload.get('document_id')
+    if document_id is not None and not isinstance(document_id, str):
+        raise APIError("'document_id' must be a string")
+    document_id = _resolve_document_id(document_id, bool(payload.get('incremental')))
+
+    started = time.perf_counter()
+    result = anonymize_texts([text], detector_type, model, document_id=document_id)[0]
+    result['detector'] = detector_type
+    if document_id is not None:
+        result['document_id'] = document_id
+    result['processing_time'] = round(time.perf_counter() - started, 4)
+    return jsonify(result)
+
+
+@api.route('/anonymize/batch', methods=['POST'])
+def anonymize_batch():
+    """
+    Anonymize a list of texts in one call
+    """
+    payload, texts, detector_type, model = _read_request('texts')
+    if not isinstance(texts, list) or not all(isinstance(text, str) for text in texts):
+        raise APIError("'texts' must be a list of strings")
+    if len(texts) > _max_batch():
+        raise APIError(f"Too many texts in one batch (maximum {_max_batch()})", status=413)
+
+    started = time.perf_counter()
+    results = anonymize_texts(texts, detector_type, model, consistent=bool(payload.get('consistent')))
+    return jsonify({
+        'detector': detector_type,
+        'count': len(results),
+        'processing_time': round(time.perf_counter() - started, 4),
+        'results': results,
+    })
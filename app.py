@@ -2,20 +2,30 @@
 # It handles the routing for the different web pages and the core logic
 # for the anonymization process using LangGraph workflow.
 
-from flask import Flask, render_template, request, jsonify, redirect, url_for, session, send_file
+from flask import Flask, render_template, request, jsonify, redirect, url_for, session, send_file, Response
 import os
 import json
+import time
 from datetime import datetime
 from dotenv import load_dotenv
+from werkzeug.exceptions import RequestEntityTooLarge
+from werkzeug.utils import secure_filename
 from utils.file_processor import extract_text_from_file
 from utils.document_processor import DocumentProcessor
-import tempfile
+from utils.result_store import ResultStore
+from utils.jobs import JobQueue, JobQueueFull
+from utils.metrics import get_metrics, metrics_enabled
+from utils.uploads import UploadRequest, claim_upload, discard_uploads, max_upload_bytes
 
 # Load environment variables (including PYTHONDONTWRITEBYTECODE=1)
 load_dotenv()
 
 app = Flask(__name__)
-app.secret_key = 'your-secret-key-change-in-production'  # For session management
+app.secret_key = 'your-secret-key-change-in-production'  # For session management (result IDs only)
+
+# Uploads stream straight to a temporary file; requests over MAX_UPLOAD_MB are refused up front
+app.request_class = UploadRequest
+app.config['MAX_CONTENT_LENGTH'] = max_upload_bytes()
 
 # Try to import LangGraph workflow, fallback to basic pipeline if not available
 try:
@@ -28,6 +38,49 @@ except ImportError:
 
 # Always import the basic pipeline as fallback
 from pipeline import AnonymizerPipeline
+from detectors.registry import get_registry
+
+# Warm up detectors once per process instead of on every request.
+# PRELOAD_DETECTORS is a comma-separated list, e.g. "spacy,llm:mistral" ("" disables).
+PRELOAD_DETECTORS = os.getenv('PRELOAD_DETECTORS', 'spacy')
+if PRELOAD_DETECTORS.strip():
+    get_registry().preload(PRELOAD_DETECTORS.split(','))
+
+# JSON API under /api/v1
+from api import api
+app.register_blueprint(api)
+
+# Results live server-side; the session cookie only carries the result ID
+result_store = ResultStore.from_env()
+
+# Background workers; JOB_WORKERS / JOB_QUEUE_SIZE control capacity
+job_queue = JobQueue.from_env()
+
+# Job IDs a session may poll and collect, newest last
+SESSION_MAX_JOBS = 20
+
+def _own_job(job_id):
+    """
+    Return the job if this session submitted it, else None.
+    """
+    if job_id not in session.get('job_ids', []):
+        return None
+    return job_queue.get(job_id)
+
+def _save_result(result_data):
+    """
+    Store a result server-side and remember its ID in the session.
+    """
+    result_id = result_store.save(result_data)
+    session['result_id'] = result_id
+    print(f"💾 Stored result {result_id}")
+    return result_id
+
+def _load_result():
+    """
+    Return the current session's result, or None if missing/expired.
+    """
+    return result_store.get(session.get('result_id'))
 
 # Route for the landing page (index.html)
 @app.route('/')
@@ -35,15 +88,17 @@ def index():
     """
     Renders the main landing page of the application.
     """
-    return render_template('index.html')
+    # The document ID field only means something when incremental mode is on
+    return render_template('index.html', incremental=get_registry().document_store is not None)
 
 # Route for the loading screen (loading.html)
 @app.route('/loading')
 def loading():
     """
     Renders the loading screen to show that processing is in progress.
+    The page polls /jobs/<id> for the job given in the query string.
     """
-    return render_template('loading.html')
+    return render_template('loading.html', job_id=request.args.get('job'))
 
 # Route for the results page (result.html)
 @app.route('/result')
@@ -52,8 +107,15 @@ def result():
     Renders the results page to display the anonymized text.
     Gets data from session that was stored during the anonymization process.
     """
-    # Get results from session
-    result_data = session.get('anonymization_result', {})
+    # A finished background job submitted by this session becomes its current result
+    job_id = request.args.get('job')
+    if job_id:
+        job = _own_job(job_id)
+        if job is not None and job.result:
+            session['result_id'] = job.result
+    
+    # Get results from the server-side store (the session only holds the ID)
+    result_data = _load_result()
     
     if not result_data:
         # No results available, redirect to index
@@ -83,81 +145,275 @@ def result():
                          changes=changes,  # Add the formatted changes
                          workflow_type=result_data.get('workflow_type', 'Unknown'))
 
+def _process_text(job, input_text, detector_type, document_id=None):
+    """
+    Anonymize pasted text. Runs in a background worker and returns the result dict.
+    With a document_id, paragraphs unchanged since its last version are not detected again.
+    """
+    job.report('extract')
+    
+    # Process with LangGraph or fallback pipeline
+    if USE_LANGGRAPH:
+        # Use LangGraph workflow
+        print(f"🚀 Running LangGraph workflow...")
+        result = anonymize_text(input_text, detector_type=detector_type)
+        print(f"📊 LangGraph result: {result}")
+        
+        return {
+            'success': result.get('success', False),
+            'original_text': result.get('original_text', input_text),
+            'anonymized_text': result.get('anonymized_text', ''),
+            'statistics': result.get('statistics', {}),
+            'replacement_mapping': result.get('replacement_mapping', {}),
+            'error_message': result.get('error_message'),
+            'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            'workflow_type': 'LangGraph'
+        }
+    
+    # Use basic pipeline as fallback
+    started = time.perf_counter()
+    pipeline = AnonymizerPipeline(detector=detector_type, document_id=document_id)
+    anonymized_text = pipeline.anonymize(input_text, progress=job.report)
+    pipeline.save_document()
+    
+    # Get detailed replacement info
+    replacer = pipeline.replacer
+    replacement_details = replacer.get_replacements_with_types()
+    
+    # Format replacement mapping
+    replacement_mapping = {}
+    entity_info = {}
+    for original, replacement, entity_type in replacement_details:
+        replacement_mapping[original] = replacement
+        entity_info[original] = entity_type
+    
+    # Calculate statistics
+    entities_found = len(replacement_mapping)
+    entities_anonymized = len(replacement_mapping)
+    job.report('render')
+    get_metrics().observe(pipeline.timings, 'text')
+    
+    return {
+        'success': True,
+        'original_text': input_text,
+        'anonymized_text': anonymized_text,
+        'statistics': {
+            'detector_used': detector_type,
+            'entities_found': entities_found,
+            'entities_anonymized': entities_anonymized,
+            'processing_time': f"{time.perf_counter() - started:.2f}",
+            'timings': pipeline.timings.to_dict()
+        },
+        'replacement_mapping': replacement_mapping,
+        'entity_info': entity_info,  # Add entity type info
+        'error_message': None,
+        'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        'workflow_type': 'Basic Pipeline',
+        'document_id': document_id
+    }
+
+def _download_name(filename, output_path):
+    """<client file name>_anonymized.<ext>: uploads are stored under random temporary names."""
+    stem = os.path.splitext(secure_filename(filename or ''))[0] or 'document'
+    return f"{stem}_anonymized{os.path.splitext(output_path)[1]}"
+
+def _process_file(job, temp_input_path, filename, file_extension, detector_type, document_id=None):
+    """
+    Anonymize an uploaded file saved at temp_input_path. Runs in a background
+    worker, removes the temporary file and returns the result dict.
+    With a document_id, segments unchanged since its last version are not detected again.
+    """
+    try:
+        # Create pipeline
+        started = time.perf_counter()
+        pipeline = AnonymizerPipeline(detector=detector_type, document_id=document_id)
+        
+        # Check if this is a document that needs special processing
+        if file_extension in ['pdf', 'docx', 'txt', 'csv', 'jsonl']:
+            # Use DocumentProcessor to create anonymized document
+            doc_processor = DocumentProcessor(pipeline, progress=job.report)
+            result = doc_processor.process_file(temp_input_path, file_extension)
+            
+            if not result['success']:
+                return {
+                    'success': False,
+                    'error_message': result.get('error', 'Document processing failed'),
+                    'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+                    'source_file': filename
+                }
+            
+            # Get replacement details for display
+            replacement_mapping = result.get('replacement_mapping', {})
+            entity_info = {}
+            
+            if hasattr(pipeline.replacer, 'get_replacements_with_types'):
+                replacement_details = pipeline.replacer.get_replacements_with_types()
+                for original, replacement, entity_type in replacement_details:
+                    entity_info[original] = entity_type
+            get_metrics().observe(pipeline.timings, file_extension)
+            
+            return {
+                'success': True,
+                'original_text': result['original_text'],
+                'anonymized_text': result['anonymized_text'],
+                'statistics': {
+                    'detector_used': detector_type,
+                    'entities_found': len(replacement_mapping),
+                    'entities_anonymized': len(replacement_mapping),
+                    'processing_time': f"{time.perf_counter() - started:.2f}",
+                    'timings': pipeline.timings.to_dict()
+                },
+                'replacement_mapping': replacement_mapping,
+                'entity_info': entity_info,
+                'error_message': None,
+                'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+                'workflow_type': 'Document Processing',
+                'source_file': filename,
+                'document_id': document_id,
+                'output_file': _download_name(filename, result['output_path']),
+                'output_path': result['output_path'],
+                'file_type': result.get('file_type', file_extension),
+                'has_file_download': True,
+                'message': result.get('message', 'Document processed successfully')
+            }
+        
+        # For other file types, use the old text-based approach
+        # Extract text from file using the file processor
+        with pipeline.timings.stage('extract'), open(temp_input_path, 'rb') as file:
+            file_content, error_message = extract_text_from_file(file, filename)
+        job.report('extract')
+        
+        if error_message:
+            # File processing failed
+            return {
+                'success': False,
+                'error_message': error_message,
+                'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+                'source_file': filename
+            }
+        
+        # Continue with text-based processing for non-document files
+        if USE_LANGGRAPH:
+            result = anonymize_text(file_content, detector_type=detector_type)
+            return {
+                'success': result.get('success', False),
+                'original_text': result.get('original_text', file_content),
+                'anonymized_text': result.get('anonymized_text', ''),
+                'statistics': result.get('statistics', {}),
+                'replacement_mapping': result.get('replacement_mapping', {}),
+                'error_message': result.get('error_message'),
+                'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+                'workflow_type': 'LangGraph',
+                'source_file': filename
+            }
+        
+        # Use basic pipeline
+        anonymized_text = pipeline.anonymize(file_content, progress=job.report)
+        pipeline.save_document()
+        
+        # Get detailed replacement info
+        replacer = pipeline.replacer
+        replacement_details = replacer.get_replacements_with_types()
+        
+        # Format replacement mapping
+        replacement_mapping = {}
+        entity_info = {}
+        for original, replacement, entity_type in replacement_details:
+            replacement_mapping[original] = replacement
+            entity_info[original] = entity_type
+        
+        # Calculate statistics
+        entities_found = len(replacement_mapping)
+        entities_anonymized = len(replacement_mapping)
+        job.report('render')
+        get_metrics().observe(pipeline.timings, file_extension)
+        
+        return {
+            'success': True,
+            'original_text': file_content,
+            'anonymized_text': anonymized_text,
+            'statistics': {
+                'detector_used': detector_type,
+                'entities_found': entities_found,
+                'entities_anonymized': entities_anonymized,
+                'processing_time': f"{time.perf_counter() - started:.2f}",
+                'timings': pipeline.timings.to_dict()
+            },
+            'replacement_mapping': replacement_mapping,
+            'entity_info': entity_info,
+            'error_message': None,
+            'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            'workflow_type': 'Basic Pipeline',
+            'source_file': filename,
+            'document_id': document_id
+        }
+    
+    finally:
+        # Clean up temporary input file
+        if os.path.exists(temp_input_path):
+            os.remove(temp_input_path)
+
+def _run_job(job, process, *args):
+    """
+    Worker entry point: run one processing function and store its result.
+    Returns the result ID that the result page will look up.
+    """
+    try:
+        result_data = process(job, *args)
+    except Exception as e:
+        print(f"Error in anonymization: {e}")
+        result_data = {
+            'success': False,
+            'error_message': f"An error occurred during anonymization: {str(e)}",
+            'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        }
+    return result_store.save(result_data)
+
+def _job_accepted(job):
+    """
+    Respond to a queued job: JSON for API clients, the loading page for browsers.
+    The job is recorded in the session so only its submitter can poll or collect it.
+    """
+    session['job_ids'] = (session.get('job_ids', []) + [job.id])[-SESSION_MAX_JOBS:]
+    if request.accept_mimetypes.best == 'application/json':
+        return jsonify({'job_id': job.id, 'status_url': url_for('job_status', job_id=job.id)}), 202
+    return redirect(url_for('loading', job=job.id))
+
+def _document_id_from_form():
+    """
+    The document ID for an incremental submission: one issued by an earlier
+    submission, or a new one when "Remember this document" is ticked.
+    """
+    store = get_registry().document_store
+    if store is None:
+        return None
+    try:
+        return store.resolve_client_id(request.form.get('document_id', '').strip() or None,
+                                       new=bool(request.form.get('incremental')))
+    except KeyError as e:
+        raise ValueError(e.args[0])
+
 # Route to handle the anonymization process
 @app.route('/anonymize', methods=['POST'])
 def anonymize():
     """
-    This route handles the POST request for anonymizing data using LangGraph workflow.
+    This route handles the POST request for anonymizing data.
     It can handle either text from the textarea or a file upload.
+    The work is queued and the browser is sent to the loading page, which polls /jobs/<id>.
     """
     try:
         # Check if the request contains text data
         if 'text' in request.form and request.form['text'].strip():
             input_text = request.form['text'].strip()
             detector_type = request.form.get('detector', 'spacy')  # Default to spaCy
+            # Re-submissions of an edited document reuse its earlier detections
+            document_id = _document_id_from_form()
             
             print(f"Received text for anonymization: {input_text[:50]}...")
             print(f"Using detector: {detector_type}")
             
-            # Process with LangGraph or fallback pipeline
-            if USE_LANGGRAPH:
-                # Use LangGraph workflow
-                print(f"🚀 Running LangGraph workflow...")
-                result = anonymize_text(input_text, detector_type=detector_type)
-                print(f"📊 LangGraph result: {result}")
-                
-                # Store results in session for result page
-                session['anonymization_result'] = {
-                    'success': result.get('success', False),
-                    'original_text': result.get('original_text', input_text),
-                    'anonymized_text': result.get('anonymized_text', ''),
-                    'statistics': result.get('statistics', {}),
-                    'replacement_mapping': result.get('replacement_mapping', {}),
-                    'error_message': result.get('error_message'),
-                    'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-                    'workflow_type': 'LangGraph'
-                }
-                print(f"💾 Session data: {session['anonymization_result']}")
-            else:
-                # Use basic pipeline as fallback
-                pipeline = AnonymizerPipeline(detector=detector_type)
-                anonymized_text = pipeline.anonymize(input_text)
-                
-                # Get detailed replacement info
-                replacer = pipeline.replacer
-                replacement_details = replacer.get_replacements_with_types()
-                
-                # Format replacement mapping
-                replacement_mapping = {}
-                entity_info = {}
-                for original, replacement, entity_type in replacement_details:
-                    replacement_mapping[original] = replacement
-                    entity_info[original] = entity_type
-                
-                # Calculate statistics
-                entities_found = len(replacement_mapping)
-                entities_anonymized = len(replacement_mapping)
-                
-                session['anonymization_result'] = {
-                    'success': True,
-                    'original_text': input_text,
-                    'anonymized_text': anonymized_text,
-                    'statistics': {
-                        'detector_used': detector_type,
-                        'entities_found': entities_found,
-                        'entities_anonymized': entities_anonymized,
-                        'processing_time': '0.5'  # Placeholder for now
-                    },
-                    'replacement_mapping': replacement_mapping,
-                    'entity_info': entity_info,  # Add entity type info
-                    'error_message': None,
-                    'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-                    'workflow_type': 'Basic Pipeline'
-                }
-                print(f"💾 Session data: {session['anonymization_result']}")
-            
-            # Redirect to result page
-            return redirect(url_for('result'))
+            job = job_queue.submit(_run_job, _process_text, input_text, detector_type, document_id)
+            return _job_accepted(job)
 
         # Check if the request contains a file
         elif 'file' in request.files:
@@ -167,163 +423,71 @@ def anonymize():
                 
                 # Get file info
                 detector_type = request.form.get('detector', 'spacy')
+                document_id = _document_id_from_form()
                 file_extension = file.filename.split('.')[-1].lower()
                 
-                # Create pipeline
-                pipeline = AnonymizerPipeline(detector=detector_type)
-                
-                # Check if this is a document that needs special processing
-                if file_extension in ['pdf', 'docx', 'txt']:
-                    # Save uploaded file temporarily FIRST (before reading it)
-                    temp_dir = tempfile.gettempdir()
-                    temp_input_path = os.path.join(temp_dir, f"input_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{file.filename}")
-                    file.save(temp_input_path)
-                    
-                    try:
-                        # Use DocumentProcessor to create anonymized document
-                        doc_processor = DocumentProcessor(pipeline)
-                        result = doc_processor.process_file(temp_input_path, file_extension)
-                        
-                        if result['success']:
-                            # Store file path for download
-                            session['anonymized_file_path'] = result['output_path']
-                            session['anonymized_file_type'] = result.get('file_type', file_extension)
-                            
-                            # Get replacement details for display
-                            replacement_mapping = result.get('replacement_mapping', {})
-                            entity_info = {}
-                            
-                            if hasattr(pipeline.replacer, 'get_replacements_with_types'):
-                                replacement_details = pipeline.replacer.get_replacements_with_types()
-                                for original, replacement, entity_type in replacement_details:
-                                    entity_info[original] = entity_type
-                            
-                            session['anonymization_result'] = {
-                                'success': True,
-                                'original_text': result['original_text'],
-                                'anonymized_text': result['anonymized_text'],
-                                'statistics': {
-                                    'detector_used': detector_type,
-                                    'entities_found': len(replacement_mapping),
-                                    'entities_anonymized': len(replacement_mapping),
-                                    'processing_time': '1.2'
-                                },
-                                'replacement_mapping': replacement_mapping,
-                                'entity_info': entity_info,
-                                'error_message': None,
-                                'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-                                'workflow_type': 'Document Processing',
-                                'source_file': file.filename,
-                                'output_file': os.path.basename(result['output_path']),
-                                'has_file_download': True,
-                                'message': result.get('message', 'Document processed successfully')
-                            }
-                        else:
-                            session['anonymization_result'] = {
-                                'success': False,
-                                'error_message': result.get('error', 'Document processing failed'),
-                                'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-                                'source_file': file.filename
-                            }
-                    
-                    finally:
-                        # Clean up temporary input file
-                        if os.path.exists(temp_input_path):
-                            os.remove(temp_input_path)
+                # The upload was streamed to a temporary file while parsing; the worker removes it
+                temp_input_path = claim_upload(file, request)
                 
-                else:
-                    # For other file types, use the old text-based approach
-                    # Extract text from file using the file processor
-                    file_content, error_message = extract_text_from_file(file, file.filename)
-                    
-                    if error_message:
-                        # File processing failed
-                        session['anonymization_result'] = {
-                            'success': False,
-                            'error_message': error_message,
-                            'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-                            'source_file': file.filename
-                        }
-                        return redirect(url_for('result'))
-                    
-                    # Continue with text-based processing for non-document files
-                    if USE_LANGGRAPH:
-                        result = anonymize_text(file_content, detector_type=detector_type)
-                        session['anonymization_result'] = {
-                            'success': result.get('success', False),
-                            'original_text': result.get('original_text', file_content),
-                            'anonymized_text': result.get('anonymized_text', ''),
-                            'statistics': result.get('statistics', {}),
-                            'replacement_mapping': result.get('replacement_mapping', {}),
-                            'error_message': result.get('error_message'),
-                            'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-                            'workflow_type': 'LangGraph',
-                            'source_file': file.filename
-                        }
-                    else:
-                        # Use basic pipeline
-                        anonymized_text = pipeline.anonymize(file_content)
-                        
-                        # Get detailed replacement info
-                        replacer = pipeline.replacer
-                        replacement_details = replacer.get_replacements_with_types()
-                        
-                        # Format replacement mapping
-                        replacement_mapping = {}
-                        entity_info = {}
-                        for original, replacement, entity_type in replacement_details:
-                            replacement_mapping[original] = replacement
-                            entity_info[original] = entity_type
-                        
-                        # Calculate statistics
-                        entities_found = len(replacement_mapping)
-                        entities_anonymized = len(replacement_mapping)
-                        
-                        session['anonymization_result'] = {
-                            'success': True,
-                            'original_text': file_content,
-                            'anonymized_text': anonymized_text,
-                            'statistics': {
-                                'detector_used': detector_type,
-                                'entities_found': entities_found,
-                                'entities_anonymized': entities_anonymized,
-                                'processing_time': '0.8'
-                            },
-                            'replacement_mapping': replacement_mapping,
-                            'entity_info': entity_info,
-                            'error_message': None,
-                            'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-                            'workflow_type': 'Basic Pipeline',
-                            'source_file': file.filename
-                        }
-                
-                return redirect(url_for('result'))
+                try:
+                    job = job_queue.submit(_run_job, _process_file, temp_input_path, file.filename,
+                                           file_extension, detector_type, document_id)
+                except JobQueueFull:
+                    os.remove(temp_input_path)
+                    raise
+                return _job_accepted(job)
             
         # If no text or file was provided, redirect back to the index page.
-        session['anonymization_result'] = {
+        _save_result({
             'success': False,
             'error_message': "No text or file provided for anonymization.",
             'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        }
+        })
+        return redirect(url_for('result'))
+    
+    except RequestEntityTooLarge:
+        raise  # Answered by upload_too_large
+    
+    except JobQueueFull as e:
+        print(f"Rejecting anonymization request: {e}")
+        _save_result({
+            'success': False,
+            'error_message': "The server is busy processing other documents. Please try again in a moment.",
+            'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        })
         return redirect(url_for('result'))
         
     except Exception as e:
         print(f"Error in anonymization: {e}")
-        session['anonymization_result'] = {
+        _save_result({
             'success': False,
             'error_message': f"An error occurred during anonymization: {str(e)}",
             'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        }
+        })
         return redirect(url_for('result'))
 
+@app.route('/jobs/<job_id>')
+def job_status(job_id):
+    """
+    Report a job's state, per-stage progress and ETA (polled by the loading page)
+    """
+    job = _own_job(job_id)
+    if job is None:
+        return jsonify({'error': 'Unknown or expired job'}), 404
+    
+    status = job.to_dict()
+    if job.state in ('done', 'failed'):
+        status['result_url'] = url_for('result', job=job.id)
+    return jsonify(status)
+
 @app.route('/download')
 def download_file():
     """
     Download the anonymized document file
     """
-    file_path = session.get('anonymized_file_path')
+    result_data = _load_result() or {}
+    file_path = result_data.get('output_path')
     if file_path and os.path.exists(file_path):
-        result_data = session.get('anonymization_result', {})
         output_filename = result_data.get('output_file', 'anonymized_document')
         
         return send_file(
@@ -335,6 +499,55 @@ def download_file():
     else:
         return redirect(url_for('result'))
 
+@app.route('/stats')
+def detector_stats():
+    """
+    Report model load time vs. inference time for every loaded detector,
+    plus detection cache and mapping store counters and job queue depth
+    """
+    registry = get_registry()
+    return jsonify({
+        'detectors': registry.stats(),
+        'detection_cache': registry.cache_stats(),
+        'mapping_store': registry.mapping_stats(),
+        'document_state': registry.document_stats(),
+        'pseudonym_pool': registry.pool_stats(),
+        'jobs': job_queue.stats(),
+    })
+
+@app.route('/metrics')
+def prometheus_metrics():
+    """
+    Per-stage timings, run counts, entity counts and input sizes in the
+    Prometheus text format (404 when METRICS_ENABLED=0)
+    """
+    if not metrics_enabled():
+        return Response("Metrics are disabled\n", status=404, mimetype='text/plain')
+    return Response(get_metrics().render_prometheus(), mimetype='text/plain; version=0.0.4')
+
+@app.teardown_request
+def remove_unclaimed_uploads(exc):
+    """
+    Delete uploaded files that no job took ownership of.
+    """
+    discard_uploads(request)
+
+@app.errorhandler(413)
+def upload_too_large(e):
+    """
+    Reject oversized uploads with a readable message.
+    """
+    limit_mb = app.config['MAX_CONTENT_LENGTH'] / (1024 * 1024)
+    message = f"The uploaded file is too large (maximum {limit_mb:g} MB)."
+    if request.accept_mimetypes.best == 'application/json':
+        return jsonify({'error': message}), 413
+    _save_result({
+        'success': False,
+        'error_message': message,
+        'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    })
+    return redirect(url_for('result'))
+
 if __name__ == '__main__':
     # Running the app in debug mode is useful for development.
     app.run(debug=True)
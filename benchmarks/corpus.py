@@ -0,0 +1,83 @@
+"""
+Synthetic corpora for the benchmark suite
+
+Every generator is seeded, so the same arguments always produce the same
+corpus. density is the share of sentences that contain personal data
+(names, emails, ages, organizations).
+"""
+import random
+
+from docx import Document
+from faker import Faker
+
+from utils.document_processor import SimplePDFWriter
+
+FILLER = [
+    "Thanks for the update on the quarterly report.",
+    "The meeting has been moved to Thursday afternoon.",
+    "Please review the attached draft before Friday.",
+    "We still need the final numbers for the budget.",
+    "The deployment went smoothly this morning.",
+    "Let me know if anything is unclear in the proposal.",
+    "The client asked for a revised timeline.",
+    "Our team finished the migration ahead of schedule.",
+]
+
+
+class CorpusFactory:
+    def __init__(self, seed=42, density=0.5):
+        self.density = density
+        self.random = random.Random(seed)
+        self.faker = Faker(['en_US', 'fr_FR'])
+        self.faker.seed_instance(seed)
+
+    def _pii_sentence(self):
+        choice = self.random.randrange(4)
+        if choice == 0:
+            return f"Please contact {self.faker.name()} at {self.faker.email()}."
+        elif choice == 1:
+            return f"{self.faker.name()} is {self.random.randint(20, 65)} years old."
+        elif choice == 2:
+            return f"{self.faker.name()} joined {self.faker.company()} last year."
+        return f"Send the contract to {self.faker.email()} before noon."
+
+    def sentence(self):
+        if self.random.random() < self.density:
+            return self._pii_sentence()
+        return self.random.choice(FILLER)
+
+    def paragraph(self, sentences=5):
+        return " ".join(self.sentence() for _ in range(sentences))
+
+    def chat_messages(self, count):
+        """Short one- to three-sentence messages."""
+        return [" ".join(self.sentence() for _ in range(self.random.randint(1, 3))) for _ in range(count)]
+
+    def text_document(self, paragraphs):
+        return "\n\n".join(self.paragraph() for _ in range(paragraphs))
+
+    def write_txt(self, path, paragraphs=200):
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(self.text_document(paragraphs))
+        return path
+
+    def write_pdf(self, path, pages=100, paragraphs_per_page=6):
+        writer = SimplePDFWriter(path)
+        for _ in range(pages):
+            writer.write_text(self.text_document(paragraphs_per_page))
+            writer.new_page()
+        writer.close()
+        return path
+
+    def write_docx(self, path, tables=20, rows=15):
+        """A table-heavy document: a short paragraph then a contact table, repeated."""
+        doc = Document()
+        for _ in range(tables):
+            doc.add_paragraph(self.paragraph(3))
+            table = doc.add_table(rows=rows, cols=3)
+            for row in table.rows:
+                row.cells[0].text = self.faker.name() if self.random.random() < self.density else "n/a"
+                row.cells[1].text = self.faker.email() if self.random.random() < self.density else "pending"
+                row.cells[2].text = self.sentence()
+        doc.save(path)
+        return path
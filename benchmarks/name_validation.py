@@ -0,0 +1,84 @@
+"""
+Micro-benchmark - per-candidate cost of SpacyDetector._is_valid_person_name
+
+Compares the original implementation (a dozen uncompiled re.search calls per
+candidate) with the compiled pattern bank in detectors/patterns.py.
+
+Usage:
+    python -m benchmarks.name_validation [--rounds 20000]
+"""
+import argparse
+import re
+import timeit
+
+from detectors.patterns import ALL_CAPS_RE, DIGIT_RE, LETTER_RE, contains_non_name_word
+
+CANDIDATES = [
+    "Jean Dupont", "Marie", "Acme Corp", "Université de Paris", "John Smith",
+    "Chef de projet", "IBM", "Sarah Connor", "Rue de la Paix", "Elizabeth Taylor Brown",
+    "Technopark Casablanca", "Paul", "Directeur", "Lucas Martin", "Projet 2024",
+]
+
+LEGACY_NON_NAME_PATTERNS = [
+    r'\b(entreprise|company|corp|ltd|inc|sa|sarl|sas)\b',
+    r'\b(pour|for|et|and|ou|or|le|la|les|the|de|du|des|of)\b',
+    r'\b(intelligence|artificielle|artificial|technology|tech)\b',
+    r'\b(chef|manager|director|president|ceo|cto|cfo)\b',
+    r'\b(site|web|website|internet|email|mail)\b',
+    r'\b(technopark|parc|park|centre|center|bureau|office)\b',
+    r'\b(casablanca|rabat|morocco|maroc|france|paris)\b',
+    r'\b(adresse|address|rue|street|avenue|boulevard)\b',
+    r'\b(université|university|école|school|institut)\b',
+    r'\b(stage|internship|convention|contrat|contract)\b',
+    r'\b(projet|project|développement|development)\b',
+    r'^[A-Z]{3,}$',
+]
+
+
+def legacy_is_valid_person_name(text):
+    """The non-name checks as they were before the pattern bank."""
+    text = text.strip()
+    if len(text) < 2 or len(text) > 50:
+        return False
+    if re.search(r'\d', text):
+        return False
+    text_lower = text.lower()
+    for pattern in LEGACY_NON_NAME_PATTERNS:
+        if re.search(pattern, text_lower, re.IGNORECASE):
+            return False
+    return bool(re.search(r'[a-zA-ZàâäçéèêëïîôùûüÿñæœÀÂÄÇÉÈÊËÏÎÔÙÛÜŸÑÆŒ]', text))
+
+
+def bank_is_valid_person_name(text):
+    """The same checks using the compiled pattern bank."""
+    text = text.strip()
+    if len(text) < 2 or len(text) > 50:
+        return False
+    if DIGIT_RE.search(text):
+        return False
+    if contains_non_name_word(text) or ALL_CAPS_RE.match(text):
+        return False
+    return bool(LETTER_RE.search(text))
+
+
+def per_candidate_cost(func, rounds):
+    seconds = timeit.timeit(lambda: [func(candidate) for candidate in CANDIDATES], number=rounds)
+    return seconds / (rounds * len(CANDIDATES))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rounds', type=int, default=20000)
+    args = parser.parse_args()
+
+    before = per_candidate_cost(legacy_is_valid_person_name, args.rounds)
+    after = per_candidate_cost(bank_is_valid_person_name, args.rounds)
+
+    print(f"Candidates per round: {len(CANDIDATES)}, rounds: {args.rounds}")
+    print(f"Before (inline re.search): {before * 1e6:8.2f} µs/candidate")
+    print(f"After  (pattern bank):     {after * 1e6:8.2f} µs/candidate")
+    print(f"Speed-up: {before / after:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+"""
+Local stand-in for the Ollama /api/generate endpoint
+
+Answers every generation with the capitalized name pairs and email addresses
+found in the prompt's text, streamed as NDJSON like the real server, after
+an optional fixed delay. Lets the LLM detector be benchmarked (chunking,
+concurrency, HTTP client, parsing) without a model.
+
+    server = start_stub(latency=0.05)
+    client = OllamaHTTPClient(base_url=server.url)
+"""
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+NAME_RE = re.compile(r'\b[A-Z][a-z]+ [A-Z][a-z]+\b')
+EMAIL_RE = re.compile(r'\b[\w.+-]+@[\w-]+\.[\w.]+\b')
+TEXT_MARKER = 'Text to analyze:\n'
+END_MARKER = '\n\nJSON response:'
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        prompt = body.get('prompt', '')
+        text = prompt.split(TEXT_MARKER, 1)[-1].rsplit(END_MARKER, 1)[0]
+
+        entities = [
+            {'text': match.group(), 'label': label, 'start': match.start(), 'end': match.end()}
+            for pattern, label in ((NAME_RE, 'PERSON'), (EMAIL_RE, 'EMAIL'))
+            for match in pattern.finditer(text)
+        ]
+        if self.server.latency:
+            time.sleep(self.server.latency)
+
+        output = json.dumps({'entities': entities})
+        lines = [json.dumps({'response': output[i:i + 16], 'done': False}) for i in range(0, len(output), 16)]
+        lines.append(json.dumps({'response': '', 'done': True}))
+        data = ("\n".join(lines) + "\n").encode('utf-8')
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/x-ndjson')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_stub(latency=0.0, port=0):
+    """Serve the stub on a background thread; returns the server (see .url and .shutdown())."""
+    server = ThreadingHTTPServer(('127.0.0.1', port), _StubHandler)
+    server.latency = latency
+    server.url = f"http://127.0.0.1:{server.server_address[1]}"
+    threading.Thread(target=server.serve_forever, name="ollama-stub", daemon=True).start()
+    return server
@@ -0,0 +1,227 @@
+"""
+Benchmark suite - throughput, latency percentiles and peak RSS per stage
+
+Stages (each runs in its own fresh process so peak RSS is per stage):
+    detect       SpacyDetector.detect on short chat messages
+    replace      FakerReplacer.replace on the same messages (entities precomputed)
+    llm          LLMDetector.detect against a local Ollama stub
+    e2e_txt      DocumentProcessor.process_file on generated text files
+    e2e_pdf      ... on a generated multi-page PDF
+    e2e_docx     ... on a generated table-heavy DOCX
+
+Usage:
+    python -m benchmarks.run [--stages detect,replace] [--messages 500] [--pdf-pages 100]
+                             [--save results.json] [--baseline baseline.json] [--tolerance 0.15]
+
+Results can be saved as JSON and compared against a saved baseline; the exit
+code is 1 when any stage regressed by more than the tolerance.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import resource
+import statistics
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+STAGES = ('detect', 'replace', 'llm', 'e2e_txt', 'e2e_pdf', 'e2e_docx')
+
+
+def _percentile(values, fraction):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def _peak_rss_mb():
+    # ru_maxrss is in kilobytes on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def _summarize(latencies, total_bytes, elapsed):
+    return {
+        'items': len(latencies),
+        'seconds': round(elapsed, 4),
+        'items_per_second': round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        'mb_per_second': round(total_bytes / (1024 * 1024) / elapsed, 3) if elapsed else 0.0,
+        'p50_ms': round(_percentile(latencies, 0.50) * 1000, 3),
+        'p90_ms': round(_percentile(latencies, 0.90) * 1000, 3),
+        'p99_ms': round(_percentile(latencies, 0.99) * 1000, 3),
+        'mean_ms': round(statistics.fmean(latencies) * 1000, 3),
+        'peak_rss_mb': _peak_rss_mb(),
+    }
+
+
+def _timed(items, func):
+    """Run func(item) for every item; returns (latencies, elapsed)."""
+    latencies = []
+    started = time.perf_counter()
+    for item in items:
+        item_started = time.perf_counter()
+        func(item)
+        latencies.append(time.perf_counter() - item_started)
+    return latencies, time.perf_counter() - started
+
+
+def _run_stage(stage, options):
+    """Child-process entry point: build the inputs, warm up, then measure one stage."""
+    # Repeated inputs would otherwise be served from the detection cache
+    os.environ['DETECTION_CACHE_SIZE'] = '0'
+    os.environ.setdefault('PRELOAD_DETECTORS', '')
+    from benchmarks.corpus import CorpusFactory
+    from detectors.registry import get_registry
+    from pipeline import AnonymizerPipeline
+    from replacers.faker_replacer import FakerReplacer
+    from utils.document_processor import DocumentProcessor
+
+    corpus = CorpusFactory(seed=options['seed'], density=options['density'])
+    model = options['model']
+    registry = get_registry()
+
+    if stage in ('detect', 'replace'):
+        messages = corpus.chat_messages(options['messages'])
+        detector = registry.get('spacy', model)
+        detector.detect(messages[0])  # Warm-up
+        if stage == 'detect':
+            latencies, elapsed = _timed(messages, detector.detect)
+        else:
+            inputs = [(message, detector.detect(message)) for message in messages]
+            faker = registry.get_faker()
+            latencies, elapsed = _timed(inputs, lambda item: FakerReplacer(faker=faker).replace(*item))
+        return _summarize(latencies, sum(len(m.encode('utf-8')) for m in messages), elapsed)
+
+    if stage == 'llm':
+        from benchmarks.ollama_stub import start_stub
+        from detectors.llm_detector import LLMDetector
+        from detectors.ollama_client import OllamaHTTPClient
+
+        server = start_stub(latency=options['llm_latency'])
+        try:
+            detector = LLMDetector(client=OllamaHTTPClient(base_url=server.url))
+            documents = [corpus.text_document(8) for _ in range(options['llm_documents'])]
+            detector.detect(documents[0])  # Warm-up
+            latencies, elapsed = _timed(documents, detector.detect)
+        finally:
+            server.shutdown()
+        return _summarize(latencies, sum(len(d.encode('utf-8')) for d in documents), elapsed)
+
+    with tempfile.TemporaryDirectory(prefix='anonymizer_bench_') as directory:
+        if stage == 'e2e_txt':
+            paths = [corpus.write_txt(os.path.join(directory, f"doc_{i}.txt"), paragraphs=50)
+                     for i in range(options['txt_files'])]
+        elif stage == 'e2e_pdf':
+            paths = [corpus.write_pdf(os.path.join(directory, "doc.pdf"), pages=options['pdf_pages'])]
+        elif stage == 'e2e_docx':
+            paths = [corpus.write_docx(os.path.join(directory, "doc.docx"), tables=options['docx_tables'])]
+        else:
+            raise ValueError(f"Unknown stage: {stage}")
+
+        registry.preload([f"spacy:{model}" if model else "spacy"])
+
+        def process(path):
+            pipeline = AnonymizerPipeline(model=model)
+            output_path = os.path.join(directory, "out_" + os.path.basename(path))
+            result = DocumentProcessor(pipeline).process_file(path, output_path=output_path)
+            if not result['success']:
+                raise RuntimeError(result['error'])
+
+        latencies, elapsed = _timed(paths * options['repeat'], process)
+        total_bytes = sum(os.path.getsize(path) for path in paths) * options['repeat']
+    return _summarize(latencies, total_bytes, elapsed)
+
+
+def run_stages(stages, options):
+    """Run each stage in a fresh spawned process; returns {stage: summary}."""
+    results = {}
+    context = multiprocessing.get_context('spawn')
+    for stage in stages:
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+            results[stage] = pool.submit(_run_stage, stage, options).result()
+        summary = results[stage]
+        print(f"{stage:<10} {summary['items']:>6} items  {summary['items_per_second']:>9.2f}/s  "
+              f"{summary['mb_per_second']:>8.3f} MB/s  p50 {summary['p50_ms']:>9.3f} ms  "
+              f"p90 {summary['p90_ms']:>9.3f} ms  p99 {summary['p99_ms']:>9.3f} ms  "
+              f"peak RSS {summary['peak_rss_mb']:>7.1f} MB")
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """
+    Print the change against a baseline for each stage measured in both.
+    Returns the names of stages that regressed by more than tolerance.
+    """
+    regressions = []
+    for stage, summary in results.items():
+        reference = baseline.get('results', {}).get(stage)
+        if reference is None:
+            continue
+        throughput_change = summary['items_per_second'] / reference['items_per_second'] - 1 \
+            if reference['items_per_second'] else 0.0
+        p50_change = summary['p50_ms'] / reference['p50_ms'] - 1 if reference['p50_ms'] else 0.0
+        regressed = throughput_change < -tolerance or p50_change > tolerance
+        marker = "❌" if regressed else "✅"
+        print(f"{marker} {stage:<10} throughput {throughput_change:+.1%}  p50 {p50_change:+.1%}  "
+              f"peak RSS {summary['peak_rss_mb'] - reference['peak_rss_mb']:+.1f} MB")
+        if regressed:
+            regressions.append(stage)
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the anonymization pipeline stage by stage.")
+    parser.add_argument('--stages', default=",".join(STAGES), help=f"Comma-separated subset of {', '.join(STAGES)}")
+    parser.add_argument('--model', default=None, help="spaCy model (default: the detector's default)")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--density', type=float, default=0.5, help="Share of sentences containing personal data")
+    parser.add_argument('--messages', type=int, default=500, help="Chat messages for detect/replace")
+    parser.add_argument('--llm-documents', type=int, default=20)
+    parser.add_argument('--llm-latency', type=float, default=0.05, help="Seconds the Ollama stub waits per call")
+    parser.add_argument('--txt-files', type=int, default=20)
+    parser.add_argument('--pdf-pages', type=int, default=100)
+    parser.add_argument('--docx-tables', type=int, default=20)
+    parser.add_argument('--repeat', type=int, default=3, help="Repetitions of each end-to-end document")
+    parser.add_argument('--save', default=None, help="Write results to this JSON file")
+    parser.add_argument('--baseline', default=None, help="Compare against a JSON file written by --save")
+    parser.add_argument('--tolerance', type=float, default=0.15, help="Allowed slowdown before flagging a regression")
+    args = parser.parse_args(argv)
+
+    stages = [stage.strip() for stage in args.stages.split(',') if stage.strip()]
+    unknown = set(stages) - set(STAGES)
+    if unknown:
+        parser.error(f"unknown stages: {', '.join(sorted(unknown))}")
+
+    options = {
+        'model': args.model,
+        'seed': args.seed,
+        'density': args.density,
+        'messages': args.messages,
+        'llm_documents': args.llm_documents,
+        'llm_latency': args.llm_latency,
+        'txt_files': args.txt_files,
+        'pdf_pages': args.pdf_pages,
+        'docx_tables': args.docx_tables,
+        'repeat': args.repeat,
+    }
+    results = run_stages(stages, options)
+
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump({'options': options, 'results': results}, f, indent=2)
+        print(f"💾 Saved results to {args.save}")
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        if baseline.get('options') != options:
+            print("⚠️ Baseline was recorded with different options; comparison may be misleading")
+        if compare(results, baseline, args.tolerance):
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,294 @@
+"""
+Batch CLI - Anonymize a whole directory or archive offline
+
+    python cli.py INPUT OUTPUT_DIR [--workers N] [--detector spacy] [--model NAME]
+
+INPUT is a directory, a .zip or a .tar(.gz/.bz2/.xz) archive. Every supported
+file is anonymized with DocumentProcessor.process_file and written to the same
+relative path under OUTPUT_DIR. Files are spread over a process pool in which
+each worker loads its detector once at startup.
+
+Progress is appended to a JSONL manifest (OUTPUT_DIR/manifest.jsonl by
+default); re-running the same command skips files already processed with
+the same size and modification time, so an interrupted run resumes.
+
+With --incremental, each file's relative path is its document ID: a file
+edited since the last run only has its changed pages/paragraphs detected
+again and keeps its earlier pseudonyms (state under OUTPUT_DIR/.document_state
+unless INCREMENTAL_STORE is set).
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import tarfile
+import tempfile
+import time
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+SUPPORTED_EXTENSIONS = ('pdf', 'docx', 'txt', 'csv', 'jsonl')
+
+_worker_detector = None
+_worker_model = None
+
+
+def _init_worker(detector_type, model):
+    """Process pool initializer: warm this worker's detector once."""
+    global _worker_detector, _worker_model
+    # Workers are already parallel; nested PDF extraction pools would oversubscribe
+    os.environ['PDF_EXTRACT_WORKERS'] = '1'
+    from detectors.registry import get_registry
+    _worker_detector = detector_type
+    _worker_model = model
+    get_registry().preload([f"{detector_type}:{model}" if model else detector_type])
+
+
+def _process_one(source_path, output_path, document_id=None):
+    """Worker task: anonymize one file. Returns a manifest record (without the key)."""
+    from pipeline import AnonymizerPipeline
+    from utils.document_processor import DocumentProcessor
+
+    started = time.perf_counter()
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    # A fresh pipeline per file: detectors come from the warm registry, the mapping doesn't leak
+    pipeline = AnonymizerPipeline(detector=_worker_detector, model=_worker_model, document_id=document_id)
+    try:
+        result = DocumentProcessor(pipeline).process_file(source_path, output_path=output_path)
+    except Exception as e:
+        result = {'success': False, 'error': str(e)}
+    return {
+        'status': 'ok' if result['success'] else 'error',
+        'output': output_path if result['success'] else None,
+        'entities': len(result.get('replacement_mapping', {})),
+        'error': result.get('error'),
+        'seconds': round(time.perf_counter() - started, 3),
+    }
+
+
+class Manifest:
+    """Append-only JSONL log of processed files, keyed by relative path."""
+
+    def __init__(self, path):
+        self.path = path
+        self.done = {}
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue  # Partial last line from an interrupted run
+                    if record.get('status') == 'ok':
+                        self.done[record['path']] = (record['size'], record['mtime'])
+                    else:
+                        self.done.pop(record['path'], None)
+        self._file = open(path, 'a', encoding='utf-8')
+
+    def is_done(self, relative_path, size, mtime):
+        return self.done.get(relative_path) == (size, mtime)
+
+    def record(self, record):
+        self._file.write(json.dumps(record) + "\n")
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+def _is_supported(name):
+    return name.rsplit('.', 1)[-1].lower() in SUPPORTED_EXTENSIONS and not name.startswith('.')
+
+
+def _contained_path(root, relative_path):
+    """
+    root joined with relative_path, or None when the result would escape root
+    (absolute member names, "..", or symlinks already under root).
+    """
+    if os.path.isabs(relative_path):
+        return None
+    root = os.path.realpath(root)
+    target = os.path.realpath(os.path.join(root, relative_path))
+    if os.path.commonpath([root, target]) != root or target == root:
+        return None
+    return target
+
+
+def _archive_member_path(name):
+    """Normalized relative path of an archive member, or None when it is unsafe."""
+    if os.path.isabs(name):
+        return None
+    relative_path = os.path.normpath(name)
+    if os.path.isabs(relative_path) or relative_path == os.pardir or relative_path.startswith(os.pardir + os.sep):
+        return None
+    return relative_path
+
+
+def iter_directory(root):
+    """Yield (relative_path, size, mtime, open_source) for supported files under root."""
+    for directory, _, filenames in os.walk(root):
+        for filename in sorted(filenames):
+            if not _is_supported(filename):
+                continue
+            path = os.path.join(directory, filename)
+            stat = os.stat(path)
+            yield os.path.relpath(path, root), stat.st_size, int(stat.st_mtime), lambda path=path: path
+
+
+def iter_archive(archive_path, staging_dir):
+    """
+    Like iter_directory for a zip or tar archive. Members are extracted to
+    staging_dir only when they actually need processing.
+    """
+    def extract_to(relative_path, source):
+        target = _contained_path(staging_dir, relative_path)
+        if target is None:
+            raise ValueError(f"Archive member escapes the staging directory: {relative_path}")
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        with source() as member_file, open(target, 'wb') as out:
+            shutil.copyfileobj(member_file, out)
+        return target
+
+    if zipfile.is_zipfile(archive_path):
+        with zipfile.ZipFile(archive_path) as archive:
+            for info in archive.infolist():
+                if info.is_dir():
+                    continue
+                relative_path = _archive_member_path(info.filename)
+                if relative_path is None:
+                    print(f"⚠️ Skipping unsafe archive member: {info.filename}")
+                    continue
+                if not _is_supported(os.path.basename(relative_path)):
+                    continue
+                mtime = int(time.mktime(info.date_time + (0, 0, -1)))
+                yield relative_path, info.file_size, mtime, \
+                    lambda relative_path=relative_path, info=info: extract_to(relative_path, lambda: archive.open(info))
+    else:
+        with tarfile.open(archive_path) as archive:
+            for member in archive:
+                if member.issym() or member.islnk():
+                    # Links could point anything under staging_dir at a path outside it
+                    print(f"⚠️ Skipping archive link: {member.name} -> {member.linkname}")
+                    continue
+                if not member.isfile():
+                    continue
+                relative_path = _archive_member_path(member.name)
+                if relative_path is None:
+                    print(f"⚠️ Skipping unsafe archive member: {member.name}")
+                    continue
+                if not _is_supported(os.path.basename(relative_path)):
+                    continue
+                yield relative_path, member.size, int(member.mtime), \
+                    lambda relative_path=relative_path, member=member: extract_to(relative_path, lambda: archive.extractfile(member))
+
+
+def run(input_path, output_dir, workers=None, detector_type='spacy', model=None, manifest_path=None,
+        incremental=False):
+    """
+    Anonymize every supported file under input_path into output_dir.
+    Returns a summary dict with counts and throughput.
+    """
+    workers = workers or os.cpu_count() or 1
+    os.makedirs(output_dir, exist_ok=True)
+    if incremental and os.getenv('INCREMENTAL_STORE', 'none') == 'none':
+        # Set before the pool starts so every worker shares the same state directory
+        os.environ['INCREMENTAL_STORE'] = 'file'
+        os.environ['INCREMENTAL_STORE_PATH'] = os.path.join(output_dir, '.document_state')
+        # One state per input file, kept as long as the output tree: no eviction
+        os.environ.setdefault('INCREMENTAL_STORE_SIZE', '0')
+        os.environ.setdefault('INCREMENTAL_STORE_TTL', '0')
+    manifest = Manifest(manifest_path or os.path.join(output_dir, 'manifest.jsonl'))
+    staging_dir = None
+
+    if os.path.isdir(input_path):
+        sources = iter_directory(input_path)
+    else:
+        staging_dir = tempfile.mkdtemp(prefix='anonymizer_batch_')
+        sources = iter_archive(input_path, staging_dir)
+
+    summary = {'processed': 0, 'failed': 0, 'skipped': 0, 'bytes': 0, 'seconds': 0.0}
+
+    def collect(done):
+        for future in done:
+            relative_path, size, mtime, source_path = futures.pop(future)
+            try:
+                record = future.result()
+            except Exception as e:
+                record = {'status': 'error', 'output': None, 'entities': 0, 'error': str(e), 'seconds': 0.0}
+            record.update({'path': relative_path, 'size': size, 'mtime': mtime})
+            manifest.record(record)
+            if staging_dir:
+                os.remove(source_path)
+
+            if record['status'] == 'ok':
+                summary['processed'] += 1
+                summary['bytes'] += size
+                print(f"✅ {relative_path} ({record['entities']} entities, {record['seconds']:.2f}s)")
+            else:
+                summary['failed'] += 1
+                print(f"❌ {relative_path}: {record['error']}")
+
+    futures = {}
+    started = time.perf_counter()
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(detector_type, model)) as pool:
+            for relative_path, size, mtime, source in sources:
+                if manifest.is_done(relative_path, size, mtime):
+                    summary['skipped'] += 1
+                    continue
+                # Keep a bounded number of files in flight (and extracted from archives)
+                if len(futures) >= workers * 4:
+                    collect(wait(futures, return_when=FIRST_COMPLETED).done)
+                output_path = _contained_path(output_dir, relative_path)
+                if output_path is None:
+                    print(f"⚠️ Skipping {relative_path}: it would be written outside {output_dir}")
+                    summary['skipped'] += 1
+                    continue
+                source_path = source()
+                future = pool.submit(_process_one, source_path, output_path,
+                                     relative_path if incremental else None)
+                futures[future] = (relative_path, size, mtime, source_path)
+            collect(list(futures))
+    finally:
+        manifest.close()
+        if staging_dir:
+            shutil.rmtree(staging_dir, ignore_errors=True)
+
+    elapsed = time.perf_counter() - started
+    summary['seconds'] = round(elapsed, 2)
+    summary['docs_per_second'] = round(summary['processed'] / elapsed, 2) if elapsed else 0.0
+    summary['mb_per_second'] = round(summary['bytes'] / (1024 * 1024) / elapsed, 2) if elapsed else 0.0
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Anonymize every PDF, DOCX, TXT, CSV and JSONL file in a directory or archive.")
+    parser.add_argument('input', help="Directory, .zip or .tar(.gz) archive to anonymize")
+    parser.add_argument('output', help="Directory receiving the anonymized mirror tree")
+    parser.add_argument('--workers', type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument('--detector', default='spacy', help="Detector type: spacy, llm, regex, gazetteer or chain (default: spacy)")
+    parser.add_argument('--model', default=None, help="Detector model (spaCy model name or Ollama model)")
+    parser.add_argument('--manifest', default=None, help="Manifest path (default: OUTPUT/manifest.jsonl)")
+    parser.add_argument('--columns', default=None,
+                        help="CSV/JSONL column rules, e.g. email=EMAIL,notes=text,id=keep (see STRUCTURED_COLUMNS)")
+    parser.add_argument('--incremental', action='store_true',
+                        help="Only re-detect the changed parts of files edited since the last run")
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.input):
+        parser.error(f"input not found: {args.input}")
+    if args.columns is not None:
+        # Read by every worker's DocumentProcessor
+        os.environ['STRUCTURED_COLUMNS'] = args.columns
+
+    summary = run(args.input, args.output, workers=args.workers, detector_type=args.detector,
+                  model=args.model, manifest_path=args.manifest, incremental=args.incremental)
+    print(f"📊 {summary['processed']} processed, {summary['failed']} failed, {summary['skipped']} skipped "
+          f"in {summary['seconds']}s — {summary['docs_per_second']} docs/s, {summary['mb_per_second']} MB/s")
+    return 1 if summary['failed'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,225 @@
+"""
+Detection Cache - Reuse entity spans for text we have already seen
+
+Signatures, disclaimers and letterheads come back thousands of times a day.
+Spans are cached under a hash of (text, detector type, model name, model
+version) in an in-memory LRU, optionally backed by SQLite so results survive
+restarts and are shared between worker processes.
+
+The key covers the exact text: cached spans are character offsets, so any
+normalization that changes the text would invalidate them.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+# Bump when detection logic changes so stale spans are never served
+CACHE_SCHEMA_VERSION = 1
+
+
+class FallbackResult(list):
+    """Entities produced by a degraded path (e.g. LLM failure); never cached."""
+
+
+def make_key(text, detector_type, model_name=None, model_version=None):
+    digest = hashlib.sha256()
+    header = f"{CACHE_SCHEMA_VERSION}\0{detector_type}\0{model_name}\0{model_version}\0"
+    digest.update(header.encode('utf-8'))
+    digest.update(text.encode('utf-8', 'surrogatepass'))
+    return digest.hexdigest()
+
+
+class SQLiteCacheBackend:
+    """On-disk cache store with a size limit and optional TTL."""
+
+    def __init__(self, path, max_entries=100000, ttl=None):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._writes = 0
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS detections ("
+            "key TEXT PRIMARY KEY, entities TEXT NOT NULL, created REAL NOT NULL, accessed REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS detections_accessed ON detections (accessed)")
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT entities, created FROM detections WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            if self.ttl and now - row[1] > self.ttl:
+                self._conn.execute("DELETE FROM detections WHERE key = ?", (key,))
+                return None
+            self._conn.execute("UPDATE detections SET accessed = ? WHERE key = ?", (now, key))
+        return [tuple(entity) for entity in json.loads(row[0])]
+
+    def put(self, key, entities):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO detections (key, entities, created, accessed) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(entities), now, now),
+            )
+            self._writes += 1
+            # Pruning scans the table, so only do it every so often
+            if self._writes % 100 == 0:
+                self._prune(now)
+
+    def _prune(self, now):
+        if self.ttl:
+            self._conn.execute("DELETE FROM detections WHERE created < ?", (now - self.ttl,))
+        count = self._conn.execute("SELECT COUNT(*) FROM detections").fetchone()[0]
+        if count > self.max_entries:
+            self._conn.execute(
+                "DELETE FROM detections WHERE key IN "
+                "(SELECT key FROM detections ORDER BY accessed ASC LIMIT ?)",
+                (count - self.max_entries,),
+            )
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class DetectionCache:
+    """In-memory LRU with TTL, optionally backed by a persistent store."""
+
+    def __init__(self, max_entries=1024, ttl=None, backend=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.backend = backend
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.backend_hits = 0
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires, entities = entry
+                if expires is None or expires > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return list(entities)
+                del self._entries[key]
+
+        if self.backend is not None:
+            entities = self.backend.get(key)
+            if entities is not None:
+                self._remember(key, entities, now)
+                with self._lock:
+                    self.hits += 1
+                    self.backend_hits += 1
+                return list(entities)
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key, entities):
+        if isinstance(entities, FallbackResult):
+            return
+        entities = [tuple(entity) for entity in entities]
+        self._remember(key, entities, time.time())
+        if self.backend is not None:
+            self.backend.put(key, entities)
+
+    def _remember(self, key, entities, now):
+        expires = now + self.ttl if self.ttl else None
+        with self._lock:
+            self._entries[key] = (expires, entities)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'backend_hits': self.backend_hits,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'persistent': self.backend is not None,
+            }
+
+    @classmethod
+    def from_env(cls):
+        """
+        Build the cache from DETECTION_CACHE_* environment variables,
+        or return None when DETECTION_CACHE_SIZE is 0.
+        """
+        max_entries = int(os.getenv('DETECTION_CACHE_SIZE', '1024'))
+        if max_entries <= 0:
+            return None
+        ttl = float(os.getenv('DETECTION_CACHE_TTL', '0')) or None
+        backend = None
+        path = os.getenv('DETECTION_CACHE_PATH')
+        if path:
+            backend = SQLiteCacheBackend(
+                path,
+                max_entries=int(os.getenv('DETECTION_CACHE_DISK_SIZE', '100000')),
+                ttl=ttl,
+            )
+        return cls(max_entries=max_entries, ttl=ttl, backend=backend)
+
+
+class CachingDetector:
+    """Wraps a detector so detect()/detect_batch() consult the cache first."""
+
+    def __init__(self, detector, cache, detector_type):
+        self.detector = detector
+        self.cache = cache
+        self.detector_type = detector_type
+
+    def __getattr__(self, name):
+        # Everything else (nlp, model_name, ...) comes from the wrapped detector
+        return getattr(self.detector, name)
+
+    def _key(self, text):
+        return make_key(
+            text,
+            self.detector_type,
+            getattr(self.detector, 'model_name', None),
+            getattr(self.detector, 'model_version', None),
+        )
+
+    def detect(self, text: str):
+        key = self._key(text)
+        entities = self.cache.get(key)
+        if entities is None:
+            entities = self.detector.detect(text)
+            self.cache.put(key, entities)
+        return entities
+
+    def detect_batch(self, texts):
+        texts = list(texts)
+        keys = [self._key(text) for text in texts]
+        results = [self.cache.get(key) for key in keys]
+
+        # Only the misses go through the (batched) detector
+        missing = [index for index, entities in enumerate(results) if entities is None]
+        if missing:
+            missing_texts = [texts[index] for index in missing]
+            if hasattr(self.detector, 'detect_batch'):
+                detected = self.detector.detect_batch(missing_texts)
+            else:
+                detected = [self.detector.detect(text) for text in missing_texts]
+            for index, entities in zip(missing, detected):
+                self.cache.put(keys[index], entities)
+                results[index] = entities
+        return results
@@ -0,0 +1,199 @@
+"""
+Detector Chain - Cheap detectors first, expensive ones only where needed
+
+Stages run in order over the whole text (e.g. regex, gazetteer, spaCy), except
+escalation stages (by default the LLM): those only see the sentences that the
+earlier stages left uncertain, i.e. sentences with capitalized words no stage
+has covered yet. Consecutive uncertain sentences are sent together.
+
+Spans from every stage are merged by precedence: when two spans overlap, the
+one from the stage listed first in the precedence wins, then the longest.
+
+Spec format (DETECTOR_CHAIN): "regex,gazetteer,spacy,llm", each entry a
+detector type or "type:model" as for PRELOAD_DETECTORS.
+"""
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from detectors.cache import FallbackResult
+from detectors.chunking import BOUNDARY_RE
+from detectors.patterns import ALL_CAPS_RE, CALENDAR_WORDS, COMMON_FIRST_NAMES, NON_NAME_WORDS
+from utils.intervals import IntervalIndex
+
+DEFAULT_CHAIN = 'regex,gazetteer,spacy,llm'
+DEFAULT_ESCALATE = 'llm'
+DEFAULT_PRECEDENCE = 'gazetteer,regex,llm,spacy'
+
+CAPITALIZED_RE = re.compile(r"\b[A-ZÀ-ÖØ-Þ][\w'-]+")
+
+
+def _split_list(value):
+    return [item.strip() for item in value.split(',') if item.strip()]
+
+
+def merge_by_precedence(tagged_entities, precedence):
+    """
+    Merge (stage, entity) pairs into one entity list. Overlaps are resolved
+    in favour of the stage ranked first in precedence, then the longest span;
+    stages missing from precedence rank last.
+    """
+    rank = {stage: index for index, stage in enumerate(precedence)}
+    accepted = IntervalIndex()
+    merged = []
+    ordered = sorted(tagged_entities,
+                     key=lambda item: (rank.get(item[0], len(rank)), item[1][2] - item[1][3], item[1][2]))
+    for _, entity in ordered:
+        if accepted.add_if_free(entity[2], entity[3]):
+            merged.append(entity)
+    merged.sort(key=lambda ent: ent[2])
+    return merged
+
+
+def uncertain_segments(text, entities):
+    """
+    Return (start, end) ranges of the sentences holding capitalized words that
+    no entity covers, adjacent ones merged. A sentence's first word only counts
+    when it is a known first name or followed by another capitalized word, since
+    every sentence starts with a capital.
+    """
+    covered = IntervalIndex((start, end) for _, _, start, end in entities)
+    sentence_starts = [0] + [match.end() for match in BOUNDARY_RE.finditer(text)]
+    sentence_ends = sentence_starts[1:] + [len(text)]
+
+    segments = []
+    for start, end in zip(sentence_starts, sentence_ends):
+        sentence = text[start:end]
+        if not sentence.strip():
+            continue
+        leading = len(sentence) - len(sentence.lstrip())
+        matches = list(CAPITALIZED_RE.finditer(sentence))
+        uncertain = False
+        for index, match in enumerate(matches):
+            word = match.group()
+            lowered = word.lower()
+            if lowered in NON_NAME_WORDS or lowered in CALENDAR_WORDS or ALL_CAPS_RE.match(word):
+                continue
+            if covered.overlaps(start + match.start(), start + match.end()):
+                continue
+            if match.start() == leading and lowered not in COMMON_FIRST_NAMES:
+                following = matches[index + 1] if index + 1 < len(matches) else None
+                if following is None or sentence[match.end():following.start()].strip():
+                    continue
+            uncertain = True
+            break
+        if not uncertain:
+            continue
+        if segments and segments[-1][1] == start:
+            segments[-1] = (segments[-1][0], end)
+        else:
+            segments.append((start, end))
+    return segments
+
+
+class ChainDetector:
+    def __init__(self, stages, escalate=None, precedence=None):
+        """
+        stages: [(name, detector)] in run order. escalate: names of the stages
+        that only run on uncertain segments. precedence: stage names, strongest first.
+        """
+        self.stages = stages
+        self.escalate = set(_split_list(DEFAULT_ESCALATE) if escalate is None else escalate)
+        self.precedence = list(_split_list(DEFAULT_PRECEDENCE) if precedence is None else precedence)
+        self.model_name = ",".join(name for name, _ in stages)
+        # Cached chain results are dropped when any stage's model changes
+        self.model_version = "|".join(str(getattr(detector, 'model_version', None)) for _, detector in stages)
+        self._lock = threading.Lock()
+        self._stats = {'texts': 0, 'segments_escalated': 0, 'chars_total': 0, 'chars_escalated': 0}
+
+    def _run_stage(self, detector, texts):
+        if not texts:
+            return []
+        if hasattr(detector, 'detect_batch'):
+            return detector.detect_batch(texts)
+        workers = min(getattr(detector, 'max_workers', 1), len(texts))
+        if workers <= 1:
+            return [detector.detect(text) for text in texts]
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            return list(executor.map(detector.detect, texts))
+
+    def detect(self, text: str):
+        return self.detect_batch([text])[0]
+
+    def detect_batch(self, texts):
+        texts = list(texts)
+        tagged = [[] for _ in texts]
+        degraded = set()  # Texts where a stage fell back; their result must not be cached
+        escalated_chars = 0
+        escalated_segments = 0
+
+        for name, detector in self.stages:
+            if name not in self.escalate:
+                for index, entities in enumerate(self._run_stage(detector, texts)):
+                    if isinstance(entities, FallbackResult):
+                        degraded.add(index)
+                    tagged[index].extend((name, entity) for entity in entities)
+                continue
+
+            # Escalation stage: only the uncertain sentences of each text
+            segments = []
+            for index, text in enumerate(texts):
+                found = [entity for _, entity in tagged[index]]
+                for start, end in uncertain_segments(text, found):
+                    segments.append((index, start, text[start:end]))
+            results = self._run_stage(detector, [segment for _, _, segment in segments])
+            for (index, offset, segment), entities in zip(segments, results):
+                if isinstance(entities, FallbackResult):
+                    degraded.add(index)
+                for ent_text, ent_label, start, end in entities:
+                    tagged[index].append((name, (ent_text, ent_label, start + offset, end + offset)))
+                escalated_chars += len(segment)
+            escalated_segments += len(segments)
+
+        with self._lock:
+            self._stats['texts'] += len(texts)
+            self._stats['segments_escalated'] += escalated_segments
+            self._stats['chars_total'] += sum(len(text) for text in texts)
+            self._stats['chars_escalated'] += escalated_chars
+        results = [merge_by_precedence(items, self.precedence) for items in tagged]
+        return [FallbackResult(entities) if index in degraded else entities
+                for index, entities in enumerate(results)]
+
+    def cascade_stats(self):
+        """Share of the text that reached the escalation stages."""
+        with self._lock:
+            stats = dict(self._stats)
+        total = stats['chars_total']
+        stats['escalated_ratio'] = round(stats['chars_escalated'] / total, 4) if total else 0.0
+        return stats
+
+    @classmethod
+    def from_spec(cls, spec=None, registry=None):
+        """
+        Build from "regex,gazetteer,spacy,llm" (default DETECTOR_CHAIN), borrowing
+        each stage from the registry. A gazetteer stage is skipped when no term
+        lists are configured (GAZETTEER).
+        """
+        if registry is None:
+            from detectors.registry import get_registry
+            registry = get_registry()
+        spec = spec or os.getenv('DETECTOR_CHAIN', DEFAULT_CHAIN)
+
+        stages = []
+        for entry in _split_list(spec):
+            detector_type, _, model = entry.partition(':')
+            if detector_type == 'chain':
+                raise ValueError("A detector chain cannot contain another chain")
+            if detector_type == 'gazetteer' and not (model or os.getenv('GAZETTEER')):
+                print("⚠️ Skipping gazetteer stage: GAZETTEER is not set")
+                continue
+            stages.append((detector_type, registry.get(detector_type, model or None)))
+        if not stages:
+            raise ValueError(f"Detector chain has no stages: {spec!r}")
+
+        escalate = _split_list(os.getenv('DETECTOR_CHAIN_ESCALATE', DEFAULT_ESCALATE))
+        precedence = _split_list(os.getenv('DETECTOR_CHAIN_PRECEDENCE', DEFAULT_PRECEDENCE))
+        print(f"🔗 Detector chain: {' → '.join(name for name, _ in stages)} "
+              f"(escalating: {', '.join(escalate) or 'none'})")
+        return cls(stages, escalate=escalate, precedence=precedence)
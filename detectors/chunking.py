@@ -0,0 +1,97 @@
+"""
+Chunking - Split long texts into overlapping, sentence-aware chunks
+
+Used by detectors whose cost or context window depends on input length
+(the LLM detector). Each chunk carries its offset in the original text so
+detected spans can be re-based into global positions.
+"""
+import bisect
+import re
+
+from utils.intervals import IntervalIndex
+
+# Positions right after a sentence end or a paragraph break
+BOUNDARY_RE = re.compile(r'(?<=[.!?;:])\s+|\n\s*\n')
+
+
+def _boundaries(text):
+    return [match.end() for match in BOUNDARY_RE.finditer(text)]
+
+
+def _last_boundary(boundaries, low, high):
+    """Largest boundary in (low, high], or None. boundaries is sorted, so this is a bisect."""
+    index = bisect.bisect_right(boundaries, high) - 1
+    if index >= 0 and boundaries[index] > low:
+        return boundaries[index]
+    return None
+
+
+def split_into_chunks(text, max_chars=2000, overlap=200):
+    """
+    Return a list of (offset, chunk_text) covering the whole text.
+
+    Chunks end on a sentence boundary when one exists in their second half and
+    consecutive chunks share roughly `overlap` characters, so an entity cut by
+    one chunk boundary appears whole in the neighbouring chunk.
+    """
+    if len(text) <= max_chars:
+        return [(0, text)]
+
+    boundaries = _boundaries(text)
+    chunks = []
+    start = 0
+    while start < len(text):
+        end = min(start + max_chars, len(text))
+        if end < len(text):
+            cut = _last_boundary(boundaries, start + max_chars // 2, end)
+            if cut is None:
+                # No sentence end nearby: cut on whitespace rather than mid-word
+                space = text.rfind(' ', start + max_chars // 2, end)
+                cut = space + 1 if space != -1 else end
+            end = cut
+        chunks.append((start, text[start:end]))
+        if end >= len(text):
+            break
+
+        # Start the next chunk `overlap` characters back, preferably on a boundary
+        next_start = _last_boundary(boundaries, start, end - overlap) or max(end - overlap, start + 1)
+        if next_start <= start or next_start > end:
+            next_start = end
+        start = next_start
+    return chunks
+
+
+def rebase_entities(chunk_text, offset, entities):
+    """
+    Convert chunk-relative entities to global offsets.
+
+    Model-reported offsets are only hints: each entity is re-anchored to the
+    occurrence of its text in the chunk nearest to the reported start, and
+    dropped if its text doesn't occur in the chunk at all.
+    """
+    rebased = []
+    for ent_text, ent_label, start, end in entities:
+        if not isinstance(start, int) or chunk_text[start:start + len(ent_text)] != ent_text:
+            hint = start if isinstance(start, int) else 0
+            before = chunk_text.rfind(ent_text, 0, hint + len(ent_text))
+            after = chunk_text.find(ent_text, hint)
+            candidates = [position for position in (before, after) if position != -1]
+            if not candidates:
+                continue
+            start = min(candidates, key=lambda position: abs(position - hint))
+        rebased.append((ent_text, ent_label, offset + start, offset + start + len(ent_text)))
+    return rebased
+
+
+def merge_entities(entities):
+    """
+    Dedupe entities found by several chunks. Overlapping spans (the same
+    entity seen twice, or a truncated copy at a chunk edge) keep the longest.
+    """
+    accepted = IntervalIndex()
+    merged = []
+    for entity in sorted(entities, key=lambda ent: (ent[2] - ent[3], ent[2])):
+        if accepted.add_if_free(entity[2], entity[3]):
+            merged.append(entity)
+    merged.sort(key=lambda ent: ent[2])
+    return merged
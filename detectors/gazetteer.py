@@ -0,0 +1,254 @@
+"""
+Gazetteer Detector - Always-redact lists of known names, companies and codes
+
+Terms are loaded once into an Aho-Corasick automaton over words, so a text is
+scanned in a single pass whatever the number of terms (hundreds of thousands
+is fine). Working on words rather than characters keeps the automaton small
+enough for plain Python structures and makes every match a whole-word match.
+
+Matching is case- and accent-insensitive: text and terms are folded one
+character to one character (lower case, accents stripped), which keeps match
+offsets valid in the original text. When matches overlap the longest wins.
+
+Building the automaton for a large list takes a while, so it can be saved in
+compiled form (gzipped JSON) and loaded at startup instead.
+
+Term files hold one term per line; blank lines and lines starting with # are
+ignored.
+"""
+import gzip
+import hashlib
+import json
+import os
+import re
+import unicodedata
+from collections import deque
+from functools import lru_cache
+
+from detectors.chunking import merge_entities
+
+FORMAT_VERSION = 2
+WORD_RE = re.compile(r'\w+')
+WORD_BITS = 32  # goto keys are (node << WORD_BITS) | word id
+
+
+@lru_cache(maxsize=65536)
+def _fold_char(char):
+    base = unicodedata.normalize('NFD', char)[0]
+    return base.lower()[0]
+
+
+def fold(text):
+    """Lower-case and strip accents, keeping exactly one character per input character."""
+    return "".join(map(_fold_char, text))
+
+
+class Gazetteer:
+    def __init__(self):
+        self.vocabulary = {}  # Folded word -> word id
+        self.goto = {}  # (node << WORD_BITS) | word id -> child node; node 0 is the root
+        self.fail = [0]
+        self.terminals = {}  # Node -> [(word count, label)] of the terms ending there
+        self.outputs = {}  # Terminals plus those along the fail chain, rebuilt by build()
+        self.size = 0  # Number of (term, label) pairs
+        self.source_digest = None  # source_digest() of the term files a compiled file was built from
+        self._built = False
+
+    def add(self, term, label):
+        words = WORD_RE.findall(fold(term))
+        if not words:
+            return
+        node = 0
+        for word in words:
+            word_id = self.vocabulary.setdefault(word, len(self.vocabulary))
+            key = (node << WORD_BITS) | word_id
+            next_node = self.goto.get(key)
+            if next_node is None:
+                next_node = self.goto[key] = len(self.fail)
+                self.fail.append(0)
+            node = next_node
+        output = (len(words), label)
+        node_outputs = self.terminals.setdefault(node, [])
+        if output not in node_outputs:
+            node_outputs.append(output)
+            self.size += 1
+        self._built = False
+
+    def build(self):
+        """Compute failure links (breadth-first) and merge outputs along them."""
+        mask = (1 << WORD_BITS) - 1
+        children = {}
+        for key, child in self.goto.items():
+            children.setdefault(key >> WORD_BITS, []).append((key & mask, child))
+
+        # Recomputed from the terminals, so building again after add() is safe
+        self.outputs = {node: list(node_outputs) for node, node_outputs in self.terminals.items()}
+        queue = deque()
+        for _, child in children.get(0, ()):
+            self.fail[child] = 0
+            queue.append(child)
+        while queue:
+            node = queue.popleft()
+            for word_id, child in children.get(node, ()):
+                queue.append(child)
+                fallback = self.fail[node]
+                while fallback and ((fallback << WORD_BITS) | word_id) not in self.goto:
+                    fallback = self.fail[fallback]
+                target = self.goto.get((fallback << WORD_BITS) | word_id, 0)
+                self.fail[child] = target if target != child else 0
+                inherited = self.outputs.get(self.fail[child])
+                if inherited:
+                    self.outputs[child] = self.outputs.get(child, []) + inherited
+        self._built = True
+        return self
+
+    def __len__(self):
+        return self.size
+
+    def find(self, text):
+        """Yield (start, end, label) for every match, overlapping ones included."""
+        if not self._built:
+            self.build()
+        goto, fail, outputs, vocabulary = self.goto, self.fail, self.outputs, self.vocabulary
+        starts = []
+        node = 0
+        for match in WORD_RE.finditer(fold(text)):
+            starts.append(match.start())
+            word_id = vocabulary.get(match.group())
+            if word_id is None:
+                node = 0  # No term contains this word
+                continue
+            while node and ((node << WORD_BITS) | word_id) not in goto:
+                node = fail[node]
+            node = goto.get((node << WORD_BITS) | word_id, 0)
+            for word_count, label in outputs.get(node, ()):
+                yield starts[-word_count], match.end(), label
+
+    def save(self, path, source_digest=None):
+        if not self._built:
+            self.build()
+        labels = sorted({label for node_outputs in self.terminals.values() for _, label in node_outputs})
+
+        def flatten(outputs):
+            # Flat [node, word count, label index, ...] triples load much faster than nested lists
+            return [value for node, node_outputs in outputs.items()
+                    for word_count, label in node_outputs
+                    for value in (node, word_count, labels.index(label))]
+
+        data = {
+            'version': FORMAT_VERSION,
+            'vocabulary': sorted(self.vocabulary, key=self.vocabulary.get),
+            'goto_keys': list(self.goto),
+            'goto_children': list(self.goto.values()),
+            'fail': self.fail,
+            'labels': labels,
+            'terminals': flatten(self.terminals),
+            'outputs': flatten(self.outputs),
+            'size': self.size,
+            'source_digest': source_digest,
+        }
+        with gzip.open(path, 'wt', encoding='utf-8') as f:
+            json.dump(data, f, separators=(',', ':'), ensure_ascii=False)
+
+    @classmethod
+    def load(cls, path):
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            data = json.load(f)
+        if data.get('version') != FORMAT_VERSION:
+            raise ValueError(f"Unsupported gazetteer format in {path}; rebuild it from the term files")
+        gazetteer = cls()
+        gazetteer.vocabulary = {word: word_id for word_id, word in enumerate(data['vocabulary'])}
+        gazetteer.goto = dict(zip(data['goto_keys'], data['goto_children']))
+        gazetteer.fail = data['fail']
+        labels = data['labels']
+        for attribute in ('terminals', 'outputs'):
+            flat = data[attribute]
+            outputs = getattr(gazetteer, attribute)
+            for index in range(0, len(flat), 3):
+                outputs.setdefault(flat[index], []).append((flat[index + 1], labels[flat[index + 2]]))
+        gazetteer.size = data['size']
+        gazetteer.source_digest = data.get('source_digest')
+        gazetteer._built = True
+        return gazetteer
+
+    @classmethod
+    def from_files(cls, sources):
+        """Build from {label: [term file, ...]}."""
+        gazetteer = cls()
+        for label, paths in sources.items():
+            for path in paths:
+                with open(path, 'r', encoding='utf-8') as f:
+                    for line in f:
+                        line = line.strip()
+                        if line and not line.startswith('#'):
+                            gazetteer.add(line, label)
+        return gazetteer.build()
+
+
+def source_digest(sources):
+    """Hash of the labels, term file paths and their contents a gazetteer is built from."""
+    digest = hashlib.sha256(f"{FORMAT_VERSION}".encode())
+    for label in sorted(sources):
+        for path in sources[label]:
+            digest.update(f"\0{label}\0{path}\0".encode('utf-8'))
+            with open(path, 'rb') as f:
+                for block in iter(lambda: f.read(1 << 20), b''):
+                    digest.update(block)
+    return digest.hexdigest()
+
+
+def parse_sources(spec):
+    """Parse "PERSON=employees.txt,ORG=customers.txt;clients.txt" into {label: [paths]}."""
+    sources = {}
+    for entry in spec.split(','):
+        label, _, paths = entry.partition('=')
+        if label.strip() and paths.strip():
+            sources.setdefault(label.strip().upper(), []).extend(p.strip() for p in paths.split(';') if p.strip())
+    return sources
+
+
+class GazetteerDetector:
+    def __init__(self, gazetteer, source=None):
+        self.gazetteer = gazetteer
+        self.model_name = source or 'gazetteer'
+        self.model_version = len(gazetteer)  # Cached detections are dropped when the term count changes
+
+    def detect(self, text: str):
+        entities = [(text[start:end], label, start, end) for start, end, label in self.gazetteer.find(text)]
+        return merge_entities(entities)
+
+    def detect_batch(self, texts):
+        return [self.detect(text) for text in texts]
+
+    @classmethod
+    def from_spec(cls, spec):
+        """
+        Load from a compiled file ("terms.gaz.json.gz") or from term files
+        ("PERSON=employees.txt,ORG=customers.txt"). Term files are compiled to
+        GAZETTEER_COMPILED_PATH when set, and that file is reused while it was
+        built from the same labels, files and file contents.
+        """
+        if '=' not in spec:
+            print(f"📚 Loading compiled gazetteer {spec}")
+            return cls(Gazetteer.load(spec), source=spec)
+
+        sources = parse_sources(spec)
+        compiled_path = os.getenv('GAZETTEER_COMPILED_PATH')
+        source_paths = [path for paths in sources.values() for path in paths]
+        digest = source_digest(sources) if compiled_path else None
+        if compiled_path and os.path.exists(compiled_path):
+            try:
+                gazetteer = Gazetteer.load(compiled_path)
+            except (OSError, ValueError) as e:
+                print(f"⚠️ Ignoring compiled gazetteer {compiled_path}: {e}")
+            else:
+                if gazetteer.source_digest == digest:
+                    print(f"📚 Loaded compiled gazetteer {compiled_path}")
+                    return cls(gazetteer, source=spec)
+                print(f"📚 Compiled gazetteer {compiled_path} is out of date, rebuilding")
+
+        gazetteer = Gazetteer.from_files(sources)
+        print(f"📚 Built gazetteer with {len(gazetteer)} terms from {len(source_paths)} files")
+        if compiled_path:
+            gazetteer.save(compiled_path, source_digest=digest)
+        return cls(gazetteer, source=spec)
@@ -1,19 +1,60 @@
 # detectors/llm_detector.py
 import subprocess
 import json
-import re
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+
+from detectors.cache import FallbackResult
+from detectors.chunking import merge_entities, rebase_entities, split_into_chunks
+from detectors.ollama_client import OllamaError, OllamaHTTPClient
+
+from detectors.patterns import (
+    DIGIT_RE, EMAIL_FULL_RE, EMAIL_RE, FALLBACK_NAME_STOPWORDS, FULL_NAME_PREFIX_RE,
+    FULL_NAME_RE, ORGANIZATION_STOPWORDS,
+)
+from utils.intervals import IntervalIndex
 
 class LLMDetector:
-    def __init__(self, model="mistral"):
+    def __init__(self, model="mistral", backend=None, client=None, chunk_size=None, chunk_overlap=None,
+                 max_workers=None):
         self.model = model
+        self.model_name = model
+        self.model_version = None  # Ollama tags are mutable; bump CACHE_SCHEMA_VERSION after upgrades
+        # Long documents are split into overlapping chunks processed concurrently
+        self.chunk_size = chunk_size or int(os.getenv('LLM_CHUNK_CHARS', '2000'))
+        self.chunk_overlap = chunk_overlap or int(os.getenv('LLM_CHUNK_OVERLAP', '200'))
+        self.max_workers = max_workers or int(os.getenv('OLLAMA_MAX_CONCURRENCY', '4'))
+        # "http" talks to the Ollama REST API through a pooled client,
+        # "subprocess" shells out to `ollama run` (one process per call)
+        self.backend = backend or os.getenv('LLM_BACKEND', 'http')
+        self._client = client
+        self._client_lock = threading.Lock()
 
-    def detect(self, text: str):
-        """
-        Detect sensitive entities using Mistral via Ollama.
-        Returns a list of tuples: (entity_text, entity_label, start, end)
-        """
-        # Construct a more specific prompt for Mistral
-        prompt = f"""You are an expert at identifying sensitive personal information. Analyze the following text and identify ONLY real sensitive entities.
+    @property
+    def client(self):
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    self._client = OllamaHTTPClient()
+        return self._client
+
+    def _build_prompt(self, text: str, json_mode: bool) -> str:
+        # Ollama's JSON mode only produces objects, so the array is wrapped
+        if json_mode:
+            output_format = """Return ONLY a valid JSON object with an "entities" array. Each entity must have: text, label, start, end
+
+Example format:
+{"entities": [{"text": "John Smith", "label": "PERSON", "start": 0, "end": 10}]}"""
+        else:
+            output_format = """Return ONLY a valid JSON array. Each object must have: text, label, start, end
+
+Example format:
+[{"text": "John Smith", "label": "PERSON", "start": 0, "end": 10}]"""
+
+        return f"""You are an expert at identifying sensitive personal information. Analyze the following text and identify ONLY real sensitive entities.
 
 ONLY detect these types:
 - PERSON: Real person names (first + last name)
@@ -21,76 +62,117 @@ ONLY detect these types:
 - ORGANIZATION: Company/organization names
 - AGE: Age information
 
-Return ONLY a valid JSON array. Each object must have: text, label, start, end
-
-Example format:
-[{{"text": "John Smith", "label": "PERSON", "start": 0, "end": 10}}]
+{output_format}
 
 Text to analyze:
 {text}
 
 JSON response:"""
 
+    def _generate(self, text: str) -> str:
+        """Run the model on the text and return its raw output."""
+        if self.backend == 'http':
+            return self.client.generate(self.model, self._build_prompt(text, json_mode=True), json_mode=True)
+
+        # Run Ollama subprocess with timeout
+        result = subprocess.run(
+            ["ollama", "run", self.model],
+            input=self._build_prompt(text, json_mode=False),
+            text=True,
+            capture_output=True,
+            timeout=30,
+            encoding="utf-8",
+            errors="ignore"
+        )
+        if result.returncode != 0:
+            raise OllamaError(result.stderr)
+        return result.stdout
+
+    def _parse_output(self, output: str):
+        """Extract the list of entity dicts from the model output, or None."""
+        output = output.strip()
+
+        # Structured (JSON mode) output: {"entities": [...]}
+        if output.startswith('{'):
+            try:
+                data = json.loads(output)
+                if isinstance(data, dict):
+                    entities_data = data.get('entities', [])
+                    return entities_data if isinstance(entities_data, list) else None
+            except json.JSONDecodeError:
+                pass
+
+        # Free-form output: clean up any text before/after the JSON array
+        json_start = output.find('[')
+        json_end = output.rfind(']') + 1
+        if json_start == -1 or json_end == 0:
+            return None
+        return json.loads(output[json_start:json_end])
+
+    def detect(self, text: str):
+        """
+        Detect sensitive entities using Mistral via Ollama.
+        Returns a list of tuples: (entity_text, entity_label, start, end)
+        """
+        chunks = split_into_chunks(text, self.chunk_size, self.chunk_overlap)
+        if len(chunks) == 1:
+            return self._detect_chunk(text)
+
+        print(f"Splitting text into {len(chunks)} chunks for LLM detection")
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(chunks))) as executor:
+            results = executor.map(lambda chunk: self._detect_chunk(chunk[1]), chunks)
+            entities = []
+            degraded = False
+            for (offset, chunk_text), chunk_entities in zip(chunks, results):
+                degraded = degraded or isinstance(chunk_entities, FallbackResult)
+                entities.extend(rebase_entities(chunk_text, offset, chunk_entities))
+        merged = merge_entities(entities)
+        # Don't let a partially degraded result be cached as the LLM's answer
+        return FallbackResult(merged) if degraded else merged
+
+    def _detect_chunk(self, text: str):
+        """Run the model on one chunk, falling back to regex when it fails."""
         try:
-            # Run Ollama subprocess with timeout
-            result = subprocess.run(
-                ["ollama", "run", self.model],
-                input=prompt,
-                text=True,
-                capture_output=True,
-                timeout=30,
-                encoding="utf-8",
-                errors="ignore"
-            )
-
-            if result.returncode != 0:
-                print(f"LLM detector failed, falling back to regex: {result.stderr}")
+            output = self._generate(text)
+            print(f"LLM raw output: {output[:200]}...")  # Debug output
+
+            try:
+                entities_data = self._parse_output(output)
+            except json.JSONDecodeError as e:
+                print(f"JSON parsing failed: {e}, using fallback")
                 return self._fallback_detection(text)
 
-            output = result.stdout.strip()
-            print(f"LLM raw output: {output[:200]}...")  # Debug output
-            
-            # Clean up the output - remove any text before/after JSON
-            json_start = output.find('[')
-            json_end = output.rfind(']') + 1
-            
-            if json_start == -1 or json_end == 0:
+            if entities_data is None:
                 print("No JSON array found in LLM output, using fallback")
                 return self._fallback_detection(text)
-            
-            json_str = output[json_start:json_end]
-            
-            try:
-                entities_data = json.loads(json_str)
-                entities = []
-                
-                for entity in entities_data:
-                    if isinstance(entity, dict) and all(key in entity for key in ['text', 'label', 'start', 'end']):
-                        # Validate the entity
-                        entity_text = str(entity['text']).strip()
-                        entity_label = str(entity['label']).strip()
-                        
-                        # Skip invalid entries
-                        if len(entity_text) < 2 or entity_label in ['UNKNOWN', 'text', 'label', 'start', 'end']:
-                            continue
-                        
-                        # Additional validation
-                        if self._is_valid_entity(entity_text, entity_label):
-                            entities.append((entity_text, entity_label, entity['start'], entity['end']))
-                
-                if entities:
-                    return entities
-                else:
-                    print("No valid entities found in LLM output, using fallback")
-                    return self._fallback_detection(text)
+
+            entities = []
+            for entity in entities_data:
+                if isinstance(entity, dict) and all(key in entity for key in ['text', 'label', 'start', 'end']):
+                    # Validate the entity
+                    entity_text = str(entity['text']).strip()
+                    entity_label = str(entity['label']).strip()
                     
-            except json.JSONDecodeError as e:
-                print(f"JSON parsing failed: {e}, using fallback")
+                    # Skip invalid entries
+                    if len(entity_text) < 2 or entity_label in ['UNKNOWN', 'text', 'label', 'start', 'end']:
+                        continue
+                    
+                    # Additional validation
+                    if self._is_valid_entity(entity_text, entity_label):
+                        entities.append((entity_text, entity_label, entity['start'], entity['end']))
+            
+            if entities:
+                return entities
+            else:
+                print("No valid entities found in LLM output, using fallback")
                 return self._fallback_detection(text)
 
-        except subprocess.TimeoutExpired:
+        except (subprocess.TimeoutExpired, httpx.TimeoutException):
             print("LLM detector timed out, using fallback")
             return self._fallback_detection(text)
+        except (OllamaError, httpx.HTTPError) as e:
+            print(f"LLM detector failed, falling back to regex: {e}")
+            return self._fallback_detection(text)
         except Exception as e:
             print(f"LLM detector error: {e}, using fallback")
             return self._fallback_detection(text)
@@ -103,13 +185,13 @@ JSON response:"""
             # Must look like a real name
             if len(text.split()) < 2:
                 return False
-            return bool(re.match(r'^[A-Z][a-z]+ [A-Z][a-z]+', text))
+            return bool(FULL_NAME_PREFIX_RE.match(text))
         elif label == 'EMAIL':
-            return bool(re.match(r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$', text))
+            return bool(EMAIL_FULL_RE.match(text))
         elif label == 'ORGANIZATION':
-            return len(text) > 2 and not text.lower() in ['the', 'and', 'for', 'with']
+            return len(text) > 2 and not text.lower() in ORGANIZATION_STOPWORDS
         elif label == 'AGE':
-            return bool(re.search(r'\d+', text))
+            return bool(DIGIT_RE.search(text))
         
         return False
 
@@ -117,18 +199,20 @@ JSON response:"""
         """Fallback to regex-based detection when LLM fails"""
         print("Using regex fallback detection")
         entities = []
+        accepted = IntervalIndex()
         
         # Email detection
-        email_pattern = r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b'
-        for match in re.finditer(email_pattern, text):
-            entities.append((match.group(), 'EMAIL', match.start(), match.end()))
+        for match in EMAIL_RE.finditer(text):
+            if accepted.add_if_free(match.start(), match.end()):
+                entities.append((match.group(), 'EMAIL', match.start(), match.end()))
         
         # Simple name detection (conservative)
-        name_pattern = r'\b[A-Z][a-z]+ [A-Z][a-z]+\b'
-        for match in re.finditer(name_pattern, text):
+        for match in FULL_NAME_RE.finditer(text):
             candidate = match.group()
+            candidate_lower = candidate.lower()
             # Basic validation
-            if not any(word.lower() in candidate.lower() for word in ['the', 'and', 'for', 'with', 'this', 'that']):
-                entities.append((candidate, 'PERSON', match.start(), match.end()))
+            if not any(word in candidate_lower for word in FALLBACK_NAME_STOPWORDS):
+                if accepted.add_if_free(match.start(), match.end()):
+                    entities.append((candidate, 'PERSON', match.start(), match.end()))
         
-        return entities
+        return FallbackResult(entities)
@@ -0,0 +1,79 @@
+"""
+Ollama HTTP Client - Pooled, keep-alive access to the Ollama REST API
+
+Replaces spawning `ollama run <model>` per call: one httpx.Client keeps
+connections to the Ollama server alive, a semaphore bounds how many
+generations run at once, and responses are read as they stream in.
+"""
+import json
+import os
+import threading
+
+import httpx
+
+
+def _normalize_base_url(url):
+    # OLLAMA_HOST is often given without a scheme, e.g. "127.0.0.1:11434"
+    if not url.startswith(('http://', 'https://')):
+        url = 'http://' + url
+    return url.rstrip('/')
+
+
+class OllamaError(RuntimeError):
+    """Raised when the Ollama server reports an error."""
+
+
+class OllamaHTTPClient:
+    def __init__(self, base_url=None, max_concurrency=None, timeout=None, keepalive_expiry=60.0):
+        self.base_url = _normalize_base_url(base_url or os.getenv('OLLAMA_HOST', 'http://127.0.0.1:11434'))
+        self.max_concurrency = max_concurrency or int(os.getenv('OLLAMA_MAX_CONCURRENCY', '4'))
+        self.timeout = timeout or float(os.getenv('OLLAMA_TIMEOUT', '120'))
+
+        limits = httpx.Limits(
+            max_connections=self.max_concurrency,
+            max_keepalive_connections=self.max_concurrency,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self._client = httpx.Client(
+            base_url=self.base_url,
+            limits=limits,
+            # Connecting should be quick; generation may legitimately take a while
+            timeout=httpx.Timeout(self.timeout, connect=5.0),
+        )
+        self._slots = threading.BoundedSemaphore(self.max_concurrency)
+
+    def generate(self, model, prompt, json_mode=True, options=None):
+        """
+        Run one generation and return the full response text.
+        With json_mode=True Ollama constrains the output to valid JSON.
+        """
+        payload = {
+            'model': model,
+            'prompt': prompt,
+            'stream': True,
+            'options': options or {'temperature': 0},
+        }
+        if json_mode:
+            payload['format'] = 'json'
+
+        parts = []
+        with self._slots:
+            with self._client.stream('POST', '/api/generate', json=payload) as response:
+                if response.status_code >= 400:
+                    response.read()
+                    raise OllamaError(f"Ollama returned HTTP {response.status_code}: {response.text[:200]}")
+
+                # Each line is a JSON object carrying the next piece of the response
+                for line in response.iter_lines():
+                    if not line.strip():
+                        continue
+                    chunk = json.loads(line)
+                    if chunk.get('error'):
+                        raise OllamaError(chunk['error'])
+                    parts.append(chunk.get('response', ''))
+                    if chunk.get('done'):
+                        break
+        return "".join(parts)
+
+    def close(self):
+        self._client.close()
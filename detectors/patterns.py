@@ -0,0 +1,72 @@
+"""
+Pattern Bank - Compiled regexes and lexicons shared by all detectors
+
+Everything here is built once at import time so detectors don't recompile
+patterns or rebuild word sets on every call.
+"""
+import re
+
+# Entity patterns
+EMAIL_RE = re.compile(r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b')
+EMAIL_FULL_RE = re.compile(r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$')
+AGE_RE = re.compile(r'\b(?:âgé(?:e)?\s+de\s+)?(\d{1,2})\s+ans?\b|\b(\d{1,2})\s+years?\s+old\b', re.IGNORECASE)
+AGE_CONTEXT_RE = re.compile(r'\b(1[6-9]|[2-6][0-9]|7[0-9]|8[0-9]|9[0-9])\s+(?:ans?|years?)\b', re.IGNORECASE)
+SINGLE_NAME_RE = re.compile(r'\b[A-Z][a-z]{2,}\b')
+FULL_NAME_RE = re.compile(r'\b[A-Z][a-z]+ [A-Z][a-z]+\b')
+FULL_NAME_PREFIX_RE = re.compile(r'^[A-Z][a-z]+ [A-Z][a-z]+')
+
+# Name validation helpers
+DIGIT_RE = re.compile(r'\d')
+LETTER_RE = re.compile(r'[a-zA-ZàâäçéèêëïîôùûüÿñæœÀÂÄÇÉÈÊËÏÎÔÙÛÜŸÑÆŒ]')
+ALL_CAPS_RE = re.compile(r'^[A-Z]{3,}$')  # Likely acronyms or organizations
+
+# Words that never appear in a person name (French and English)
+NON_NAME_WORDS = frozenset([
+    # Business/organization terms
+    'entreprise', 'company', 'corp', 'ltd', 'inc', 'sa', 'sarl', 'sas',
+    'pour', 'for', 'et', 'and', 'ou', 'or', 'le', 'la', 'les', 'the', 'de', 'du', 'des', 'of',
+    'intelligence', 'artificielle', 'artificial', 'technology', 'tech',
+    'chef', 'manager', 'director', 'president', 'ceo', 'cto', 'cfo',
+    'site', 'web', 'website', 'internet', 'email', 'mail',
+    'technopark', 'parc', 'park', 'centre', 'center', 'bureau', 'office',
+    'casablanca', 'rabat', 'morocco', 'maroc', 'france', 'paris',
+    'adresse', 'address', 'rue', 'street', 'avenue', 'boulevard',
+    'université', 'university', 'école', 'school', 'institut',
+    'stage', 'internship', 'convention', 'contrat', 'contract',
+    'projet', 'project', 'développement', 'development',
+])
+
+WORD_RE = re.compile(r'\w+')
+
+
+def contains_non_name_word(text: str) -> bool:
+    """Token-set lookup, equivalent to searching \\b(word1|word2|...)\\b case-insensitively."""
+    return not NON_NAME_WORDS.isdisjoint(WORD_RE.findall(text.lower()))
+
+
+# Common first names worth flagging even when spaCy misses them
+COMMON_FIRST_NAMES = frozenset([
+    'albert', 'marie', 'jean', 'pierre', 'paul', 'michel', 'robert', 'bernard', 'jacques', 'louis',
+    'john', 'mary', 'james', 'patricia', 'michael', 'linda', 'william', 'elizabeth', 'david', 'barbara',
+    'richard', 'susan', 'joseph', 'jessica', 'thomas', 'sarah', 'charles', 'karen', 'christopher', 'nancy',
+    'daniel', 'lisa', 'matthew', 'betty', 'anthony', 'helen', 'mark', 'sandra', 'donald', 'donna',
+    'steven', 'carol', 'ruth', 'andrew', 'sharon', 'joshua', 'michelle', 'kenneth', 'laura',
+    'kevin', 'brian', 'kimberly', 'george', 'deborah', 'edward', 'dorothy', 'ronald',
+    'tim', 'jason', 'jeffrey', 'ryan', 'jacob',
+])
+
+# Words the LLM regex fallback refuses inside a name candidate
+FALLBACK_NAME_STOPWORDS = ('the', 'and', 'for', 'with', 'this', 'that')
+
+# Words the LLM output validation refuses as organization names
+ORGANIZATION_STOPWORDS = frozenset(['the', 'and', 'for', 'with'])
+
+# Capitalized words that are never personal data (days, months; English and French)
+CALENDAR_WORDS = frozenset([
+    'monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday',
+    'lundi', 'mardi', 'mercredi', 'jeudi', 'vendredi', 'samedi', 'dimanche',
+    'january', 'february', 'march', 'april', 'may', 'june', 'july', 'august',
+    'september', 'october', 'november', 'december',
+    'janvier', 'février', 'mars', 'avril', 'mai', 'juin', 'juillet', 'août',
+    'septembre', 'octobre', 'novembre', 'décembre',
+])
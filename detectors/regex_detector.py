@@ -0,0 +1,39 @@
+"""
+Regex Detector - Pattern-only detection of emails and ages
+
+No model to load and no per-call overhead beyond the regexes, which makes it
+the cheapest stage of a detector chain (see detectors.chain). Only patterns
+precise enough to trust without context are used; names are left to the
+gazetteer, spaCy and the LLM.
+"""
+from detectors.patterns import AGE_CONTEXT_RE, AGE_RE, EMAIL_RE
+from utils.intervals import IntervalIndex
+
+
+class RegexDetector:
+    def __init__(self):
+        self.model_name = 'regex'
+        self.model_version = 1
+
+    def detect(self, text: str):
+        entities = []
+        accepted = IntervalIndex()
+
+        for match in EMAIL_RE.finditer(text):
+            if accepted.add_if_free(match.start(), match.end()):
+                entities.append((match.group(), 'EMAIL', match.start(), match.end()))
+
+        for match in AGE_RE.finditer(text):
+            age_num = match.group(1) or match.group(2)
+            if age_num and 16 <= int(age_num) <= 99 and accepted.add_if_free(match.start(), match.end()):
+                entities.append((match.group(), 'AGE', match.start(), match.end()))
+
+        for match in AGE_CONTEXT_RE.finditer(text):
+            if accepted.add_if_free(match.start(), match.end()):
+                entities.append((match.group(), 'AGE', match.start(), match.end()))
+
+        entities.sort(key=lambda ent: ent[2])
+        return entities
+
+    def detect_batch(self, texts):
+        return [self.detect(text) for text in texts]
@@ -0,0 +1,228 @@
+"""
+Detector Registry - Keeps loaded detectors warm for the whole process
+
+Loading a spaCy model (or building a multi-locale Faker) takes far longer than
+running it, so detectors are created once per (detector type, model) and then
+borrowed by every AnonymizerPipeline. Replacers are NOT cached here: their
+mappings are per-request state and must never leak between users.
+"""
+import os
+import threading
+import time
+
+from faker import Faker
+
+from detectors.cache import CachingDetector, DetectionCache
+from replacers.mapping_store import MappingStore
+from replacers.pseudonym_pool import PseudonymPool
+from utils.document_state import DocumentStateStore
+
+
+def _create_spacy(model, registry):
+    from detectors.spacy_detector import SpacyDetector
+    return SpacyDetector(
+        model=model,
+        batch_size=int(os.getenv('SPACY_BATCH_SIZE', '32')),
+        n_process=int(os.getenv('SPACY_N_PROCESS', '1')),
+    )
+
+
+def _create_llm(model, registry):
+    from detectors.llm_detector import LLMDetector
+    return LLMDetector(model=model) if model else LLMDetector()
+
+
+def _create_gazetteer(model, registry):
+    from detectors.gazetteer import GazetteerDetector
+    spec = model or os.getenv('GAZETTEER')
+    if not spec:
+        raise ValueError("Gazetteer needs term files or a compiled file (set GAZETTEER)")
+    return GazetteerDetector.from_spec(spec)
+
+
+def _create_regex(model, registry):
+    from detectors.regex_detector import RegexDetector
+    return RegexDetector()
+
+
+def _create_chain(model, registry):
+    # Stages are borrowed from the registry that owns the chain, so they stay loaded once
+    from detectors.chain import ChainDetector
+    return ChainDetector.from_spec(model, registry)
+
+
+class DetectorRegistry:
+    # Detector type -> factory taking the model name (None = detector default) and this registry
+    FACTORIES = {
+        "spacy": _create_spacy,
+        "llm": _create_llm,
+        "gazetteer": _create_gazetteer,
+        "regex": _create_regex,
+        # model is the stage list, e.g. "regex,gazetteer,spacy,llm"
+        "chain": _create_chain,
+    }
+
+    def __init__(self):
+        self._detectors = {}
+        self._load_locks = {}
+        self._lock = threading.Lock()
+        self._faker = None
+        self._pool = None
+        self._pool_created = False
+        self._stats = {}
+        self._cached = {}
+        self.cache = DetectionCache.from_env()
+        # Shared across pipelines on purpose: it holds pseudonyms, not per-request state
+        self.mapping_store = MappingStore.from_env()
+        # Per-document detections and pseudonyms for incremental re-anonymization
+        self.document_store = DocumentStateStore.from_env()
+
+    def _key(self, detector_type, model):
+        return (detector_type, model)
+
+    def _stats_for(self, key):
+        return self._stats.setdefault(key, {
+            'load_time': 0.0,
+            'inference_time': 0.0,
+            'inference_calls': 0,
+        })
+
+    def get(self, detector_type="spacy", model=None):
+        """
+        Return the shared detector for (detector_type, model), loading it on first use
+        """
+        if detector_type not in self.FACTORIES:
+            raise ValueError("Unknown detector type")
+
+        key = self._key(detector_type, model)
+        detector = self._detectors.get(key)
+        if detector is not None:
+            return detector
+
+        # One lock per key so loading a slow model doesn't block other detectors
+        with self._lock:
+            load_lock = self._load_locks.setdefault(key, threading.Lock())
+
+        with load_lock:
+            detector = self._detectors.get(key)
+            if detector is None:
+                started = time.perf_counter()
+                detector = self.FACTORIES[detector_type](model, self)
+                elapsed = time.perf_counter() - started
+                with self._lock:
+                    self._stats_for(key)['load_time'] = elapsed
+                    self._detectors[key] = detector
+                print(f"⏱️ Loaded {detector_type} detector in {elapsed:.2f}s")
+        return detector
+
+    def get_cached(self, detector_type="spacy", model=None):
+        """
+        Like get(), but wrapped with the shared detection cache when one is configured
+        """
+        detector = self.get(detector_type, model)
+        if self.cache is None:
+            return detector
+        key = self._key(detector_type, model)
+        with self._lock:
+            cached = self._cached.get(key)
+            if cached is None:
+                cached = self._cached[key] = CachingDetector(detector, self.cache, detector_type)
+        return cached
+
+    def get_faker(self):
+        """
+        Return a shared Faker instance (stateless apart from its random generator)
+        """
+        if self._faker is None:
+            with self._lock:
+                if self._faker is None:
+                    self._faker = Faker(['en_US', 'fr_FR'])
+        return self._faker
+
+    def get_pseudonym_pool(self):
+        """
+        Return the shared pseudonym pool (None when PSEUDONYM_POOL_SIZE is 0).
+        Created on first use; it fills itself on a background thread.
+        """
+        if not self._pool_created:
+            with self._lock:
+                if not self._pool_created:
+                    self._pool = PseudonymPool.from_env()
+                    self._pool_created = True
+        return self._pool
+
+    def preload(self, detector_types):
+        """
+        Load detectors ahead of the first request, e.g. at application startup.
+        Accepts "type" or "type:model" entries.
+        """
+        for spec in detector_types:
+            spec = spec.strip()
+            if not spec:
+                continue
+            detector_type, _, model = spec.partition(':')
+            self.get(detector_type, model or None)
+        self.get_faker()
+        self.get_pseudonym_pool()
+
+    def record_inference(self, detector_type, model, seconds):
+        """
+        Record time spent running a detector (as opposed to loading it)
+        """
+        with self._lock:
+            stats = self._stats_for(self._key(detector_type, model))
+            stats['inference_time'] += seconds
+            stats['inference_calls'] += 1
+
+    def stats(self):
+        """
+        Return load vs. inference timings for every detector seen so far
+        """
+        with self._lock:
+            result = {}
+            for (detector_type, model), stats in self._stats.items():
+                name = f"{detector_type}:{model}" if model else detector_type
+                calls = stats['inference_calls']
+                result[name] = {
+                    'loaded': (detector_type, model) in self._detectors,
+                    'load_time': round(stats['load_time'], 4),
+                    'inference_time': round(stats['inference_time'], 4),
+                    'inference_calls': calls,
+                    'avg_inference_time': round(stats['inference_time'] / calls, 4) if calls else 0.0,
+                }
+                detector = self._detectors.get((detector_type, model))
+                if hasattr(detector, 'cascade_stats'):
+                    result[name]['cascade'] = detector.cascade_stats()
+            return result
+
+    def cache_stats(self):
+        """
+        Return detection cache hit/miss counters (None when caching is disabled)
+        """
+        return self.cache.stats() if self.cache is not None else None
+
+    def pool_stats(self):
+        """
+        Return pseudonym pool fill levels and hit/miss counters (None when disabled)
+        """
+        return self._pool.stats() if self._pool is not None else None
+
+    def mapping_stats(self):
+        """
+        Return mapping store counters (None when mappings are per document)
+        """
+        return self.mapping_store.stats() if self.mapping_store is not None else None
+
+    def document_stats(self):
+        """
+        Return incremental document state counters (None when incremental mode is off)
+        """
+        return self.document_store.stats() if self.document_store is not None else None
+
+
+# Process-wide registry shared by every pipeline
+_registry = DetectorRegistry()
+
+
+def get_registry():
+    return _registry
@@ -1,20 +1,44 @@
 import spacy
-import re
+
+from detectors.patterns import (
+    AGE_CONTEXT_RE, AGE_RE, ALL_CAPS_RE, COMMON_FIRST_NAMES, DIGIT_RE, EMAIL_RE,
+    FULL_NAME_RE, LETTER_RE, SINGLE_NAME_RE, contains_non_name_word,
+)
+from utils.intervals import IntervalIndex
+
+# Only doc.ents is consumed, so everything except NER and the tok2vec it may
+# listen to is excluded at load time (names absent from a model are ignored).
+NON_NER_COMPONENTS = [
+    "tagger", "morphologizer", "parser", "senter", "attribute_ruler",
+    "lemmatizer", "textcat", "textcat_multilabel", "trainable_lemmatizer",
+]
 
 class SpacyDetector:
-    def __init__(self):
+    def __init__(self, model=None, batch_size=32, n_process=1):
+        self.model_name = None
+        self.batch_size = batch_size
+        self.n_process = n_process
         try:
-            # Try French model first, then English
-            try:
-                self.nlp = spacy.load("fr_core_news_sm")
-                print("✅ Loaded French spaCy model")
-            except OSError:
-                self.nlp = spacy.load("en_core_web_sm")
-                print("✅ Loaded English spaCy model")
+            if model:
+                self.nlp = spacy.load(model, exclude=NON_NER_COMPONENTS)
+                self.model_name = model
+                print(f"✅ Loaded spaCy model {model}")
+            else:
+                # Try French model first, then English
+                try:
+                    self.nlp = spacy.load("fr_core_news_sm", exclude=NON_NER_COMPONENTS)
+                    self.model_name = "fr_core_news_sm"
+                    print("✅ Loaded French spaCy model")
+                except OSError:
+                    self.nlp = spacy.load("en_core_web_sm", exclude=NON_NER_COMPONENTS)
+                    self.model_name = "en_core_web_sm"
+                    print("✅ Loaded English spaCy model")
             self.use_spacy = True
+            self.model_version = self.nlp.meta.get('version')
         except OSError:
             print("⚠️ No spaCy models found. Using regex fallback.")
             self.use_spacy = False
+            self.model_version = 'regex'
     
     def _is_valid_person_name(self, text: str) -> bool:
         """Enhanced validation for person names"""
@@ -25,35 +49,15 @@ class SpacyDetector:
             return False
         
         # Skip if contains numbers
-        if re.search(r'\d', text):
+        if DIGIT_RE.search(text):
             return False
         
-        # Skip common non-name patterns (French and English)
-        non_name_patterns = [
-            # Business/organization terms
-            r'\b(entreprise|company|corp|ltd|inc|sa|sarl|sas)\b',
-            r'\b(pour|for|et|and|ou|or|le|la|les|the|de|du|des|of)\b',
-            r'\b(intelligence|artificielle|artificial|technology|tech)\b',
-            r'\b(chef|manager|director|president|ceo|cto|cfo)\b',
-            r'\b(site|web|website|internet|email|mail)\b',
-            r'\b(technopark|parc|park|centre|center|bureau|office)\b',
-            r'\b(casablanca|rabat|morocco|maroc|france|paris)\b',
-            r'\b(adresse|address|rue|street|avenue|boulevard)\b',
-            r'\b(université|university|école|school|institut)\b',
-            r'\b(stage|internship|convention|contrat|contract)\b',
-            r'\b(projet|project|développement|development)\b',
-            
-            # All caps (likely acronyms or organizations)
-            r'^[A-Z]{3,}$',
-        ]
-        
-        text_lower = text.lower()
-        for pattern in non_name_patterns:
-            if re.search(pattern, text_lower, re.IGNORECASE):
-                return False
+        # Skip common non-name words (French and English) and all-caps acronyms
+        if contains_non_name_word(text) or ALL_CAPS_RE.match(text):
+            return False
         
         # Must contain at least one letter
-        if not re.search(r'[a-zA-ZàâäçéèêëïîôùûüÿñæœÀÂÄÇÉÈÊËÏÎÔÙÛÜŸÑÆŒ]', text):
+        if not LETTER_RE.search(text):
             return False
         
         # For person names, expect typical name patterns
@@ -73,89 +77,90 @@ class SpacyDetector:
     def detect(self, text: str):
         """Return list of detected entities (text, label, start, end)."""
         if self.use_spacy:
-            doc = self.nlp(text)
-            entities = []
-            
-            for ent in doc.ents:
-                entity_text = ent.text.strip()
-                
-                # Filter person entities more carefully
-                if ent.label_ in ['PERSON', 'PER']:
-                    if self._is_valid_person_name(entity_text):
-                        entities.append((entity_text, 'PERSON', ent.start_char, ent.end_char))
-                elif ent.label_ in ['EMAIL']:
-                    entities.append((entity_text, 'EMAIL', ent.start_char, ent.end_char))
-                elif ent.label_ in ['ORG']:
-                    # Organization names
-                    entities.append((entity_text, 'ORGANIZATION', ent.start_char, ent.end_char))
-            
-            # Detect ages with regex
-            age_pattern = r'\b(?:âgé(?:e)?\s+de\s+)?(\d{1,2})\s+ans?\b|\b(\d{1,2})\s+years?\s+old\b'
-            for match in re.finditer(age_pattern, text, re.IGNORECASE):
-                age_num = match.group(1) or match.group(2)
-                if age_num and 16 <= int(age_num) <= 99:  # Reasonable age range
-                    entities.append((match.group(), 'AGE', match.start(), match.end()))
-            
-            # Also detect standalone reasonable ages in context
-            age_context_pattern = r'\b(1[6-9]|[2-6][0-9]|7[0-9]|8[0-9]|9[0-9])\s+(?:ans?|years?)\b'
-            for match in re.finditer(age_context_pattern, text, re.IGNORECASE):
-                # Check if already detected
-                overlap = any(start <= match.start() < end or start < match.end() <= end 
-                            for _, _, start, end in entities)
-                if not overlap:
-                    entities.append((match.group(), 'AGE', match.start(), match.end()))
-            
-            # Also detect emails with regex (spaCy often misses them)
-            email_pattern = r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b'
-            for match in re.finditer(email_pattern, text):
-                # Check if already detected
-                overlap = any(start <= match.start() < end or start < match.end() <= end 
-                            for _, _, start, end in entities)
-                if not overlap:
-                    entities.append((match.group(), 'EMAIL', match.start(), match.end()))
-            
-            # Enhanced name detection - catch single names that spaCy might miss
-            single_name_pattern = r'\b[A-Z][a-z]{2,}\b'
-            common_names = {
-                'albert', 'marie', 'jean', 'pierre', 'paul', 'michel', 'robert', 'bernard', 'jacques', 'louis',
-                'john', 'mary', 'james', 'patricia', 'michael', 'linda', 'william', 'elizabeth', 'david', 'barbara',
-                'richard', 'susan', 'joseph', 'jessica', 'thomas', 'sarah', 'charles', 'karen', 'christopher', 'nancy',
-                'daniel', 'lisa', 'matthew', 'betty', 'anthony', 'helen', 'mark', 'sandra', 'donald', 'donna',
-                'steven', 'carol', 'paul', 'ruth', 'andrew', 'sharon', 'joshua', 'michelle', 'kenneth', 'laura',
-                'kevin', 'sarah', 'brian', 'kimberly', 'george', 'deborah', 'edward', 'dorothy', 'ronald', 'lisa',
-                'tim', 'nancy', 'jason', 'karen', 'jeffrey', 'betty', 'ryan', 'helen', 'jacob', 'sandra'
-            }
-            
-            for match in re.finditer(single_name_pattern, text):
-                candidate = match.group()
-                # Check if already detected
-                overlap = any(start <= match.start() < end or start < match.end() <= end 
-                            for _, _, start, end in entities)
-                if not overlap and candidate.lower() in common_names and self._is_valid_person_name(candidate):
-                    entities.append((candidate, 'PERSON', match.start(), match.end()))
-            
-            return entities
-        else:
-            # Regex fallback - more conservative
-            entities = []
+            return self._detect_doc(self.nlp(text), text)
+        return self._detect_regex(text)
+
+    def detect_batch(self, texts):
+        """
+        Detect entities in many texts at once using nlp.pipe.
+        Returns one entity list per input text, in order.
+        """
+        texts = list(texts)
+        if not self.use_spacy:
+            return [self._detect_regex(text) for text in texts]
+
+        docs = self.nlp.pipe(texts, batch_size=self.batch_size, n_process=self.n_process)
+        return [self._detect_doc(doc, text) for text, doc in zip(texts, docs)]
+
+    def _detect_doc(self, doc, text: str):
+        """Collect entities from a processed doc plus the regex passes."""
+        entities = []
+        
+        for ent in doc.ents:
+            entity_text = ent.text.strip()
             
-            # Look for email addresses first
-            email_pattern = r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b'
-            for match in re.finditer(email_pattern, text):
+            # Filter person entities more carefully
+            if ent.label_ in ['PERSON', 'PER']:
+                if self._is_valid_person_name(entity_text):
+                    entities.append((entity_text, 'PERSON', ent.start_char, ent.end_char))
+            elif ent.label_ in ['EMAIL']:
+                entities.append((entity_text, 'EMAIL', ent.start_char, ent.end_char))
+            elif ent.label_ in ['ORG']:
+                # Organization names
+                entities.append((entity_text, 'ORGANIZATION', ent.start_char, ent.end_char))
+        
+        # Detect ages with regex
+        for match in AGE_RE.finditer(text):
+            age_num = match.group(1) or match.group(2)
+            if age_num and 16 <= int(age_num) <= 99:  # Reasonable age range
+                entities.append((match.group(), 'AGE', match.start(), match.end()))
+        
+        # Spans accepted so far, for logarithmic overlap checks in the passes below
+        accepted = IntervalIndex((start, end) for _, _, start, end in entities)
+        
+        # Also detect standalone reasonable ages in context
+        for match in AGE_CONTEXT_RE.finditer(text):
+            # Check if already detected
+            if accepted.add_if_free(match.start(), match.end()):
+                entities.append((match.group(), 'AGE', match.start(), match.end()))
+        
+        # Also detect emails with regex (spaCy often misses them)
+        for match in EMAIL_RE.finditer(text):
+            # Check if already detected
+            if accepted.add_if_free(match.start(), match.end()):
                 entities.append((match.group(), 'EMAIL', match.start(), match.end()))
-            
-            # Conservative name detection - only clear first+last name patterns
-            name_pattern = r'\b[A-Z][a-z]+ [A-Z][a-z]+\b'
-            for match in re.finditer(name_pattern, text):
-                candidate = match.group()
-                if self._is_valid_person_name(candidate):
-                    entities.append((candidate, 'PERSON', match.start(), match.end()))
-            
-            # Age detection
-            age_pattern = r'\b(?:âgé(?:e)?\s+de\s+)?(\d{1,2})\s+ans?\b|\b(\d{1,2})\s+years?\s+old\b'
-            for match in re.finditer(age_pattern, text, re.IGNORECASE):
-                age_num = match.group(1) or match.group(2)
-                if age_num and 16 <= int(age_num) <= 99:
-                    entities.append((match.group(), 'AGE', match.start(), match.end()))
-            
-            return entities
+        
+        # Enhanced name detection - catch single names that spaCy might miss
+        for match in SINGLE_NAME_RE.finditer(text):
+            candidate = match.group()
+            # Check if already detected
+            if accepted.overlaps(match.start(), match.end()):
+                continue
+            if candidate.lower() in COMMON_FIRST_NAMES and self._is_valid_person_name(candidate):
+                accepted.add(match.start(), match.end())
+                entities.append((candidate, 'PERSON', match.start(), match.end()))
+        
+        return entities
+
+    def _detect_regex(self, text: str):
+        """Regex fallback when no spaCy model is available."""
+        # Regex fallback - more conservative
+        entities = []
+        
+        # Look for email addresses first
+        for match in EMAIL_RE.finditer(text):
+            entities.append((match.group(), 'EMAIL', match.start(), match.end()))
+        
+        # Conservative name detection - only clear first+last name patterns
+        for match in FULL_NAME_RE.finditer(text):
+            candidate = match.group()
+            if self._is_valid_person_name(candidate):
+                entities.append((candidate, 'PERSON', match.start(), match.end()))
+        
+        # Age detection
+        for match in AGE_RE.finditer(text):
+            age_num = match.group(1) or match.group(2)
+            if age_num and 16 <= int(age_num) <= 99:
+                entities.append((match.group(), 'AGE', match.start(), match.end()))
+        
+        return entities
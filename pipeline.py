@@ -1,18 +1,169 @@
-from detectors.spacy_detector import SpacyDetector
-from detectors.llm_detector import LLMDetector
+import os
+import re
+import time
+
+from detectors.chunking import merge_entities
+from detectors.registry import get_registry
 from replacers.faker_replacer import FakerReplacer
+from utils.metrics import new_timings
+
+# Split after blank lines, keeping them with the preceding paragraph
+PARAGRAPH_BREAK_RE = re.compile(r'(?<=\n\n)(?=[^\n])')
+
+
+def split_paragraphs(text):
+    """Split text into paragraphs whose concatenation is exactly text."""
+    return PARAGRAPH_BREAK_RE.split(text)
+
 
 class AnonymizerPipeline:
-    def __init__(self, detector="spacy", replacer=None):
-        if detector == "spacy":
-            self.detector = SpacyDetector()
-        elif detector == "llm":
-            self.detector = LLMDetector()
-        else:
-            raise ValueError("Unknown detector type")
-
-        self.replacer = replacer or FakerReplacer()
-
-    def anonymize(self, text: str):
-        entities = self.detector.detect(text)
-        return self.replacer.replace(text, entities)
+    def __init__(self, detector="spacy", replacer=None, model=None, registry=None, timings=None,
+                 gazetteer=None, document_id=None):
+        # Detectors are borrowed from the process-wide registry so the model is
+        # only loaded once; the replacer (and its mapping) belongs to this pipeline.
+        # timings (see utils.metrics) records per-stage wall time for this run.
+        # gazetteer (default: GAZETTEER) adds always-redacted term lists on top
+        # of the detector; see detectors.gazetteer for the spec format. A "chain"
+        # detector (see detectors.chain) runs the gazetteer as one of its stages.
+        self.registry = registry or get_registry()
+        self.timings = timings or new_timings()
+        self.detector_type = detector
+        self.model = model
+        with self.timings.stage('load'):
+            self.detector = self.registry.get_cached(detector, model)
+            gazetteer = os.getenv('GAZETTEER') if gazetteer is None else gazetteer
+            if gazetteer and detector != 'chain':
+                self.gazetteer = self.registry.get_cached('gazetteer', gazetteer)
+            else:
+                self.gazetteer = None
+
+            self.document = None
+            if document_id is not None and self.registry.document_store is not None:
+                self.document = self.registry.document_store.open(document_id, self._detector_identity())
+
+            # Without a shared mapping store, the document keeps its own pseudonyms
+            mapping_store = self.registry.mapping_store
+            if mapping_store is None:
+                mapping_store = self.document
+            self.replacer = replacer or FakerReplacer(faker=self.registry.get_faker(),
+                                                      mapping_store=mapping_store,
+                                                      pool=self.registry.get_pseudonym_pool())
+
+    def _detector_identity(self):
+        """Which detector(s) produced a result, so stale detections are never reused."""
+        detectors = [self.detector] + ([self.gazetteer] if self.gazetteer is not None else [])
+        return "|".join(
+            f"{getattr(detector, 'model_name', None)}:{getattr(detector, 'model_version', None)}"
+            for detector in detectors
+        )
+
+    def detect(self, text: str):
+        if self.document is not None:
+            return self.detect_batch([text])[0]
+        started = time.perf_counter()
+        with self.timings.stage('detect'):
+            entities = self.detector.detect(text)
+            if self.gazetteer is not None:
+                entities = merge_entities(entities + self.gazetteer.detect(text))
+        self.registry.record_inference(self.detector_type, self.model, time.perf_counter() - started)
+        self.timings.count('input_chars', len(text))
+        self.timings.count('entities', len(entities))
+        return entities
+
+    def detect_batch(self, texts):
+        """
+        Detect entities in several texts, batching when the detector supports it
+        """
+        texts = list(texts)
+        if self.document is None:
+            return self._detect_texts(texts)
+
+        # Incremental mode: only segments not seen in the last version are detected
+        results = [self.document.lookup(text) for text in texts]
+        missing = [index for index, entities in enumerate(results) if entities is None]
+        detected = self._detect_texts([texts[index] for index in missing]) if missing else []
+        for index, entities in zip(missing, detected):
+            self.document.remember(texts[index], entities)
+            results[index] = entities
+        self.timings.count('segments_reused', len(texts) - len(missing))
+        self.timings.count('segments_detected', len(missing))
+        return results
+
+    def _detect_texts(self, texts):
+        started = time.perf_counter()
+        with self.timings.stage('detect'):
+            if hasattr(self.detector, 'detect_batch'):
+                results = self.detector.detect_batch(texts)
+            else:
+                results = [self.detector.detect(text) for text in texts]
+            if self.gazetteer is not None:
+                results = [merge_entities(entities + extra)
+                           for entities, extra in zip(results, self.gazetteer.detect_batch(texts))]
+        self.registry.record_inference(self.detector_type, self.model, time.perf_counter() - started)
+        self.timings.count('input_chars', sum(len(text) for text in texts))
+        self.timings.count('entities', sum(len(entities) for entities in results))
+        return results
+
+    def detect_document(self, text: str):
+        """
+        Detect a whole document. In incremental mode it is detected paragraph by
+        paragraph so unchanged paragraphs can be reused.
+        """
+        if self.document is None:
+            return self.detect(text)
+        return self._detect_segments(split_paragraphs(text))
+
+    def save_document(self):
+        """Persist the incremental state for the next version (no-op without a document_id)."""
+        if self.document is not None:
+            self.document.save()
+
+    def _detect_segments(self, segments, progress=None):
+        """Detect segments as one batch; entity offsets are rebased onto their concatenation."""
+        entities = []
+        offset = 0
+        for segment, segment_entities in zip(segments, self.detect_batch(segments)):
+            for ent_text, ent_label, start, end in segment_entities:
+                entities.append((ent_text, ent_label, start + offset, end + offset))
+            offset += len(segment)
+        if progress:
+            progress('detect', 1.0)
+        return entities
+
+    def plan_segments(self, segments, progress=None):
+        """
+        Like anonymize_segments, but return (full_text, plan) without rewriting,
+        for engines that edit documents in place (see FakerReplacer.plan).
+        """
+        segments = list(segments)
+        text = "".join(segments)
+        entities = self._detect_segments(segments, progress)
+        with self.timings.stage('replace'):
+            plan = self.replacer.plan(text, entities)
+        if progress:
+            progress('replace', 1.0)
+        return text, plan
+
+    def anonymize_segments(self, segments, progress=None):
+        """
+        Anonymize a document made of several segments (pages, paragraphs).
+        Segments are detected as one batch and concatenated verbatim.
+        progress(stage, fraction) is called as detection and replacement finish.
+        """
+        segments = list(segments)
+        entities = self._detect_segments(segments, progress)
+        with self.timings.stage('replace'):
+            anonymized_text = self.replacer.replace("".join(segments), entities)
+        if progress:
+            progress('replace', 1.0)
+        return anonymized_text
+
+    def anonymize(self, text: str, progress=None):
+        entities = self.detect_document(text)
+        if progress:
+            progress('detect', 1.0)
+        with self.timings.stage('replace'):
+            anonymized_text = self.replacer.replace(text, entities)
+        if progress:
+            progress('replace', 1.0)
+        return anonymized_text
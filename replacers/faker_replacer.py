@@ -1,11 +1,23 @@
 from faker import Faker
 import random
 
+from replacers.span_engine import resolve_spans, apply_spans
+
 class FakerReplacer:
-    def __init__(self):
-        self.faker = Faker(['en_US', 'fr_FR'])  # Support both English and French
+    def __init__(self, faker=None, propagate=True, mapping_store=None, pool=None):
+        # Faker instances are expensive to build, so callers may share one.
+        # Mappings below are per-replacer; a mapping_store (see replacers.mapping_store)
+        # makes pseudonyms consistent across documents and workers.
+        self.faker = faker or Faker(['en_US', 'fr_FR'])  # Support both English and French
+        self.propagate = propagate  # Also replace other whole-word mentions of detected values
+        self.mapping_store = mapping_store
+        # Pre-generated values (see replacers.pseudonym_pool), unique within this replacer
+        self.pool_draw = pool.for_document() if pool is not None else None
         self.replacements = {}
         self.entity_types = {}  # Track entity types for each replacement
+        # With a mapping store, False serves every replacement from the store without
+        # keeping it here, for inputs with unbounded distinct values (see utils.structured)
+        self.remember = True
         
         # Predefined lists for more realistic replacements
         self.tech_companies = [
@@ -23,25 +35,27 @@ class FakerReplacer:
             "Enterprise Excellence Group"
         ]
 
-    def _get_smart_replacement(self, text: str, entity_type: str) -> str:
-        """Generate contextually appropriate replacements"""
+    def _get_smart_replacement(self, text: str, entity_type: str, faker=None, rng=None) -> str:
+        """Generate contextually appropriate replacements (faker/rng default to the shared ones)"""
+        faker = faker or self.faker
+        rng = rng or random
         if entity_type == "PERSON":
-            return self.faker.name()
+            return faker.name()
         elif entity_type == "GPE":
-            return self.faker.city()
+            return faker.city()
         elif entity_type in ["ORG", "ORGANIZATION"]:
             # Smart organization replacement based on context
             text_lower = text.lower()
             if any(word in text_lower for word in ['tech', 'digital', 'software', 'data', 'ai', 'intelligence', 'holokia']):
-                return random.choice(self.tech_companies)
+                return rng.choice(self.tech_companies)
             elif any(word in text_lower for word in ['consulting', 'conseil', 'advisory', 'partners']):
-                return random.choice(self.consulting_firms)
+                return rng.choice(self.consulting_firms)
             else:
-                return self.faker.company()
+                return faker.company()
         elif entity_type == "EMAIL":
-            return self.faker.email()
+            return faker.email()
         elif entity_type == "PHONE":
-            return self.faker.phone_number()
+            return faker.phone_number()
         elif entity_type == "AGE":
             # Extract the number and generate a similar age
             import re
@@ -49,7 +63,7 @@ class FakerReplacer:
             if age_match:
                 original_age = int(age_match.group())
                 # Generate age within +/- 5 years, keeping it realistic
-                new_age = max(18, min(65, original_age + random.randint(-5, 5)))
+                new_age = max(18, min(65, original_age + rng.randint(-5, 5)))
                 
                 # Try to preserve the format
                 if 'ans' in text.lower():
@@ -62,17 +76,50 @@ class FakerReplacer:
         else:
             return f"[REDACTED_{entity_type}]"
 
+    def _generate(self, text: str, entity_type: str, faker=None, rng=None) -> str:
+        """Generator for mapping stores: their seeded faker if given, else this replacer's pool draw."""
+        return self._get_smart_replacement(text, entity_type, faker=faker or self.pool_draw, rng=rng)
+
+    def _replacement_for(self, ent_text: str, ent_label: str) -> str:
+        """Return the replacement for an entity, reusing earlier ones for consistency."""
+        if ent_text not in self.replacements:
+            if self.mapping_store is not None:
+                replacement = self.mapping_store.get_or_create(ent_label, ent_text, self._generate)
+                if not self.remember:
+                    return replacement
+                self.replacements[ent_text] = replacement
+            else:
+                self.replacements[ent_text] = self._get_smart_replacement(ent_text, ent_label, faker=self.pool_draw)
+            # Store the entity type
+            self.entity_types[ent_text] = ent_label
+        return self.replacements[ent_text]
+
+    def plan(self, text: str, entities: list):
+        """
+        Resolve entities to non-overlapping spans with their replacements,
+        without rewriting the text: [(start, end, ent_text, ent_label, replacement)].
+        Used by engines that rewrite documents in place (PDF runs, DOCX runs).
+        """
+        return [
+            (start, end, ent_text, ent_label, self._replacement_for(ent_text, ent_label))
+            for start, end, ent_text, ent_label in resolve_spans(text, entities, propagate=self.propagate)
+        ]
+
+    def replace_with_offsets(self, text: str, entities: list):
+        """
+        Replace detected entities in a single pass.
+        Returns (anonymized_text, offset_map), see replacers.span_engine.apply_spans.
+        """
+        spans = resolve_spans(text, entities, propagate=self.propagate)
+        return apply_spans(text, spans, self._replacement_for)
+
     def replace(self, text: str, entities: list):
         """Replace detected entities in text with fake values."""
-        new_text = text
-        for ent_text, ent_label, start, end in entities:
-            if ent_text not in self.replacements:
-                self.replacements[ent_text] = self._get_smart_replacement(ent_text, ent_label)
-                # Store the entity type
-                self.entity_types[ent_text] = ent_label
+        return self.replace_with_offsets(text, entities)[0]
 
-            new_text = new_text.replace(ent_text, self.replacements[ent_text])
-        return new_text
+    def replace_value(self, value: str, entity_type: str):
+        """Replace a value known to be one entity (e.g. a typed CSV column), without detection."""
+        return self._replacement_for(value, entity_type)
     
     def get_replacements_with_types(self):
         """Get replacements with their entity types."""
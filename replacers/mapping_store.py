@@ -0,0 +1,252 @@
+"""
+Mapping Store - Consistent pseudonyms across documents and workers
+
+Every (entity type, original value) pair is identified by an HMAC of the pair
+under a secret key, so stores never contain the original values. The same key
+also seeds the fake-value generator: any worker sharing the secret produces
+the same pseudonym without asking anyone, and the store only has to remember
+values so they survive generator changes (new Faker versions, locales).
+
+Two values can still draw the same pseudonym. Backends keep a reverse index
+(pseudonym -> key), and a pseudonym that already belongs to another key is
+replaced by its first free numeric variant ("Jane Doe 2"), so values stay
+distinguishable.
+
+Backends:
+  * memory - a dict, per process; optionally bounded (LRU), which is safe since
+    an evicted pseudonym is generated again from its key (the same one, unless
+    it was a collision variant)
+  * sqlite - one table keyed by the HMAC; lookups hit the primary key index
+    and nothing is loaded up front, so it scales to millions of entries
+  * file   - one small file per entry in a sharded directory, suitable for a
+    directory shared between machines
+"""
+import hashlib
+import hmac
+import os
+import random
+import secrets
+import sqlite3
+import threading
+from collections import OrderedDict
+
+from faker import Faker
+
+from replacers.pseudonym_pool import unique_variant
+
+
+class MemoryMappingBackend:
+    def __init__(self, max_entries=None):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._owners = {}  # Reverse index: pseudonym -> key
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        if self.max_entries is None:
+            return self._entries.get(key)
+        with self._lock:
+            replacement = self._entries.get(key)
+            if replacement is not None:
+                self._entries.move_to_end(key)
+            return replacement
+
+    def claim(self, key, replacement):
+        """
+        Store replacement for key unless key already has one; returns the
+        stored value, or None when replacement already belongs to another key.
+        """
+        with self._lock:
+            stored = self._entries.get(key)
+            if stored is not None:
+                return stored
+            if self._owners.get(replacement, key) != key:
+                return None
+            self._entries[key] = replacement
+            self._owners[replacement] = key
+            if self.max_entries is not None:
+                while len(self._entries) > self.max_entries:
+                    _, evicted = self._entries.popitem(last=False)
+                    del self._owners[evicted]
+            return replacement
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class SQLiteMappingBackend:
+    def __init__(self, path):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS mappings (key TEXT PRIMARY KEY, replacement TEXT NOT NULL)")
+        # Reverse index; filled from mappings for stores created before it existed
+        has_owners = self._conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'owners'").fetchone()
+        self._conn.execute("CREATE TABLE IF NOT EXISTS owners (replacement TEXT PRIMARY KEY, key TEXT NOT NULL)")
+        if not has_owners:
+            self._conn.execute("INSERT OR IGNORE INTO owners (replacement, key) SELECT replacement, key FROM mappings")
+
+    def get(self, key):
+        with self._lock:
+            row = self._conn.execute("SELECT replacement FROM mappings WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def claim(self, key, replacement):
+        with self._lock:
+            # IMMEDIATE takes the write lock up front, so other processes can't interleave
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute("SELECT replacement FROM mappings WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    return row[0]  # Another process wrote the key first; its value wins
+                owner = self._conn.execute("SELECT key FROM owners WHERE replacement = ?", (replacement,)).fetchone()
+                if owner is not None and owner[0] != key:
+                    return None
+                self._conn.execute("INSERT OR IGNORE INTO owners (replacement, key) VALUES (?, ?)", (replacement, key))
+                self._conn.execute("INSERT INTO mappings (key, replacement) VALUES (?, ?)", (key, replacement))
+                return replacement
+            finally:
+                self._conn.execute("COMMIT")
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM mappings").fetchone()[0]
+
+
+class FileMappingBackend:
+    """
+    One file per key under directory/ab/cd/<key>, and one per pseudonym under
+    directory/owners/ holding its key; writes are atomic and first writer wins.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], key[2:4], key)
+
+    def _owner_path(self, replacement):
+        digest = hashlib.sha256(replacement.encode('utf-8')).hexdigest()
+        return os.path.join(self.directory, 'owners', digest[:2], digest)
+
+    def _read(self, path):
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def _create(self, path, content):
+        """Write path unless it exists; returns True if this call created it."""
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f"{path}.{secrets.token_hex(4)}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            f.write(content)
+        try:
+            # link() fails if the path exists, unlike replace(), so the first writer wins
+            os.link(temp_path, path)
+            return True
+        except FileExistsError:
+            return False
+        finally:
+            os.remove(temp_path)
+
+    def get(self, key):
+        return self._read(self._path(key))
+
+    def claim(self, key, replacement):
+        stored = self.get(key)
+        if stored is not None:
+            return stored
+        owner_path = self._owner_path(replacement)
+        if not self._create(owner_path, key) and self._read(owner_path) != key:
+            return None
+        if not self._create(self._path(key), replacement):
+            # Another writer stored this key first: release the pseudonym we reserved
+            if self._read(self._path(key)) != replacement:
+                os.remove(owner_path)
+        return self.get(key)
+
+
+class MappingStore:
+    LOCALES = ('en_US', 'fr_FR')
+
+    def __init__(self, backend=None, secret=None):
+        self.backend = backend if backend is not None else MemoryMappingBackend()
+        if secret is None:
+            print("⚠️ MAPPING_SECRET is not set: pseudonyms are only consistent within this process")
+            secret = secrets.token_bytes(32)
+        self._secret = secret.encode('utf-8') if isinstance(secret, str) else secret
+        # Seeding a Faker is global to that instance, so the store keeps its own
+        self._faker = None
+        self._generate_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.collisions = 0
+
+    def key(self, entity_type, value):
+        message = f"{entity_type}\x1f{value}".encode('utf-8')
+        return hmac.new(self._secret, message, hashlib.sha256).hexdigest()
+
+    def get_or_create(self, entity_type, value, generate):
+        """
+        Return the pseudonym for (entity_type, value). On a miss it is produced
+        by generate(value, entity_type, faker, rng) with a faker and rng seeded
+        from the key, so every worker generates the same one.
+        """
+        key = self.key(entity_type, value)
+        replacement = self.backend.get(key)
+        if replacement is not None:
+            self.hits += 1
+            return replacement
+
+        self.misses += 1
+        seed = int(key[:16], 16)
+        rng = random.Random(seed)
+        with self._generate_lock:
+            if self._faker is None:
+                self._faker = Faker(list(self.LOCALES))
+            # A multi-locale Faker picks the locale with a global RNG, so pick it here
+            generator = self._faker[rng.choice(self.LOCALES)]
+            generator.seed_instance(seed)
+            replacement = generate(value, entity_type, generator, rng)
+
+        # Another value may already have this pseudonym: take the first free variant
+        stored = self.backend.claim(key, replacement)
+        tried = {replacement}
+        while stored is None:
+            candidate = unique_variant(replacement, tried.__contains__)
+            tried.add(candidate)
+            stored = self.backend.claim(key, candidate)
+        if len(tried) > 1:
+            self.collisions += 1
+        return stored
+
+    def stats(self):
+        return {
+            'backend': type(self.backend).__name__,
+            'entries': len(self.backend) if hasattr(self.backend, '__len__') else None,
+            'hits': self.hits,
+            'misses': self.misses,
+            'collisions': self.collisions,
+        }
+
+    @classmethod
+    def from_env(cls):
+        """
+        Build the store from MAPPING_STORE* environment variables,
+        or return None when MAPPING_STORE is unset (per-document mappings).
+        """
+        kind = os.getenv('MAPPING_STORE', 'none')
+        secret = os.getenv('MAPPING_SECRET') or None
+        if kind == 'none':
+            return None
+        elif kind == 'memory':
+            return cls(MemoryMappingBackend(), secret)
+        elif kind == 'sqlite':
+            return cls(SQLiteMappingBackend(os.getenv('MAPPING_STORE_PATH', 'mappings.sqlite3')), secret)
+        elif kind == 'file':
+            return cls(FileMappingBackend(os.getenv('MAPPING_STORE_PATH', 'mappings')), secret)
+        raise ValueError(f"Unknown mapping store: {kind}")
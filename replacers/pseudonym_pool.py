@@ -0,0 +1,156 @@
+"""
+Pseudonym Pool - Pre-generated replacement values
+
+A multi-locale Faker call costs tens of microseconds (locale selection,
+provider lookup, formatting), paid for every new entity. The pool generates
+values per (Faker method, locale) in batches on a background thread and keeps
+each pool above a low watermark, so replacing an entity is a deque pop.
+
+Each document draws through its own PoolDraw, which never hands out the same
+value twice within that document. Deterministic mappings (see
+replacers.mapping_store) take precedence and bypass the pool entirely.
+"""
+import os
+import random
+import threading
+from collections import deque
+
+from faker import Faker
+
+# Faker methods used by FakerReplacer._get_smart_replacement
+POOLED_METHODS = ('name', 'city', 'email', 'phone_number', 'company')
+
+
+class PseudonymPool:
+    def __init__(self, size=500, low_watermark=None, locales=('en_US', 'fr_FR'), background=True):
+        self.size = size
+        self.low_watermark = low_watermark if low_watermark is not None else size // 4
+        self.locales = tuple(locales)
+        self._faker = Faker(list(self.locales))
+        self._generate_lock = threading.Lock()  # Faker generators aren't thread-safe
+        self._pools = {(method, locale): deque() for method in POOLED_METHODS for locale in self.locales}
+        self._refill_needed = threading.Event()
+        self.hits = 0
+        self.misses = 0
+        if background:
+            self._refill_needed.set()  # The initial fill happens off the caller's thread too
+            thread = threading.Thread(target=self._refill_loop, name="pseudonym-pool-refill", daemon=True)
+            thread.start()
+        else:
+            self.refill()
+
+    def _generate(self, method, locale, count):
+        generator = getattr(self._faker[locale], method)
+        values = []
+        for _ in range(count):
+            # Locked per value so inline misses never wait for a whole batch
+            with self._generate_lock:
+                values.append(generator())
+        return values
+
+    def refill(self):
+        """Top up every pool that fell below the low watermark."""
+        for (method, locale), pool in self._pools.items():
+            if len(pool) <= self.low_watermark:
+                pool.extend(self._generate(method, locale, self.size - len(pool)))
+
+    def _refill_loop(self):
+        while True:
+            self._refill_needed.wait()
+            self._refill_needed.clear()
+            self.refill()
+
+    def take(self, method, locale=None):
+        """Pop a value for a Faker method, generating one inline if the pool ran dry."""
+        locale = locale or random.choice(self.locales)
+        pool = self._pools[(method, locale)]
+        try:
+            value = pool.popleft()
+            self.hits += 1
+        except IndexError:
+            value = self._generate(method, locale, 1)[0]
+            self.misses += 1
+        if len(pool) <= self.low_watermark:
+            self._refill_needed.set()
+        return value
+
+    def for_document(self):
+        return PoolDraw(self)
+
+    def stats(self):
+        return {
+            'size': self.size,
+            'low_watermark': self.low_watermark,
+            'available': {f"{method}:{locale}": len(pool) for (method, locale), pool in self._pools.items()},
+            'hits': self.hits,
+            'misses': self.misses,
+        }
+
+    @classmethod
+    def from_env(cls):
+        """
+        Build the pool from PSEUDONYM_POOL_* environment variables,
+        or return None when PSEUDONYM_POOL_SIZE is 0.
+        """
+        size = int(os.getenv('PSEUDONYM_POOL_SIZE', '500'))
+        if size <= 0:
+            return None
+        low_watermark = os.getenv('PSEUDONYM_POOL_LOW_WATERMARK')
+        return cls(size=size, low_watermark=int(low_watermark) if low_watermark else None)
+
+
+def unique_variant(value, is_taken):
+    """
+    value with the smallest numeric suffix (before the @ of an email) for which
+    is_taken(candidate) is false.
+    """
+    local, at, domain = value.partition('@')
+    email = bool(at) and ' ' not in value
+    number = 2
+    while True:
+        candidate = f"{local}{number}@{domain}" if email else f"{value} {number}"
+        if not is_taken(candidate):
+            return candidate
+        number += 1
+
+
+class PoolDraw:
+    """
+    Faker-like view of a pool for one document: exposes the pooled Faker
+    methods and never returns a value already used in the document.
+    """
+
+    MAX_ATTEMPTS = 20
+
+    def __init__(self, pool):
+        self.pool = pool
+        self.used = set()
+
+    def _draw(self, method):
+        for _ in range(self.MAX_ATTEMPTS):
+            value = self.pool.take(method)
+            if value not in self.used:
+                break
+        else:
+            # Faker keeps producing values already used here: make one unique
+            value = self._unique_variant(method, value)
+        self.used.add(value)
+        return value
+
+    def _unique_variant(self, method, value):
+        return unique_variant(value, self.used.__contains__)
+
+    def name(self):
+        return self._draw('name')
+
+    def city(self):
+        return self._draw('city')
+
+    def email(self):
+        return self._draw('email')
+
+    def phone_number(self):
+        return self._draw('phone_number')
+
+    def company(self):
+        return self._draw('company')
@@ -0,0 +1,123 @@
+"""
+Span Engine - Single-pass replacement of detected entity spans
+
+Detected entities are (text, label, start, end) tuples. The engine anchors them
+to the text, resolves overlaps once, then builds the output with one list join
+instead of calling str.replace on the whole document for every entity.
+"""
+import bisect
+import re
+
+
+def _anchor(text, ent_text, start, end):
+    """
+    Return the (start, end) positions of ent_text, or None if it isn't in the text.
+    Detectors strip entity text and LLMs sometimes report approximate offsets,
+    so the reported range is only trusted when it actually contains the entity.
+    """
+    if ent_text and isinstance(start, int) and isinstance(end, int) and 0 <= start < end <= len(text):
+        if text[start:end] == ent_text:
+            return start, end
+        inner = text.find(ent_text, start, end)
+        if inner != -1:
+            return inner, inner + len(ent_text)
+    return None
+
+
+def resolve_spans(text, entities, propagate=True):
+    """
+    Turn detected entities into sorted, non-overlapping (start, end, text, label) spans.
+
+    With propagate=True, every other whole-word occurrence of a detected value
+    is replaced as well (the detector may only have flagged its first mention),
+    but never a substring of an unrelated word.
+    """
+    candidates = []
+    labels = {}
+    unanchored = set()
+
+    for ent_text, ent_label, start, end in entities:
+        if not ent_text:
+            continue
+        labels.setdefault(ent_text, ent_label)
+        position = _anchor(text, ent_text, start, end)
+        if position is None:
+            unanchored.add(ent_text)
+        else:
+            candidates.append((position[0], position[1], ent_text, ent_label))
+
+    # Values whose offsets were wrong still have to be found somewhere
+    search_values = set(labels) if propagate else unanchored
+    if search_values:
+        alternation = "|".join(re.escape(value) for value in sorted(search_values, key=len, reverse=True))
+        pattern = re.compile(r"(?<!\w)(?:" + alternation + r")(?!\w)")
+        for match in pattern.finditer(text):
+            value = match.group()
+            candidates.append((match.start(), match.end(), value, labels[value]))
+
+    # Earliest start wins; on ties the longest span wins
+    candidates.sort(key=lambda span: (span[0], span[0] - span[1]))
+    spans = []
+    last_end = -1
+    for span in candidates:
+        if span[0] >= last_end:
+            spans.append(span)
+            last_end = span[1]
+    return spans
+
+
+def apply_spans(text, spans, replacement_for):
+    """
+    Build the anonymized text in a single pass.
+
+    replacement_for(ent_text, label) returns the replacement for one span.
+    Returns (anonymized_text, offset_map) where offset_map is a list of
+    (original_start, original_end, new_start, new_end, ent_text, ent_label)
+    per replaced span.
+    """
+    parts = []
+    offset_map = []
+    cursor = 0
+    new_length = 0
+
+    for start, end, ent_text, ent_label in spans:
+        parts.append(text[cursor:start])
+        new_length += start - cursor
+
+        replacement = replacement_for(ent_text, ent_label)
+        parts.append(replacement)
+        offset_map.append((start, end, new_length, new_length + len(replacement), ent_text, ent_label))
+        new_length += len(replacement)
+        cursor = end
+
+    parts.append(text[cursor:])
+    return "".join(parts), offset_map
+
+
+def apply_plan(text, plan):
+    """
+    Build the anonymized text from a plan of
+    (start, end, ent_text, ent_label, replacement) spans (see FakerReplacer.plan).
+    """
+    parts = []
+    cursor = 0
+    for start, end, _, _, replacement in plan:
+        parts.append(text[cursor:start])
+        parts.append(replacement)
+        cursor = end
+    parts.append(text[cursor:])
+    return "".join(parts)
+
+
+def translate_offset(offset_map, position):
+    """
+    Map a position in the original text to the anonymized text.
+    Positions inside a replaced span map to the start of its replacement.
+    """
+    index = bisect.bisect_right(offset_map, (position, float('inf'))) - 1
+    if index < 0:
+        return position
+    start, end, new_start, new_end = offset_map[index]
+    if position < end:
+        return new_start
+    return new_end + (position - end)
@@ -6,6 +6,10 @@ import docx
 from docx import Document
 import os
 import tempfile
+from utils.pdf_extraction import count_pages, extract_pdf_pages, iter_pdf_pages
+from utils.docx_rewriting import DocxRewriter
+from utils.pdf_redaction import PDFRedactor, RedactionIncomplete
+from utils.structured import StructuredAnonymizer, parse_columns
 from reportlab.pdfgen import canvas
 from reportlab.lib.pagesizes import letter, A4
 from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
@@ -18,11 +22,31 @@ from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.units import inch
 
 class DocumentProcessor:
-    def __init__(self, pipeline):
+    def __init__(self, pipeline, progress=None, streaming_pages=None, preview_chars=20000, pdf_output=None,
+                 columns=None):
         """
-        Initialize with an anonymization pipeline
+        Initialize with an anonymization pipeline.
+        progress(stage, fraction) is called with stages extract, detect, replace and render.
+        PDFs with at least streaming_pages pages are processed page by page
+        (None reads PDF_STREAMING_PAGES; a negative value disables streaming).
+        pdf_output is "rewrite" (re-typeset the anonymized text) or "redact"
+        (edit the original PDF in place); None reads PDF_OUTPUT_MODE.
+        columns holds the CSV/JSONL column rules (see utils.structured);
+        None reads STRUCTURED_COLUMNS.
         """
         self.pipeline = pipeline
+        self.progress = progress
+        if streaming_pages is None:
+            streaming_pages = int(os.getenv('PDF_STREAMING_PAGES', '50'))
+        self.streaming_pages = streaming_pages if streaming_pages >= 0 else None
+        self.preview_chars = preview_chars
+        self.pdf_output = pdf_output or os.getenv('PDF_OUTPUT_MODE', 'rewrite')
+        self.columns = columns if columns is not None else parse_columns(os.getenv('STRUCTURED_COLUMNS'))
+        self.timings = pipeline.timings
+
+    def _report(self, stage, fraction=1.0):
+        if self.progress:
+            self.progress(stage, fraction)
     
     def anonymize_txt(self, file_path, output_path=None):
         """
@@ -30,11 +54,12 @@ class DocumentProcessor:
         """
         try:
             # Read text content
-            with open(file_path, 'r', encoding='utf-8') as f:
+            with self.timings.stage('extract'), open(file_path, 'r', encoding='utf-8') as f:
                 text_content = f.read()
+            self._report('extract')
             
             # Anonymize the text
-            anonymized_text = self.pipeline.anonymize(text_content)
+            anonymized_text = self.pipeline.anonymize(text_content, progress=self.progress)
             
             # Get replacement mapping for statistics
             replacement_details = self.pipeline.replacer.get_replacements_with_types()
@@ -46,8 +71,9 @@ class DocumentProcessor:
             if output_path is None:
                 output_path = file_path.replace('.txt', '_anonymized.txt')
             
-            with open(output_path, 'w', encoding='utf-8') as f:
+            with self.timings.stage('write'), open(output_path, 'w', encoding='utf-8') as f:
                 f.write(anonymized_text)
+            self._report('render')
             
             return {
                 'success': True,
@@ -65,21 +91,171 @@ class DocumentProcessor:
                 'error': f'Error processing TXT: {str(e)}'
             }
 
+    def _iter_pdf_pages(self, file_path, page_count):
+        """
+        Yield (page_number, text) one page at a time. Large files are extracted
+        in parallel a few page ranges ahead (see utils.pdf_extraction), so only
+        those pages' text is held in memory.
+        """
+        pages = iter_pdf_pages(file_path, page_count=page_count,
+                               progress=lambda fraction: self._report('extract', fraction))
+        page_number = 0
+        while True:
+            with self.timings.stage('extract'):
+                page_text = next(pages, None)
+            if page_text is None:
+                return
+            page_number += 1
+            yield page_number, page_text
+
+    def _iter_anonymized_pages(self, pages, page_count):
+        """
+        Detect and replace page by page. The pipeline's replacer is shared by
+        every page, so the same entity gets the same replacement throughout.
+        """
+        for page_number, page_text in pages:
+            entities = self.pipeline.detect(page_text) if page_text.strip() else []
+            self._report('detect', page_number / page_count)
+            with self.timings.stage('replace'):
+                anonymized_text = self.pipeline.replacer.replace(page_text, entities)
+            self._report('replace', page_number / page_count)
+            yield page_number, page_text, anonymized_text
+
+    def anonymize_pdf_streaming(self, file_path, output_path=None):
+        """
+        Anonymize a PDF page by page: extract, detect, replace and render each
+        page before reading the next, so the working set is one page rather
+        than the whole document. Only a preview of the text is kept for display.
+        """
+        try:
+            if output_path is None:
+                output_path = file_path.replace('.pdf', '_anonymized.pdf')
+            
+            original_preview = []
+            anonymized_preview = []
+            preview_left = self.preview_chars
+            
+            writer = SimplePDFWriter(output_path)
+            try:
+                page_count = count_pages(file_path)
+                pages = self._iter_anonymized_pages(self._iter_pdf_pages(file_path, page_count), page_count)
+                for page_number, page_text, anonymized_text in pages:
+                    if anonymized_text.strip():
+                        with self.timings.stage('render'):
+                            writer.write_text(anonymized_text)
+                            writer.new_page()
+                    self._report('render', page_number / page_count)
+                    
+                    if preview_left > 0:
+                        original_preview.append(page_text[:preview_left] + "\n\n")
+                        anonymized_preview.append(anonymized_text[:preview_left] + "\n\n")
+                        preview_left -= len(page_text)
+            finally:
+                with self.timings.stage('write'):
+                    writer.close()
+            
+            # Get replacement mapping for statistics
+            replacement_mapping = {
+                original: replacement
+                for original, replacement, entity_type in self.pipeline.replacer.get_replacements_with_types()
+            }
+            
+            return {
+                'success': True,
+                'output_path': output_path,
+                'original_text': "".join(original_preview),
+                'anonymized_text': "".join(anonymized_preview),
+                'replacement_mapping': replacement_mapping,
+                'message': f'PDF anonymized successfully ({page_count} pages streamed): {os.path.basename(output_path)}',
+                'file_type': 'pdf',
+                'streamed': True,
+                'truncated_preview': preview_left <= 0
+            }
+            
+        except Exception as e:
+            return {
+                'success': False,
+                'error': f'Error processing PDF: {str(e)}'
+            }
+
+    def redact_pdf(self, file_path, output_path=None):
+        """
+        Anonymize a PDF in place: only pages containing entities are touched,
+        every other page is copied through unchanged. Falls back to rewrite
+        mode when entity text can still be extracted from the redacted file.
+        """
+        try:
+            if output_path is None:
+                output_path = file_path.replace('.pdf', '_anonymized.pdf')
+            
+            try:
+                result = PDFRedactor(self.pipeline).redact(file_path, output_path)
+            except RedactionIncomplete as e:
+                print(f"⚠️ Redaction incomplete, re-typesetting instead: {e}")
+                result = self.rewrite_pdf(file_path, output_path)
+                if result['success']:
+                    result['message'] += f" (redaction incomplete: {e})"
+                    result['redaction'] = {'fallback': 'rewrite', 'reason': str(e)}
+                return result
+            self._report('render')
+            
+            # Get replacement mapping for statistics
+            replacement_mapping = {
+                original: replacement
+                for original, replacement, entity_type in self.pipeline.replacer.get_replacements_with_types()
+            }
+            
+            return {
+                'success': True,
+                'output_path': output_path,
+                'original_text': result['original_text'],
+                'anonymized_text': result['anonymized_text'],
+                'replacement_mapping': replacement_mapping,
+                'message': (f"PDF redacted in place ({result['pages_redacted']} of {result['pages_total']} pages changed): "
+                            f"{os.path.basename(output_path)}"),
+                'file_type': 'pdf',
+                'redaction': {
+                    'pages_total': result['pages_total'],
+                    'pages_redacted': result['pages_redacted'],
+                    'entities_located': result['entities_located'],
+                    'runs_rewritten': result['runs_rewritten'],
+                }
+            }
+            
+        except Exception as e:
+            return {
+                'success': False,
+                'error': f'Error redacting PDF: {str(e)}'
+            }
+
     def anonymize_pdf(self, file_path, output_path=None):
         """
         Anonymize a PDF file while creating a proper PDF output
         """
+        if self.pdf_output == 'redact':
+            return self.redact_pdf(file_path, output_path)
+        return self.rewrite_pdf(file_path, output_path)
+
+    def rewrite_pdf(self, file_path, output_path=None):
+        """
+        Anonymize a PDF by re-typesetting its anonymized text
+        """
+        if self.streaming_pages is not None:
+            if count_pages(file_path) >= self.streaming_pages:
+                return self.anonymize_pdf_streaming(file_path, output_path)
+        
         try:
-            # Extract text from PDF
-            text_content = ""
-            with pdfplumber.open(file_path) as pdf:
-                for page in pdf.pages:
-                    page_text = page.extract_text()
-                    if page_text:
-                        text_content += page_text + "\n\n"
-            
-            # Anonymize the text
-            anonymized_text = self.pipeline.anonymize(text_content)
+            # Extract text from PDF, one segment per page (in parallel for large files)
+            with self.timings.stage('extract'):
+                pages = [
+                    page_text + "\n\n"
+                    for page_text in extract_pdf_pages(file_path, progress=lambda fraction: self._report('extract', fraction))
+                    if page_text
+                ]
+            text_content = "".join(pages)
+            
+            # Anonymize the pages as one detection batch
+            anonymized_text = self.pipeline.anonymize_segments(pages, progress=self.progress)
             
             # Get replacement mapping for statistics
             replacement_details = self.pipeline.replacer.get_replacements_with_types()
@@ -91,7 +267,9 @@ class DocumentProcessor:
             if output_path is None:
                 output_path = file_path.replace('.pdf', '_anonymized.pdf')
             
-            self._create_pdf_from_text(anonymized_text, output_path)
+            with self.timings.stage('render'):
+                self._create_pdf_from_text(anonymized_text, output_path)
+            self._report('render')
             
             return {
                 'success': True,
@@ -115,43 +293,25 @@ class DocumentProcessor:
         """
         try:
             # Load the document
-            doc = Document(file_path)
+            with self.timings.stage('extract'):
+                doc = Document(file_path)
             
-            # Extract all text for anonymization mapping
-            full_text = "\n".join([p.text for p in doc.paragraphs if p.text.strip()])
-            
-            # Get anonymization mappings
-            entities = self.pipeline.detector.detect(full_text)
-            
-            # Get replacement mapping from replacer
-            anonymized_full_text = self.pipeline.anonymize(full_text)
-            replacer_details = self.pipeline.replacer.get_replacements_with_types()
+            # Detect once over body, tables, headers and footers, then edit only the affected runs
+            result = DocxRewriter(self.pipeline, progress=self.progress).rewrite(doc)
+            full_text = result['original_text']
+            anonymized_full_text = result['anonymized_text']
             
             replacement_mapping = {}
-            for original, replacement, entity_type in replacer_details:
+            for original, replacement, entity_type in self.pipeline.replacer.get_replacements_with_types():
                 replacement_mapping[original] = replacement
             
-            # Apply replacements to each paragraph while preserving formatting
-            for paragraph in doc.paragraphs:
-                if paragraph.text.strip():
-                    original_text = paragraph.text
-                    new_text = original_text
-                    
-                    # Apply all replacements
-                    for original, replacement in replacement_mapping.items():
-                        new_text = new_text.replace(original, replacement)
-                    
-                    # Update paragraph text if it changed
-                    if new_text != original_text:
-                        # Clear existing runs and add new text
-                        paragraph.clear()
-                        paragraph.add_run(new_text)
-            
             # Save anonymized document
             if output_path is None:
                 output_path = file_path.replace('.docx', '_anonymized.docx')
             
-            doc.save(output_path)
+            with self.timings.stage('write'):
+                doc.save(output_path)
+            self._report('render')
             
             return {
                 'success': True,
@@ -169,7 +329,50 @@ class DocumentProcessor:
                 'error': f'Error processing DOCX: {str(e)}'
             }
 
-    def process_file(self, file_path, file_type=None):
+    def anonymize_structured(self, file_path, file_type, output_path=None):
+        """
+        Anonymize a CSV or JSONL file row by row, streaming the output
+        """
+        try:
+            if output_path is None:
+                base, extension = os.path.splitext(file_path)
+                output_path = f"{base}_anonymized{extension}"
+            
+            anonymizer = StructuredAnonymizer(
+                self.pipeline,
+                columns=self.columns,
+                batch_rows=int(os.getenv('STRUCTURED_BATCH_ROWS', '2000')),
+                preview_chars=self.preview_chars,
+            )
+            if file_type == 'csv':
+                original_preview, anonymized_preview = anonymizer.anonymize_csv(file_path, output_path)
+            else:
+                original_preview, anonymized_preview = anonymizer.anonymize_jsonl(file_path, output_path)
+            self._report('render')
+            self.timings.count('rows', anonymizer.stats['rows'])
+            
+            # Only what the preview shows: a full mapping would grow with the file
+            replacement_mapping = anonymizer.mapping_sample(original_preview)
+            
+            return {
+                'success': True,
+                'output_path': output_path,
+                'original_text': original_preview,
+                'anonymized_text': anonymized_preview,
+                'replacement_mapping': replacement_mapping,
+                'message': f"{file_type.upper()} anonymized successfully ({anonymizer.stats['rows']} rows): "
+                           f"{os.path.basename(output_path)}",
+                'file_type': file_type,
+                'structured': anonymizer.stats,
+            }
+            
+        except Exception as e:
+            return {
+                'success': False,
+                'error': f'Error processing {file_type.upper()}: {str(e)}'
+            }
+
+    def process_file(self, file_path, file_type=None, output_path=None):
         """
         Process any supported file type
         """
@@ -177,16 +380,23 @@ class DocumentProcessor:
             file_type = file_path.split('.')[-1].lower()
         
         if file_type == 'pdf':
-            return self.anonymize_pdf(file_path)
+            result = self.anonymize_pdf(file_path, output_path)
         elif file_type in ['docx', 'doc']:
-            return self.anonymize_docx(file_path)
+            result = self.anonymize_docx(file_path, output_path)
         elif file_type == 'txt':
-            return self.anonymize_txt(file_path)
+            result = self.anonymize_txt(file_path, output_path)
+        elif file_type in ['csv', 'jsonl']:
+            result = self.anonymize_structured(file_path, file_type, output_path)
         else:
             return {
                 'success': False,
                 'error': f'Unsupported file type: {file_type}'
             }
+        
+        # Keep incremental state only for versions that were fully processed
+        if result['success']:
+            self.pipeline.save_document()
+        return result
 
     def _create_pdf_from_text(self, text, output_path):
         """
@@ -235,50 +445,63 @@ class DocumentProcessor:
         Fallback method to create a simple PDF using canvas
         """
         try:
-            c = canvas.Canvas(output_path, pagesize=A4)
-            width, height = A4
-            
-            # Set up text formatting
-            c.setFont("Helvetica", 11)
-            
-            # Split text into lines
-            lines = text.replace('\n\n', '\n').split('\n')
-            y_position = height - 50  # Start near top of page
-            line_height = 14
-            
-            for line in lines:
-                if y_position < 50:  # Start new page if needed
-                    c.showPage()
-                    y_position = height - 50
-                    c.setFont("Helvetica", 11)
-                
-                # Handle long lines by wrapping
-                if len(line) > 85:  # Wrap at ~85 characters
-                    words = line.split(' ')
-                    current_line = ""
-                    
-                    for word in words:
-                        if len(current_line + word) < 85:
-                            current_line += word + " "
-                        else:
-                            if current_line:
-                                c.drawString(50, y_position, current_line.strip())
-                                y_position -= line_height
-                                if y_position < 50:
-                                    c.showPage()
-                                    y_position = height - 50
-                                    c.setFont("Helvetica", 11)
-                            current_line = word + " "
-                    
-                    if current_line:
-                        c.drawString(50, y_position, current_line.strip())
-                        y_position -= line_height
-                else:
-                    c.drawString(50, y_position, line)
-                    y_position -= line_height
-            
-            c.save()
+            writer = SimplePDFWriter(output_path)
+            writer.write_text(text)
+            writer.close()
             
         except Exception as e:
             print(f"Error with simple PDF creation: {e}")
             raise
+
+
+class SimplePDFWriter:
+    """
+    Incremental canvas-based PDF writer: text is laid out as it arrives, so
+    callers can render a document page by page without building a full story.
+    """
+    def __init__(self, output_path, font="Helvetica", font_size=11, line_height=14, wrap_at=85):
+        self.canvas = canvas.Canvas(output_path, pagesize=A4, pageCompression=1)
+        self.width, self.height = A4
+        self.font = font
+        self.font_size = font_size
+        self.line_height = line_height
+        self.wrap_at = wrap_at
+        self.canvas.setFont(self.font, self.font_size)
+        self.y_position = self.height - 50  # Start near top of page
+        self.page_has_content = False
+
+    def new_page(self):
+        """Finish the current page (if anything was drawn on it)."""
+        if self.page_has_content:
+            self.canvas.showPage()
+            self.canvas.setFont(self.font, self.font_size)
+            self.y_position = self.height - 50
+            self.page_has_content = False
+
+    def _draw_line(self, line):
+        if self.y_position < 50:  # Start new page if needed
+            self.new_page()
+        self.canvas.drawString(50, self.y_position, line)
+        self.y_position -= self.line_height
+        self.page_has_content = True
+
+    def write_text(self, text):
+        # Split text into lines
+        for line in text.replace('\n\n', '\n').split('\n'):
+            # Handle long lines by wrapping
+            if len(line) > self.wrap_at:
+                current_line = ""
+                for word in line.split(' '):
+                    if len(current_line + word) < self.wrap_at:
+                        current_line += word + " "
+                    else:
+                        if current_line:
+                            self._draw_line(current_line.strip())
+                        current_line = word + " "
+                if current_line:
+                    self._draw_line(current_line.strip())
+            else:
+                self._draw_line(line)
+
+    def close(self):
+        self.canvas.save()
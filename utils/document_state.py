@@ -0,0 +1,261 @@
+"""
+Document State - Incremental re-anonymization of edited documents
+
+A document submitted with a document ID keeps, between versions, the
+detections of each of its segments (pages, paragraphs) and the pseudonyms it
+was given. On the next version only segments whose content changed are sent
+to the detector, and values seen before get the same pseudonym again.
+
+Like the mapping store, nothing here contains original text: segments and
+values are identified by HMACs under a secret, and detections are stored as
+offsets into their segment.
+
+Backends:
+  * memory - an LRU per process
+  * file   - one JSON file per document, written atomically
+
+Both drop documents not saved for INCREMENTAL_STORE_TTL seconds and keep at
+most INCREMENTAL_STORE_SIZE of them, least recently saved first out; a dropped
+document is simply detected in full again on its next version.
+"""
+import hashlib
+import hmac
+import json
+import os
+import secrets
+import threading
+import time
+from collections import OrderedDict
+
+from replacers.pseudonym_pool import unique_variant
+
+
+class MemoryStateBackend:
+    def __init__(self, max_entries=1000, ttl=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires, state = entry
+            if expires is not None and expires <= time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return state
+
+    def put(self, key, state):
+        expires = time.time() + self.ttl if self.ttl else None
+        with self._lock:
+            self._entries[key] = (expires, state)
+            self._entries.move_to_end(key)
+            while self.max_entries and len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class FileStateBackend:
+    """One JSON file per document; expired and excess files are pruned at most once a minute."""
+
+    PRUNE_INTERVAL = 60
+
+    def __init__(self, directory, max_entries=1000, ttl=None):
+        self.directory = directory
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._last_prune = 0.0
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.json")
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            if self.ttl and time.time() - os.path.getmtime(path) > self.ttl:
+                os.remove(path)
+                return None
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def put(self, key, state):
+        # Write then rename so readers never see a half-written file
+        path = self._path(key)
+        temp_path = f"{path}.{secrets.token_hex(4)}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f, separators=(',', ':'))
+        os.replace(temp_path, path)
+        if time.time() - self._last_prune > self.PRUNE_INTERVAL:
+            self.prune()
+
+    def prune(self):
+        """Remove expired documents, then the least recently saved ones beyond max_entries."""
+        self._last_prune = now = time.time()
+        files = []
+        for name in os.listdir(self.directory):
+            if not name.endswith('.json'):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                files.append((os.path.getmtime(path), path))
+            except OSError:
+                continue  # Removed by another process meanwhile
+        files.sort()
+        excess = len(files) - self.max_entries if self.max_entries else 0
+        for index, (mtime, path) in enumerate(files):
+            if index >= excess and not (self.ttl and now - mtime > self.ttl):
+                continue
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def __len__(self):
+        return sum(1 for name in os.listdir(self.directory) if name.endswith('.json'))
+
+
+def _persistent_secret(directory):
+    """Secret kept next to the state, so keys stay valid across restarts."""
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, '.secret')
+    try:
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    except FileExistsError:
+        pass
+    else:
+        with os.fdopen(fd, 'w') as f:
+            f.write(secrets.token_hex(32))
+    with open(path, 'r') as f:
+        return f.read().strip()
+
+
+class DocumentState:
+    """
+    One document's state for one run. Doubles as a mapping store for
+    FakerReplacer (see get_or_create), scoped to this document.
+    """
+
+    def __init__(self, store, key, state, detector_identity):
+        self.store = store
+        self.key = key
+        self.detector_identity = detector_identity
+        self.segments = state.get('segments', {})
+        self.mapping = state.get('mapping', {})
+        self._pseudonyms = set(self.mapping.values())  # Never given to two values
+        self._seen = {}  # Segments of this version, the only ones saved
+        self.reused = 0
+        self.detected = 0
+
+    def _segment_key(self, segment):
+        return self.store.key(self.detector_identity, segment)
+
+    def lookup(self, segment):
+        """Entities detected in this exact segment last time, or None."""
+        key = self._segment_key(segment)
+        stored = self.segments.get(key)
+        if stored is None:
+            return None
+        self._seen[key] = stored
+        self.reused += 1
+        return [
+            (segment[text_start:text_start + text_length], label, start, end)
+            for label, start, end, text_start, text_length in stored
+        ]
+
+    def remember(self, segment, entities):
+        stored = []
+        for ent_text, ent_label, start, end in entities:
+            # Keep where the entity's text is, since detectors may report offsets loosely
+            if isinstance(start, int) and segment[start:start + len(ent_text)] == ent_text:
+                text_start = start
+            else:
+                text_start = segment.find(ent_text)
+                if text_start == -1:
+                    continue
+            stored.append([ent_label, start, end, text_start, len(ent_text)])
+        self._seen[self._segment_key(segment)] = stored
+        self.detected += 1
+
+    def get_or_create(self, entity_type, value, generate):
+        key = self.store.key(entity_type, value)
+        replacement = self.mapping.get(key)
+        if replacement is None:
+            replacement = generate(value, entity_type)
+            if replacement in self._pseudonyms:
+                replacement = unique_variant(replacement, self._pseudonyms.__contains__)
+            self.mapping[key] = replacement
+            self._pseudonyms.add(replacement)
+        return replacement
+
+    def save(self):
+        # Pseudonyms are all kept, so a value that disappears and comes back gets the same one
+        self.store.backend.put(self.key, {'segments': self._seen, 'mapping': self.mapping})
+
+
+class DocumentStateStore:
+    def __init__(self, backend=None, secret=None):
+        self.backend = backend if backend is not None else MemoryStateBackend()
+        secret = secret or secrets.token_bytes(32)
+        self._secret = secret.encode('utf-8') if isinstance(secret, str) else secret
+
+    def key(self, *parts):
+        message = "\x1f".join(parts).encode('utf-8')
+        return hmac.new(self._secret, message, hashlib.sha256).hexdigest()
+
+    def open(self, document_id, detector_identity):
+        """
+        Load the state of document_id; detections only count for the same detector
+        """
+        key = self.key('document', str(document_id))
+        return DocumentState(self, key, self.backend.get(key) or {}, detector_identity)
+
+    def resolve_client_id(self, document_id=None, new=False):
+        """
+        Document ID for a request from an untrusted client (web form, API): a
+        document_id issued earlier, which must still have state, or a freshly
+        issued unguessable one when new is true. IDs a client makes up are
+        refused, so nobody can read or overwrite another client's document by
+        naming it. Returns None for a one-off run; raises KeyError for unknown IDs.
+        """
+        if document_id:
+            if self.backend.get(self.key('document', str(document_id))) is None:
+                raise KeyError("Unknown or expired document_id")
+            return document_id
+        return secrets.token_urlsafe(24) if new else None
+
+    def stats(self):
+        return {
+            'backend': type(self.backend).__name__,
+            'documents': len(self.backend),
+            'max_documents': self.backend.max_entries,
+            'ttl': self.backend.ttl,
+        }
+
+    @classmethod
+    def from_env(cls):
+        """
+        Build the store from INCREMENTAL_STORE* environment variables,
+        or return None when INCREMENTAL_STORE is unset (no incremental mode).
+        """
+        kind = os.getenv('INCREMENTAL_STORE', 'none')
+        secret = os.getenv('MAPPING_SECRET') or None
+        max_entries = int(os.getenv('INCREMENTAL_STORE_SIZE', '1000')) or None
+        ttl = float(os.getenv('INCREMENTAL_STORE_TTL', str(30 * 24 * 3600))) or None
+        if kind == 'none':
+            return None
+        elif kind == 'memory':
+            return cls(MemoryStateBackend(max_entries=max_entries, ttl=ttl), secret)
+        elif kind == 'file':
+            directory = os.getenv('INCREMENTAL_STORE_PATH', 'document_state')
+            return cls(FileStateBackend(directory, max_entries=max_entries, ttl=ttl),
+                       secret or _persistent_secret(directory))
+        raise ValueError(f"Unknown incremental store: {kind}")
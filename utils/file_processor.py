@@ -1,4 +1,3 @@
-import io
 from typing import Tuple, Optional
 
 def extract_text_from_file(file, filename: str) -> Tuple[Optional[str], Optional[str]]:
@@ -11,8 +10,8 @@ def extract_text_from_file(file, filename: str) -> Tuple[Optional[str], Optional
     try:
         filename_lower = filename.lower()
         
-        if filename_lower.endswith('.txt'):
-            # Handle text files
+        if filename_lower.endswith(('.txt', '.csv', '.jsonl')):
+            # Handle text files (CSV/JSONL as plain text; DocumentProcessor has a row-by-row mode)
             content = file.read().decode('utf-8')
             return content, None
             
@@ -27,15 +26,12 @@ def extract_text_from_file(file, filename: str) -> Tuple[Optional[str], Optional
                 import pdfplumber
                 pdfplumber_available = True
                 
-                # Reset file pointer to beginning
-                file.seek(0)
+                from utils.pdf_extraction import extract_pdf_pages_from_stream
                 
-                with pdfplumber.open(io.BytesIO(file.read())) as pdf:
-                    text_content = ""
-                    for page in pdf.pages:
-                        page_text = page.extract_text()
-                        if page_text:
-                            text_content += page_text + "\n"
+                # Extract every page (in parallel for large files)
+                text_content = "".join(
+                    page_text + "\n" for page_text in extract_pdf_pages_from_stream(file) if page_text
+                )
                 
                 if text_content and text_content.strip():
                     return text_content.strip(), None
@@ -53,8 +49,8 @@ def extract_text_from_file(file, filename: str) -> Tuple[Optional[str], Optional
                 # Reset file pointer to beginning
                 file.seek(0)
                 
-                # Create PDF reader
-                pdf_reader = PyPDF2.PdfReader(io.BytesIO(file.read()))
+                # Create PDF reader over the same stream, without another in-memory copy
+                pdf_reader = PyPDF2.PdfReader(file)
                 
                 # Extract text from all pages
                 text_content = ""
@@ -88,7 +84,7 @@ def extract_text_from_file(file, filename: str) -> Tuple[Optional[str], Optional
                 file.seek(0)
                 
                 # Read DOCX file
-                doc = Document(io.BytesIO(file.read()))
+                doc = Document(file)
                 
                 # Extract text from all paragraphs
                 text_content = ""
@@ -107,7 +103,7 @@ def extract_text_from_file(file, filename: str) -> Tuple[Optional[str], Optional
                 
         else:
             # Unsupported file type
-            supported_types = ['.txt', '.pdf', '.docx']
+            supported_types = ['.txt', '.pdf', '.docx', '.csv', '.jsonl']
             return None, f"Unsupported file type. Supported formats: {', '.join(supported_types)}"
             
     except Exception as e:
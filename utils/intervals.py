@@ -0,0 +1,46 @@
+"""
+Interval Index - Logarithmic overlap checks for accepted entity spans
+
+Detectors accept spans in several passes (model entities, then regexes) and
+must skip matches that overlap something already accepted. Scanning every
+accepted entity per match is quadratic on entity-dense documents; this index
+keeps the union of accepted spans as sorted, disjoint half-open intervals so
+each query is a bisect.
+"""
+import bisect
+
+
+class IntervalIndex:
+    def __init__(self, spans=()):
+        self._starts = []
+        self._ends = []
+        for start, end in spans:
+            self.add(start, end)
+
+    def __len__(self):
+        return len(self._starts)
+
+    def overlaps(self, start: int, end: int) -> bool:
+        """True if [start, end) intersects any accepted span."""
+        # First interval ending after `start`; ends are sorted since intervals are disjoint
+        index = bisect.bisect_right(self._ends, start)
+        return index < len(self._starts) and self._starts[index] < end
+
+    def add(self, start: int, end: int):
+        """Accept [start, end), merging it with any spans it touches."""
+        if end <= start:
+            return
+        first = bisect.bisect_left(self._ends, start)
+        last = bisect.bisect_right(self._starts, end)
+        if first < last:
+            start = min(start, self._starts[first])
+            end = max(end, self._ends[last - 1])
+        self._starts[first:last] = [start]
+        self._ends[first:last] = [end]
+
+    def add_if_free(self, start: int, end: int) -> bool:
+        """Accept [start, end) only if it doesn't overlap; return whether it was added."""
+        if self.overlaps(start, end):
+            return False
+        self.add(start, end)
+        return True
@@ -0,0 +1,168 @@
+"""
+Job Queue - Runs anonymization in background workers
+
+Uploads are processed by a fixed pool of worker threads fed from a bounded
+queue, so a long PDF or LLM run no longer holds a web request open. Each job
+reports per-stage progress (extract, detect, replace, render) which the
+loading page polls to show progress and an ETA.
+"""
+import os
+import queue
+import secrets
+import threading
+import time
+
+# Relative share of total processing time, used to turn stage progress into an ETA
+STAGE_WEIGHTS = {
+    'extract': 0.15,
+    'detect': 0.5,
+    'replace': 0.15,
+    'render': 0.2,
+}
+
+
+class JobQueueFull(Exception):
+    """Raised when the queue is at capacity; callers should ask the user to retry."""
+
+
+class Job:
+    def __init__(self, func, args, kwargs):
+        self.id = secrets.token_urlsafe(12)
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.state = 'queued'
+        self.stage = None
+        self.progress = {stage: 0.0 for stage in STAGE_WEIGHTS}
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self.result = None
+        self.error = None
+        self._lock = threading.Lock()
+
+    def report(self, stage, fraction=1.0):
+        """
+        Record progress for a stage (fraction between 0 and 1).
+        Stages before it are considered complete.
+        """
+        with self._lock:
+            for name in STAGE_WEIGHTS:
+                if name == stage:
+                    break
+                self.progress[name] = 1.0
+            if stage in self.progress:
+                self.progress[stage] = max(self.progress[stage], min(1.0, fraction))
+            self.stage = stage
+
+    def overall_progress(self):
+        if self.state == 'done':
+            return 1.0
+        return sum(STAGE_WEIGHTS[stage] * fraction for stage, fraction in self.progress.items())
+
+    def eta(self):
+        """Estimated seconds remaining, or None if there is nothing to extrapolate from."""
+        if self.state != 'running' or self.started is None:
+            return None
+        done = self.overall_progress()
+        if done <= 0:
+            return None
+        elapsed = time.time() - self.started
+        return round(elapsed * (1 - done) / done, 1)
+
+    def to_dict(self):
+        with self._lock:
+            progress = dict(self.progress)
+        return {
+            'id': self.id,
+            'state': self.state,
+            'stage': self.stage,
+            'stages': progress,
+            'progress': round(self.overall_progress(), 3),
+            'eta_seconds': self.eta(),
+            'elapsed_seconds': round((self.finished or time.time()) - (self.started or self.created), 2),
+            'queued_seconds': round((self.started or time.time()) - self.created, 2),
+            'error': self.error,
+        }
+
+
+class JobQueue:
+    def __init__(self, workers=2, max_queue=32, retention=3600):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.retention = retention  # Seconds finished jobs stay queryable
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._running = 0
+        self._threads = []
+        for index in range(workers):
+            thread = threading.Thread(target=self._work, name=f"anonymizer-worker-{index}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def submit(self, func, *args, **kwargs):
+        """
+        Queue func(job, *args, **kwargs) and return the Job immediately.
+        Raises JobQueueFull when the queue is at capacity.
+        """
+        job = Job(func, args, kwargs)
+        self._prune()
+        with self._lock:
+            self._jobs[job.id] = job
+        try:
+            self._queue.put_nowait(job)
+        except queue.Full:
+            with self._lock:
+                del self._jobs[job.id]
+            raise JobQueueFull(f"Job queue is full ({self.max_queue} jobs waiting)")
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _work(self):
+        while True:
+            job = self._queue.get()
+            with self._lock:
+                self._running += 1
+            job.state = 'running'
+            job.started = time.time()
+            try:
+                job.result = job.func(job, *job.args, **job.kwargs)
+                job.state = 'done'
+            except Exception as e:
+                print(f"Job {job.id} failed: {e}")
+                job.error = str(e)
+                job.state = 'failed'
+            finally:
+                job.finished = time.time()
+                with self._lock:
+                    self._running -= 1
+                self._queue.task_done()
+
+    def _prune(self):
+        cutoff = time.time() - self.retention
+        with self._lock:
+            expired = [job_id for job_id, job in self._jobs.items() if job.finished and job.finished < cutoff]
+            for job_id in expired:
+                del self._jobs[job_id]
+
+    def stats(self):
+        with self._lock:
+            return {
+                'workers': self.workers,
+                'running': self._running,
+                'queued': self._queue.qsize(),
+                'max_queue': self.max_queue,
+                'tracked_jobs': len(self._jobs),
+            }
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            workers=int(os.getenv('JOB_WORKERS', '2')),
+            max_queue=int(os.getenv('JOB_QUEUE_SIZE', '32')),
+            retention=float(os.getenv('JOB_RETENTION', '3600')),
+        )
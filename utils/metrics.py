@@ -0,0 +1,142 @@
+"""
+Metrics - Per-stage timings for each anonymization, aggregated for /metrics
+
+Every AnonymizerPipeline carries a Timings object. The pipeline, the document
+processor and the rewriting engines wrap their work in timings.stage(name)
+(load, extract, detect, replace, render, write) and count entities and input
+size. Stage times are exclusive: a stage nested in another is subtracted from
+its parent, so the stages of one run add up to its total.
+
+Finished runs are folded into the process-wide MetricsRegistry, rendered in
+the Prometheus text format. With METRICS_ENABLED=0 every pipeline gets the
+shared NULL_TIMINGS whose methods do nothing.
+"""
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
+STAGES = ('load', 'extract', 'detect', 'replace', 'render', 'write')
+# Histogram bucket upper bounds, in seconds
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def metrics_enabled():
+    return os.getenv('METRICS_ENABLED', '1') not in ('0', 'false', 'no')
+
+
+class Timings:
+    def __init__(self):
+        self.stages = {}
+        self.counts = {}
+        self._children = [0.0]  # Time spent in nested stages, per open stage
+
+    @contextmanager
+    def stage(self, name):
+        started = time.perf_counter()
+        self._children.append(0.0)
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            nested = self._children.pop()
+            self.stages[name] = self.stages.get(name, 0.0) + elapsed - nested
+            self._children[-1] += elapsed
+
+    def count(self, name, amount=1):
+        self.counts[name] = self.counts.get(name, 0) + amount
+
+    def total(self):
+        return sum(self.stages.values())
+
+    def to_dict(self):
+        return {
+            'stages': {name: round(seconds, 4) for name, seconds in self.stages.items()},
+            'total': round(self.total(), 4),
+            **self.counts,
+        }
+
+
+class NullTimings:
+    """Drop-in Timings that records nothing."""
+
+    _null_stage = nullcontext()
+
+    def stage(self, name):
+        return self._null_stage
+
+    def count(self, name, amount=1):
+        pass
+
+    def total(self):
+        return 0.0
+
+    def to_dict(self):
+        return None
+
+
+NULL_TIMINGS = NullTimings()
+
+
+def new_timings():
+    return Timings() if metrics_enabled() else NULL_TIMINGS
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._runs = {}  # kind -> count
+        self._stage_buckets = {}  # (kind, stage) -> [bucket counts..., +Inf]
+        self._stage_sums = {}
+        self._counters = {}  # (kind, name) -> total
+
+    def observe(self, timings, kind):
+        """Fold one finished run (text, pdf, docx, ...) into the aggregates."""
+        if timings is NULL_TIMINGS:
+            return
+        with self._lock:
+            self._runs[kind] = self._runs.get(kind, 0) + 1
+            for stage, seconds in timings.stages.items():
+                key = (kind, stage)
+                buckets = self._stage_buckets.setdefault(key, [0] * (len(BUCKETS) + 1))
+                for index, bound in enumerate(BUCKETS):
+                    if seconds <= bound:
+                        buckets[index] += 1
+                buckets[-1] += 1
+                self._stage_sums[key] = self._stage_sums.get(key, 0.0) + seconds
+            for name, amount in timings.counts.items():
+                self._counters[(kind, name)] = self._counters.get((kind, name), 0) + amount
+
+    def render_prometheus(self):
+        lines = [
+            "# HELP anonymizer_runs_total Completed anonymization runs.",
+            "# TYPE anonymizer_runs_total counter",
+        ]
+        with self._lock:
+            for kind, count in sorted(self._runs.items()):
+                lines.append(f'anonymizer_runs_total{{kind="{kind}"}} {count}')
+
+            lines.append("# HELP anonymizer_stage_seconds Wall time per pipeline stage.")
+            lines.append("# TYPE anonymizer_stage_seconds histogram")
+            for (kind, stage), buckets in sorted(self._stage_buckets.items()):
+                labels = f'kind="{kind}",stage="{stage}"'
+                for bound, count in zip(BUCKETS, buckets):
+                    lines.append(f'anonymizer_stage_seconds_bucket{{{labels},le="{bound}"}} {count}')
+                lines.append(f'anonymizer_stage_seconds_bucket{{{labels},le="+Inf"}} {buckets[-1]}')
+                lines.append(f'anonymizer_stage_seconds_sum{{{labels}}} {self._stage_sums[(kind, stage)]:.6f}')
+                lines.append(f'anonymizer_stage_seconds_count{{{labels}}} {buckets[-1]}')
+
+            for name in sorted({name for _, name in self._counters}):
+                lines.append(f"# TYPE anonymizer_{name}_total counter")
+                for (kind, counter_name), amount in sorted(self._counters.items()):
+                    if counter_name == name:
+                        lines.append(f'anonymizer_{name}_total{{kind="{kind}"}} {amount}')
+        return "\n".join(lines) + "\n"
+
+
+# Process-wide aggregates served at /metrics
+_metrics = MetricsRegistry()
+
+
+def get_metrics():
+    return _metrics
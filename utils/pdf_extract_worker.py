@@ -0,0 +1,33 @@
+"""
+PDF Extraction Worker - Entry point of the utils.pdf_extraction worker processes
+
+    python -m utils.pdf_extract_worker
+
+Reads one task per line on stdin, a JSON [path, start, stop] page range, and
+answers each with one JSON line on stdout: {"texts": [...]} or {"error": "..."}.
+Exits at the end of its input.
+"""
+import json
+import os
+import sys
+
+from utils.pdf_extraction import _extract_page_range
+
+
+def main():
+    # Extraction inside a worker never starts another pool
+    os.environ['PDF_EXTRACT_WORKERS'] = '1'
+    responses = sys.stdout
+    sys.stdout = sys.stderr  # Stray prints from libraries must not corrupt responses
+    for line in sys.stdin:
+        try:
+            path, start, stop = json.loads(line)
+            response = {'texts': _extract_page_range(path, start, stop)[1]}
+        except Exception as e:
+            response = {'error': f"{type(e).__name__}: {e}"}
+        responses.write(json.dumps(response) + "\n")
+        responses.flush()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,190 @@
+"""
+PDF Extraction - Page text extraction, in parallel for large files
+
+pdfplumber text extraction is CPU-bound and runs one page at a time. For large
+PDFs, page ranges are farmed out to a pool of worker processes where every
+worker opens the file on its own; small files stay sequential because starting
+work in other processes costs more than it saves.
+
+Workers are started as `python -m utils.pdf_extract_worker` rather than
+through multiprocessing, whose children re-import the parent's __main__ (the
+web app, with its preloading and background threads). They only ever import
+this module, including any worker started again after one dies.
+"""
+import json
+import math
+import os
+import queue
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import pdfplumber
+
+# Directory holding the utils package, for `python -m utils.pdf_extract_worker`
+_PACKAGE_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _default_workers():
+    return int(os.getenv('PDF_EXTRACT_WORKERS', str(os.cpu_count() or 1)))
+
+
+def _default_min_pages():
+    return int(os.getenv('PDF_PARALLEL_MIN_PAGES', '20'))
+
+
+class ExtractionPool:
+    """
+    Fixed set of worker processes, each handling one page range at a time.
+    Tasks are sent from a thread pool of the same size, which only waits on pipes.
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self._idle = queue.Queue()
+        for _ in range(size):
+            self._idle.put(self._start_worker())
+        self._threads = ThreadPoolExecutor(max_workers=size, thread_name_prefix='pdf-extract')
+
+    def _start_worker(self):
+        env = dict(os.environ)
+        env['PYTHONPATH'] = os.pathsep.join(filter(None, [_PACKAGE_ROOT, env.get('PYTHONPATH')]))
+        return subprocess.Popen(
+            [sys.executable, '-m', 'utils.pdf_extract_worker'],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, env=env,
+            text=True, encoding='utf-8',
+        )
+
+    def _run(self, path, start, stop):
+        worker = self._idle.get()
+        try:
+            worker.stdin.write(json.dumps([path, start, stop]) + "\n")
+            worker.stdin.flush()
+            line = worker.stdout.readline()
+        except OSError:
+            line = ""
+        if not line:
+            # The worker died (e.g. killed for memory): replace it and fail this range
+            worker.kill()
+            self._idle.put(self._start_worker())
+            raise RuntimeError(f"PDF extraction worker exited on pages {start}-{stop} of {path}")
+        self._idle.put(worker)
+        result = json.loads(line)
+        if 'error' in result:
+            raise RuntimeError(result['error'])
+        return start, result['texts']
+
+    def submit(self, path, start, stop):
+        """Extract pages [start, stop) of path in a worker; returns a future of (start, texts)."""
+        return self._threads.submit(self._run, os.path.abspath(path), start, stop)
+
+
+def _get_pool():
+    """Shared pool of PDF_EXTRACT_WORKERS processes, started on first use."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ExtractionPool(_default_workers())
+        return _pool
+
+
+def _extract_page_range(path, start, stop, progress=None):
+    """Extract pages [start, stop) from the PDF at path; returns (start, texts)."""
+    texts = []
+    with pdfplumber.open(path) as pdf:
+        for index in range(start, stop):
+            page = pdf.pages[index]
+            texts.append(page.extract_text() or "")
+            page.close()
+            if progress:
+                progress(index + 1)
+    return start, texts
+
+
+def count_pages(path):
+    with pdfplumber.open(path) as pdf:
+        return len(pdf.pages)
+
+
+def iter_pdf_pages(path, min_pages=None, progress=None, page_count=None):
+    """
+    Yield the text of every page of the PDF at path, in page order (empty
+    string for pages without text). Large files are extracted in parallel in
+    page ranges, only a few ranges ahead of the consumer, so memory stays
+    bounded. progress(fraction) is called as pages are extracted.
+    """
+    min_pages = _default_min_pages() if min_pages is None else min_pages
+    page_count = count_pages(path) if page_count is None else page_count
+    report = (lambda pages_done: progress(pages_done / page_count)) if progress and page_count else None
+
+    if _default_workers() <= 1 or page_count < min_pages:
+        with pdfplumber.open(path) as pdf:
+            for index, page in enumerate(pdf.pages):
+                text = page.extract_text() or ""
+                page.close()
+                if report:
+                    report(index + 1)
+                yield text
+        return
+
+    # A few ranges per worker so uneven pages still balance out
+    pool = _get_pool()
+    pages_per_task = max(1, math.ceil(page_count / (pool.size * 4)))
+    starts = deque(range(0, page_count, pages_per_task))
+    in_flight = deque()
+    pages_done = 0
+    while starts or in_flight:
+        while starts and len(in_flight) < pool.size * 2:
+            start = starts.popleft()
+            in_flight.append(pool.submit(path, start, min(start + pages_per_task, page_count)))
+        _, texts = in_flight.popleft().result()
+        pages_done += len(texts)
+        if report:
+            report(pages_done)
+        yield from texts
+
+
+def extract_pdf_pages(path, min_pages=None, progress=None):
+    """
+    Return the text of every page of the PDF at path, in page order
+    (empty string for pages without text). progress(fraction) is called as
+    pages are extracted.
+    """
+    return list(iter_pdf_pages(path, min_pages, progress))
+
+
+def extract_pdf_pages_from_stream(stream, min_pages=None, min_bytes=1024 * 1024):
+    """
+    Like extract_pdf_pages for an open binary stream. Workers need a path, so
+    streams that aren't backed by a named file are spilled to a temporary file
+    unless they are small enough to simply read sequentially.
+    """
+    stream.seek(0)
+    path = getattr(stream, 'name', None)
+    if isinstance(path, str) and os.path.isfile(path):
+        return extract_pdf_pages(path, min_pages)
+
+    size = stream.seek(0, os.SEEK_END)
+    stream.seek(0)
+    if size < min_bytes:
+        texts = []
+        with pdfplumber.open(stream) as pdf:
+            for page in pdf.pages:
+                texts.append(page.extract_text() or "")
+                page.close()
+        return texts
+
+    with tempfile.NamedTemporaryFile(suffix='.pdf', delete=False) as temp_file:
+        shutil.copyfileobj(stream, temp_file)
+        temp_path = temp_file.name
+    try:
+        return extract_pdf_pages(temp_path, min_pages)
+    finally:
+        os.remove(temp_path)
@@ -0,0 +1,311 @@
+"""
+PDF Redaction - Anonymize a PDF in place instead of re-typesetting it
+
+Pages without entities are copied through untouched. On pages with entities:
+  * the text-showing operators (Tj, TJ, ', ") whose strings contain an entity
+    are rewritten so the entity's glyphs are removed, replaced by an equal
+    horizontal offset so the rest of the line keeps its position;
+  * an overlay draws a white box with the replacement text over each entity,
+    located with pdfplumber's word coordinates.
+
+Strings are matched after decoding; fonts with custom encodings (e.g. subset
+CID or Identity-H fonts) may not decode to the visible text, so the entity
+would stay in the text layer under the overlay. The output is therefore
+extracted again and checked: if any planned entity text is still there,
+RedactionIncomplete is raised and the output file removed.
+"""
+import io
+import os
+import re
+
+import pdfplumber
+from PyPDF2 import PdfReader, PdfWriter
+from PyPDF2.generic import (
+    ArrayObject, ByteStringObject, ContentStream, FloatObject, NameObject, TextStringObject,
+)
+from reportlab.lib.colors import black, white
+from reportlab.pdfbase.pdfmetrics import standardFonts, stringWidth
+from reportlab.pdfgen import canvas
+
+from replacers.span_engine import apply_plan
+
+TEXT_OPERATORS = (b'Tj', b'TJ', b"'", b'"')
+DEFAULT_GLYPH_WIDTH = 500  # Thousandths of text space, used when a font has no metrics
+
+
+class _FontMetrics:
+    """Glyph widths for the fonts of one page, in thousandths of text space."""
+
+    def __init__(self, resources):
+        self.fonts = {}
+        fonts = resources.get_object().get('/Font') if resources else None
+        fonts = fonts.get_object() if fonts is not None else {}
+        for name, font in fonts.items():
+            self.fonts[name] = font.get_object()
+
+    def width(self, font_name, char):
+        font = self.fonts.get(font_name)
+        if font is None:
+            return DEFAULT_GLYPH_WIDTH
+        code = ord(char)
+        widths = font.get('/Widths')
+        if widths is not None:
+            index = code - int(font.get('/FirstChar', 0))
+            if 0 <= index < len(widths):
+                return float(widths[index].get_object())
+        base_font = str(font.get('/BaseFont', '')).lstrip('/')
+        if base_font in standardFonts:
+            return stringWidth(char, base_font, 1000)
+        return DEFAULT_GLYPH_WIDTH
+
+
+class RedactionIncomplete(Exception):
+    """Entity text is still extractable from the redacted PDF."""
+
+
+def _entity_pattern(ent_text):
+    """Whole-word pattern for ent_text allowing whitespace anywhere inside it, or None."""
+    chars = [re.escape(char) for char in ent_text if not char.isspace()]
+    if not chars:
+        return None
+    return re.compile(r'(?<!\w)' + r'\s*'.join(chars) + r'(?!\w)')
+
+
+def _decode(string_object):
+    if isinstance(string_object, TextStringObject):
+        return str(string_object)
+    return bytes(string_object).decode('latin-1')
+
+
+def _encode_like(original, text):
+    if isinstance(original, TextStringObject):
+        return TextStringObject(text)
+    return ByteStringObject(text.encode('latin-1'))
+
+
+class PDFRedactor:
+    def __init__(self, pipeline):
+        """
+        Initialize with an anonymization pipeline (its replacer keeps the mapping)
+        """
+        self.pipeline = pipeline
+
+    def _locate(self, page, spans):
+        """Return [(x0, top, x1, bottom, replacement)] boxes for every planned span."""
+        boxes = []
+        seen = set()
+        for _, _, ent_text, _, replacement in spans:
+            if ent_text in seen:
+                continue
+            seen.add(ent_text)
+            for match in page.search(ent_text, regex=False, return_chars=False):
+                boxes.append((match['x0'], match['top'], match['x1'], match['bottom'], replacement))
+        return boxes
+
+    def _scrub_content(self, reader, page, entity_texts):
+        """
+        Remove entity glyphs from the page's text operators, keeping line layout.
+        Returns the number of rewritten runs.
+        """
+        content = ContentStream(page.get_contents(), reader)
+        metrics = _FontMetrics(page.get('/Resources'))
+
+        # Collect every string drawn on the page, with the font it's drawn in
+        pieces = []  # (operation index, element index or None, string object, font name)
+        font_name = None
+        for op_index, (operands, operator) in enumerate(content.operations):
+            if operator == b'Tf':
+                font_name = operands[0]
+            elif operator == b'TJ':
+                for element_index, element in enumerate(operands[0]):
+                    if isinstance(element, (TextStringObject, ByteStringObject)):
+                        pieces.append((op_index, element_index, element, font_name))
+            elif operator in TEXT_OPERATORS:
+                pieces.append((op_index, None, operands[-1], font_name))
+
+        # Match entities as whole words, allowing whitespace anywhere inside them:
+        # words drawn by separate operators usually have no space glyph between
+        # them, and kerned TJ arrays split words across strings
+        buffer = []
+        positions = []  # (piece index, char index) per buffered char, None for separators
+        for piece_index, piece in enumerate(pieces):
+            for char_index, char in enumerate(_decode(piece[2])):
+                buffer.append(char)
+                positions.append((piece_index, char_index))
+            buffer.append(" ")
+            positions.append(None)
+        buffer = "".join(buffer)
+
+        removed = {}  # piece index -> set of char indices
+        for ent_text in entity_texts:
+            pattern = _entity_pattern(ent_text)
+            if pattern is None:
+                continue
+            for match in pattern.finditer(buffer):
+                for position in positions[match.start():match.end()]:
+                    if position is not None:
+                        piece_index, char_index = position
+                        removed.setdefault(piece_index, set()).add(char_index)
+
+        if not removed:
+            return 0
+
+        # Rebuild each affected string as TJ elements: kept runs stay strings,
+        # removed runs become negative offsets of the same width
+        replacements = {}
+        for piece_index, char_indices in removed.items():
+            op_index, element_index, string_object, piece_font = pieces[piece_index]
+            text = _decode(string_object)
+            elements = []
+            run = []
+            skipped = 0.0
+            for char_index, char in enumerate(text):
+                if char_index in char_indices:
+                    if run:
+                        elements.append(_encode_like(string_object, "".join(run)))
+                        run = []
+                    skipped += metrics.width(piece_font, char)
+                else:
+                    if skipped:
+                        elements.append(FloatObject(-skipped))
+                        skipped = 0.0
+                    run.append(char)
+            if run:
+                elements.append(_encode_like(string_object, "".join(run)))
+            if skipped:
+                elements.append(FloatObject(-skipped))
+            replacements.setdefault(op_index, {})[element_index] = elements
+
+        operations = []
+        for op_index, (operands, operator) in enumerate(content.operations):
+            element_replacements = replacements.get(op_index)
+            if element_replacements is None:
+                operations.append((operands, operator))
+            elif operator == b'TJ':
+                new_array = ArrayObject()
+                for element_index, element in enumerate(operands[0]):
+                    new_array.extend(element_replacements.get(element_index, [element]))
+                operations.append(([new_array], b'TJ'))
+            else:
+                # ' and " also move to the next line (and " sets spacing first)
+                if operator == b'"':
+                    operations.append(([operands[0]], b'Tw'))
+                    operations.append(([operands[1]], b'Tc'))
+                if operator in (b"'", b'"'):
+                    operations.append(([], b'T*'))
+                operations.append(([ArrayObject(element_replacements[None])], b'TJ'))
+        content.operations = operations
+
+        page[NameObject('/Contents')] = content
+        return sum(len(element_replacements) for element_replacements in replacements.values())
+
+    def _overlay(self, width, height, boxes):
+        """Build a one-page PDF covering each box and writing its replacement."""
+        buffer = io.BytesIO()
+        overlay = canvas.Canvas(buffer, pagesize=(width, height))
+        for x0, top, x1, bottom, replacement in boxes:
+            box_height = bottom - top
+            y = height - bottom
+            overlay.setFillColor(white)
+            overlay.rect(x0 - 1, y - 1, (x1 - x0) + 2, box_height + 2, stroke=0, fill=1)
+
+            font_size = max(4, box_height * 0.85)
+            text_width = stringWidth(replacement, 'Helvetica', font_size)
+            if text_width > (x1 - x0) and text_width > 0:
+                font_size = max(4, font_size * (x1 - x0) / text_width)
+            overlay.setFillColor(black)
+            overlay.setFont('Helvetica', font_size)
+            overlay.drawString(x0, y + box_height * 0.2, replacement)
+        overlay.showPage()
+        overlay.save()
+        buffer.seek(0)
+        return PdfReader(buffer).pages[0]
+
+    def _leftovers(self, output_path, plans):
+        """
+        Entity texts still extractable from the redacted pages of output_path.
+        Entities whose replacement contains them can't be told apart and are skipped.
+        """
+        leftovers = set()
+        with pdfplumber.open(output_path) as pdf:
+            for page_index, (spans, _, _, _) in plans.items():
+                page = pdf.pages[page_index]
+                page_text = page.extract_text() or ""
+                page.close()
+                for _, _, ent_text, _, replacement in spans:
+                    pattern = _entity_pattern(ent_text)
+                    if pattern is None or ent_text in leftovers or pattern.search(replacement):
+                        continue
+                    if pattern.search(page_text):
+                        leftovers.add(ent_text)
+        return leftovers
+
+    def redact(self, input_path, output_path):
+        """
+        Write an anonymized copy of input_path to output_path.
+        Returns a dict with the original/anonymized text and redaction statistics.
+        Raises RedactionIncomplete (leaving no output) when entity text survives.
+        """
+        timings = self.pipeline.timings
+        plans = {}
+        original_pages = []
+        anonymized_pages = []
+
+        with pdfplumber.open(input_path) as pdf:
+            page_texts = []
+            with timings.stage('extract'):
+                for page in pdf.pages:
+                    page_texts.append(page.extract_text() or "")
+            entities_per_page = self.pipeline.detect_batch(page_texts)
+
+            for page_index, (page, page_text, entities) in enumerate(zip(pdf.pages, page_texts, entities_per_page)):
+                if page_text:
+                    original_pages.append(page_text + "\n\n")
+                if not entities:
+                    if page_text:
+                        anonymized_pages.append(page_text + "\n\n")
+                    page.close()
+                    continue
+
+                with timings.stage('replace'):
+                    spans = self.pipeline.replacer.plan(page_text, entities)
+                    anonymized_pages.append(apply_plan(page_text, spans) + "\n\n")
+                with timings.stage('render'):
+                    boxes = self._locate(page, spans)
+                plans[page_index] = (spans, boxes, float(page.width), float(page.height))
+                page.close()
+
+        reader = PdfReader(input_path)
+        writer = PdfWriter()
+        runs_rewritten = 0
+        entities_located = 0
+        with timings.stage('render'):
+            for page_index, page in enumerate(reader.pages):
+                if page_index in plans:
+                    spans, boxes, width, height = plans[page_index]
+                    entity_texts = sorted({span[2] for span in spans}, key=len, reverse=True)
+                    runs_rewritten += self._scrub_content(reader, page, entity_texts)
+                    entities_located += len(boxes)
+                    if boxes:
+                        page.merge_page(self._overlay(width, height, boxes))
+                writer.add_page(page)
+
+        with timings.stage('write'), open(output_path, 'wb') as f:
+            writer.write(f)
+
+        with timings.stage('extract'):
+            leftovers = self._leftovers(output_path, plans)
+        if leftovers:
+            os.remove(output_path)
+            raise RedactionIncomplete(
+                f"{len(leftovers)} entit{'y' if len(leftovers) == 1 else 'ies'} still extractable after redaction "
+                f"(fonts with custom encodings?)")
+
+        return {
+            'original_text': "".join(original_pages),
+            'anonymized_text': "".join(anonymized_pages),
+            'pages_total': len(reader.pages),
+            'pages_redacted': len(plans),
+            'entities_located': entities_located,
+            'runs_rewritten': runs_rewritten,
+        }
@@ -0,0 +1,157 @@
+"""
+Result Store - Keeps anonymization results server-side
+
+Results (original text, anonymized text, replacement mapping) are far too
+large for Flask's cookie-backed session, so they live here and the session
+only carries a result ID. The default backend is an in-memory LRU with TTL;
+filesystem and SQLite backends let several worker processes share results.
+"""
+import json
+import os
+import secrets
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+class MemoryResultBackend:
+    def __init__(self, max_entries=256, ttl=3600):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, result_id):
+        with self._lock:
+            entry = self._entries.get(result_id)
+            if entry is None:
+                return None
+            expires, data = entry
+            if expires is not None and expires <= time.time():
+                del self._entries[result_id]
+                return None
+            self._entries.move_to_end(result_id)
+            return data
+
+    def put(self, result_id, data):
+        expires = time.time() + self.ttl if self.ttl else None
+        with self._lock:
+            self._entries[result_id] = (expires, data)
+            self._entries.move_to_end(result_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, result_id):
+        with self._lock:
+            self._entries.pop(result_id, None)
+
+
+class FileSystemResultBackend:
+    """One JSON file per result; expired files are removed lazily."""
+
+    def __init__(self, directory, ttl=3600):
+        self.directory = directory
+        self.ttl = ttl
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, result_id):
+        return os.path.join(self.directory, f"{result_id}.json")
+
+    def get(self, result_id):
+        path = self._path(result_id)
+        try:
+            if self.ttl and time.time() - os.path.getmtime(path) > self.ttl:
+                os.remove(path)
+                return None
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def put(self, result_id, data):
+        # Write then rename so readers never see a half-written file
+        path = self._path(result_id)
+        temp_path = f"{path}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+        os.replace(temp_path, path)
+
+    def delete(self, result_id):
+        try:
+            os.remove(self._path(result_id))
+        except OSError:
+            pass
+
+
+class SQLiteResultBackend:
+    def __init__(self, path, ttl=3600):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS results (id TEXT PRIMARY KEY, data TEXT NOT NULL, updated REAL NOT NULL)"
+        )
+
+    def get(self, result_id):
+        with self._lock:
+            row = self._conn.execute("SELECT data, updated FROM results WHERE id = ?", (result_id,)).fetchone()
+            if row is None:
+                return None
+            if self.ttl and time.time() - row[1] > self.ttl:
+                self._conn.execute("DELETE FROM results WHERE id = ?", (result_id,))
+                return None
+        return json.loads(row[0])
+
+    def put(self, result_id, data):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO results (id, data, updated) VALUES (?, ?, ?)",
+                (result_id, json.dumps(data), now),
+            )
+            if self.ttl:
+                self._conn.execute("DELETE FROM results WHERE updated < ?", (now - self.ttl,))
+
+    def delete(self, result_id):
+        with self._lock:
+            self._conn.execute("DELETE FROM results WHERE id = ?", (result_id,))
+
+
+class ResultStore:
+    def __init__(self, backend=None):
+        self.backend = backend or MemoryResultBackend()
+
+    def save(self, data, result_id=None):
+        """
+        Store a result and return its ID
+        """
+        result_id = result_id or secrets.token_urlsafe(16)
+        self.backend.put(result_id, data)
+        return result_id
+
+    def get(self, result_id):
+        if not result_id:
+            return None
+        return self.backend.get(result_id)
+
+    def delete(self, result_id):
+        self.backend.delete(result_id)
+
+    @classmethod
+    def from_env(cls):
+        """
+        Build the store from RESULT_STORE* environment variables
+        """
+        kind = os.getenv('RESULT_STORE', 'memory')
+        ttl = float(os.getenv('RESULT_STORE_TTL', '3600')) or None
+        if kind == 'filesystem':
+            import tempfile
+            directory = os.getenv('RESULT_STORE_PATH') or os.path.join(tempfile.gettempdir(), 'anonymizer_results')
+            return cls(FileSystemResultBackend(directory, ttl=ttl))
+        elif kind == 'sqlite':
+            return cls(SQLiteResultBackend(os.getenv('RESULT_STORE_PATH', 'results.sqlite3'), ttl=ttl))
+        elif kind == 'memory':
+            return cls(MemoryResultBackend(max_entries=int(os.getenv('RESULT_STORE_SIZE', '256')), ttl=ttl))
+        raise ValueError(f"Unknown result store: {kind}")
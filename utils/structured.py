@@ -0,0 +1,272 @@
+"""
+Structured Data - Anonymize CSV and JSONL files row by row
+
+Rows are streamed in batches and written as they are processed, so memory
+stays flat however large the file is. Each column (a CSV header, or a JSONL
+key path such as "user.email") follows a rule:
+
+    PERSON, EMAIL, ...  the whole cell is that entity: replaced without detection
+    text                free text: run through the detector
+    keep                left untouched
+
+Rules come from a spec like "email=EMAIL,name=PERSON,notes=text,id=keep";
+"*=keep" changes the rule for undeclared columns (default: text). Within a
+batch, free-text cells are deduplicated and detected in one call, and results
+are remembered across batches, since exports repeat the same values a lot.
+Cells without letters (numbers, dates, IDs) are never sent to the detector.
+
+Pseudonyms come from the mapping store (see replacers.mapping_store); without
+a shared one, a bounded in-memory store is used for the file. The replacer
+doesn't keep them either, so memory never grows with the number of distinct
+values however many rows there are. Only a sample of the mapping, the values
+of the first rows, is kept for the preview.
+"""
+import csv
+import io
+import json
+import secrets
+import sys
+from collections import OrderedDict
+
+from detectors.patterns import LETTER_RE
+from replacers.mapping_store import MappingStore, MemoryMappingBackend
+from replacers.span_engine import apply_plan
+
+KEEP = 'keep'
+TEXT = 'text'
+
+# Exported notes can be far longer than the csv module's 128 KB default
+csv.field_size_limit(min(sys.maxsize, 2 ** 31 - 1))
+
+
+def parse_columns(spec):
+    """Parse "email=EMAIL,notes=text,id=keep" into {column: rule}."""
+    columns = {}
+    for entry in (spec or "").split(','):
+        column, _, rule = entry.partition('=')
+        column, rule = column.strip(), rule.strip()
+        if not column or not rule:
+            continue
+        columns[column] = rule.lower() if rule.lower() in (KEEP, TEXT) else rule.upper()
+    return columns
+
+
+class StructuredAnonymizer:
+    def __init__(self, pipeline, columns=None, batch_rows=2000, cache_size=100000, preview_chars=20000,
+                 mapping_cache_size=10000):
+        """
+        Initialize with an anonymization pipeline (its replacer keeps the mapping)
+        """
+        self.pipeline = pipeline
+        if pipeline.replacer.mapping_store is None:
+            # Evicted pseudonyms are regenerated identically from their key, so the bound is safe
+            pipeline.replacer.mapping_store = MappingStore(MemoryMappingBackend(max_entries=mapping_cache_size),
+                                                           secrets.token_bytes(32))
+        pipeline.replacer.remember = False
+        self.columns = columns or {}
+        self.default_rule = self.columns.get('*', TEXT)
+        self.batch_rows = batch_rows
+        self.cache_size = cache_size
+        self.preview_chars = preview_chars
+        self._detected = OrderedDict()  # Free-text cell -> anonymized cell, most recent last
+        self._sample = {}  # Replacements made in the first rows, for mapping_sample
+        self._sample_left = preview_chars
+        self.stats = {'rows': 0, 'cells_mapped': 0, 'cells_detected': 0, 'cells_reused': 0}
+
+    def _rule(self, column):
+        return self.columns.get(column, self.default_rule)
+
+    def _detect_cells(self, cells):
+        """Detect the distinct free-text cells of a batch; returns {cell: anonymized cell}."""
+        results = {}
+        pending = {}
+        for column, value in cells:
+            if self._rule(column) != TEXT or not value or value in results or value in pending:
+                continue
+            cached = self._detected.get(value)
+            if cached is not None:
+                results[value] = cached
+                self.stats['cells_reused'] += 1
+            elif LETTER_RE.search(value):
+                pending[value] = None
+            else:
+                results[value] = value
+
+        if pending:
+            texts = list(pending)
+            entities_per_text = self.pipeline.detect_batch(texts)
+            with self.pipeline.timings.stage('replace'):
+                for text, entities in zip(texts, entities_per_text):
+                    if not entities:
+                        results[text] = text
+                        continue
+                    plan = self.pipeline.replacer.plan(text, entities)
+                    results[text] = apply_plan(text, plan)
+                    for _, _, ent_text, _, replacement in plan:
+                        self._add_sample(ent_text, replacement)
+            self.stats['cells_detected'] += len(texts)
+
+            for text in texts:
+                self._detected[text] = results[text]
+            while len(self._detected) > self.cache_size:
+                self._detected.popitem(last=False)
+        return results
+
+    def _anonymize_cell(self, column, value, detected):
+        rule = self._rule(column)
+        if rule == KEEP or not value:
+            return value
+        if rule == TEXT:
+            return detected.get(value, value)
+        self.stats['cells_mapped'] += 1
+        replacement = self.pipeline.replacer.replace_value(value, rule)
+        self._add_sample(value, replacement)
+        return replacement
+
+    def _add_sample(self, original, replacement):
+        if self._sample_left > 0 and original not in self._sample:
+            self._sample[original] = replacement
+            self._sample_left -= len(original)
+
+    def mapping_sample(self, original_preview):
+        """{original: replacement} for the sampled values that appear in original_preview."""
+        return {original: replacement for original, replacement in self._sample.items()
+                if original in original_preview}
+
+    def _batches(self, rows):
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= self.batch_rows:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def anonymize_csv(self, input_path, output_path):
+        """
+        Anonymize a CSV file with a header row, keeping its dialect (delimiter, quoting).
+        Returns (original_preview, anonymized_preview).
+        """
+        timings = self.pipeline.timings
+        with open(input_path, 'r', encoding='utf-8-sig', newline='') as source, \
+                open(output_path, 'w', encoding='utf-8', newline='') as target:
+            sample = source.read(65536)
+            source.seek(0)
+            try:
+                dialect = csv.Sniffer().sniff(sample, delimiters=',;\t|')
+            except csv.Error:
+                dialect = csv.excel
+            reader = csv.reader(source, dialect)
+            writer = csv.writer(target, dialect)
+            previews = _Preview(self.preview_chars, dialect)
+
+            header = next(reader, None)
+            if header is None:
+                return "", ""
+            writer.writerow(header)
+            previews.add(header, header)
+
+            for batch in self._batches(reader):
+                cells = [(header[i] if i < len(header) else str(i), value)
+                         for row in batch for i, value in enumerate(row)]
+                detected = self._detect_cells(cells)
+                with timings.stage('replace'):
+                    output_rows = [
+                        [self._anonymize_cell(header[i] if i < len(header) else str(i), value, detected)
+                         for i, value in enumerate(row)]
+                        for row in batch
+                    ]
+                with timings.stage('write'):
+                    writer.writerows(output_rows)
+                for row, output_row in zip(batch, output_rows):
+                    if not previews.add(row, output_row):
+                        break
+                self.stats['rows'] += len(batch)
+        return previews.text()
+
+    def _walk(self, value, path, visit):
+        """Apply visit(path, string) to every string in a JSON value; returns the new value."""
+        if isinstance(value, str):
+            return visit(path, value)
+        if isinstance(value, dict):
+            return {key: self._walk(item, f"{path}.{key}" if path else key, visit) for key, item in value.items()}
+        if isinstance(value, list):
+            return [self._walk(item, path, visit) for item in value]
+        return value
+
+    def anonymize_jsonl(self, input_path, output_path):
+        """
+        Anonymize a JSON Lines file; blank lines are kept, invalid JSON is an error.
+        Returns (original_preview, anonymized_preview).
+        """
+        timings = self.pipeline.timings
+        original_preview = []
+        anonymized_preview = []
+        preview_left = self.preview_chars
+
+        def numbered_lines(source):
+            for line_number, line in enumerate(source, start=1):
+                yield line_number, line
+
+        with open(input_path, 'r', encoding='utf-8-sig') as source, \
+                open(output_path, 'w', encoding='utf-8') as target:
+            for batch in self._batches(numbered_lines(source)):
+                records = []
+                for line_number, line in batch:
+                    if not line.strip():
+                        records.append(None)
+                        continue
+                    try:
+                        records.append(json.loads(line))
+                    except ValueError as e:
+                        raise ValueError(f"Line {line_number} is not valid JSON: {e}")
+
+                cells = []
+                for record in records:
+                    if record is not None:
+                        self._walk(record, "", lambda path, value: cells.append((path, value)) or value)
+                detected = self._detect_cells(cells)
+
+                with timings.stage('replace'):
+                    output_lines = [
+                        "\n" if record is None else json.dumps(
+                            self._walk(record, "", lambda path, value: self._anonymize_cell(path, value, detected)),
+                            ensure_ascii=False) + "\n"
+                        for record in records
+                    ]
+                with timings.stage('write'):
+                    target.writelines(output_lines)
+
+                for (_, line), output_line in zip(batch, output_lines):
+                    if preview_left <= 0:
+                        break
+                    original_preview.append(line)
+                    anonymized_preview.append(output_line)
+                    preview_left -= len(line)
+                self.stats['rows'] += len(batch)
+        return "".join(original_preview), "".join(anonymized_preview)
+
+
+class _Preview:
+    """The first rows of a CSV, original and anonymized, rendered back as CSV text."""
+
+    def __init__(self, max_chars, dialect):
+        self.left = max_chars
+        self.original = io.StringIO()
+        self.anonymized = io.StringIO()
+        self._original_writer = csv.writer(self.original, dialect)
+        self._anonymized_writer = csv.writer(self.anonymized, dialect)
+
+    def add(self, row, output_row):
+        """Returns False once the preview is full."""
+        if self.left <= 0:
+            return False
+        before = self.original.tell()
+        self._original_writer.writerow(row)
+        self._anonymized_writer.writerow(output_row)
+        self.left -= self.original.tell() - before
+        return True
+
+    def text(self):
+        return self.original.getvalue(), self.anonymized.getvalue()
@@ -0,0 +1,55 @@
+"""
+Upload Ingestion - Streams uploaded files to disk exactly once
+
+Flask normally parses uploads into an anonymous spooled buffer which the app
+then copies to a temporary path. UploadRequest streams each uploaded file
+straight into a named temporary file while the request body is parsed, so the
+background job can open that same file: no second copy, and no upload held
+in memory. Oversized requests are rejected from their Content-Length before
+anything is read.
+"""
+import os
+import tempfile
+
+from flask import Request
+from werkzeug.utils import secure_filename
+
+
+def max_upload_bytes():
+    """Request size limit from MAX_UPLOAD_MB (0 disables the limit)."""
+    limit = float(os.getenv('MAX_UPLOAD_MB', '50'))
+    return int(limit * 1024 * 1024) if limit > 0 else None
+
+
+def upload_directory():
+    return os.getenv('UPLOAD_DIR') or tempfile.gettempdir()
+
+
+class UploadRequest(Request):
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        """Write every uploaded file part to its own named temporary file."""
+        extension = os.path.splitext(secure_filename(filename or ''))[1].lower()
+        stream = tempfile.NamedTemporaryFile(prefix='upload_', suffix=extension, dir=upload_directory(), delete=False)
+        self.__dict__.setdefault('_upload_paths', []).append(stream.name)
+        return stream
+
+
+def claim_upload(file_storage, request):
+    """
+    Take ownership of an uploaded file: returns its path on disk, which is kept
+    after the request ends. The caller is responsible for removing it.
+    """
+    stream = file_storage.stream
+    stream.flush()
+    stream.close()
+    request.__dict__.get('_upload_paths', []).remove(stream.name)
+    return stream.name
+
+
+def discard_uploads(request):
+    """Remove the temporary files of uploads that nobody claimed."""
+    for path in request.__dict__.pop('_upload_paths', []):
+        try:
+            os.remove(path)
+        except OSError:
+            pass